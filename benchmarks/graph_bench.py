@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+图编排基准测试 - 不访问网络，测量各个图变体的编排开销
+
+模型换成 FakeChatModel、搜索换成 FakeSearchBackend，延迟和输出都是确定的，
+测出来的差异只来自图本身（节点调度、状态合并、fan-out 等）。
+
+对每个图变体和每个并发度运行一批任务，报告：
+- 吞吐量（次/秒）和单次运行耗时的 p50 / p95 / p99
+- 每个节点的耗时分位数（来自 observability 的 InMemoryMetrics）
+- 峰值内存（tracemalloc，单独再跑一轮，不影响耗时）
+
+结果可以保存为 JSON 基线，之后用 --compare 对比，吞吐量下降或 p95 上升超过阈值时退出码为 1。
+
+运行方式:
+    python benchmarks/graph_bench.py
+    python benchmarks/graph_bench.py --variants condition fanout --concurrency 1 16 --runs 50
+    python benchmarks/graph_bench.py --save-baseline benchmarks/baseline.json
+    python benchmarks/graph_bench.py --compare benchmarks/baseline.json --threshold 0.15
+    python benchmarks/graph_bench.py --tail-rate 0.05 --tail-latency 0.5 --hedge   # 长尾 + 对冲请求
+    python benchmarks/graph_bench.py --llm-rps 50 --llm-inflight 8 --nodes         # 限流，显示排队时间
+    python benchmarks/graph_bench.py --profiles default tiered --fast-latency 0.005 # 按节点分档，显示每个节点省下的时间
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# 没有配置 API Key 时也能导入模型模块（基准测试不会真正创建远程客户端）
+os.environ.setdefault("ALIBABA_API_KEY", "benchmark")
+
+from src.graph import get_graph, make_initial_state            # noqa: E402
+from src.graph.builder import GRAPH_BUILDERS                   # noqa: E402
+from src.llm import (                                          # noqa: E402
+    FakeChatModel, RateLimit, RateLimitedModel, ResiliencePolicy, set_limiter, set_model, with_resilience,
+)
+from src.llm.tiers import MODEL_FAST, get_profiles                # noqa: E402
+from src.observability import InMemoryMetrics, Metrics, set_metrics  # noqa: E402
+from src.observability.log import configure_logging           # noqa: E402
+from src.observability.metrics import percentile               # noqa: E402
+from src.tools import FakeSearchBackend, set_search_backend    # noqa: E402
+
+
+def setup_fakes(args) -> list[FakeChatModel]:
+    """
+    把模型和搜索后端换成本地替身
+
+    用到的档位里每个不同的模型配置注入一个假模型：快模型（MODEL_FAST）的延迟是
+    --fast-latency，其余是 --llm-latency。
+    """
+    models = []
+    configs = {config for name in args.profiles for config in get_profiles()[name].values()}
+    for config in configs:
+        model = FakeChatModel(
+            latency=args.fast_latency if config.model == MODEL_FAST else args.llm_latency,
+            tail_rate=args.tail_rate,
+            tail_latency=args.tail_latency,
+            output_tokens=args.output_tokens,
+            tool_calls=args.tool_calls,
+            fanout=args.fanout,
+        )
+        # 和 get_model 创建的客户端一样：先限流，再包容错策略
+        wrapped = RateLimitedModel(model, "llm")
+        if args.hedge:
+            wrapped = with_resilience(wrapped, ResiliencePolicy(hedge=True, hedge_min_samples=10))
+        set_model(wrapped, config)
+        models.append(model)
+
+    set_limiter("llm", RateLimit(rps=args.llm_rps, tokens_per_min=args.llm_tpm, max_inflight=args.llm_inflight))
+    set_limiter("search", RateLimit(rps=args.search_rps))
+    # ttl=0: 不缓存搜索结果，每次都走（假的）后端
+    set_search_backend(FakeSearchBackend(latency=args.search_latency), ttl=0)
+    return models
+
+
+# ============================================================
+# 运行
+# ============================================================
+
+async def run_batch(graph, runs: int, concurrency: int, profile: str) -> list[float]:
+    """以给定并发度运行 runs 次，返回每次运行的耗时（秒）"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> float:
+        async with semaphore:
+            config = {"configurable": {"thread_id": f"bench-{concurrency}-{i}", "model_profile": profile}}
+            start = time.perf_counter()
+            await graph.ainvoke(make_initial_state(f"基准测试问题 {i}"), config)
+            return time.perf_counter() - start
+
+    return await asyncio.gather(*(one(i) for i in range(runs)))
+
+
+def measure(variant: str, concurrency: int, runs: int, profile: str) -> dict:
+    """一个 (变体, 并发度, 模型档位) 组合的结果"""
+    graph = get_graph(variant)
+    aggregator = InMemoryMetrics()
+    set_metrics(Metrics([aggregator]))
+
+    asyncio.run(run_batch(graph, max(concurrency, 2), concurrency, profile))   # 预热
+    aggregator.reset()
+    start = time.perf_counter()
+    latencies = asyncio.run(run_batch(graph, runs, concurrency, profile))
+    wall = time.perf_counter() - start
+    summary = aggregator.summary()
+
+    # 峰值内存单独测，tracemalloc 本身会拖慢运行
+    tracemalloc.start()
+    asyncio.run(run_batch(graph, min(runs, concurrency * 2), concurrency, profile))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    values = sorted(latencies)
+    nodes = {
+        name: {k: stats[k] for k in ("count", "p50_s", "p95_s", "p99_s")}
+        for name, stats in summary["node"].items()
+    }
+    # 限流排队时间（没有限流时为空）
+    queue = {
+        name: {k: stats[k] for k in ("count", "p50_s", "p95_s", "p99_s")}
+        for name, stats in summary.get("queue", {}).items()
+    }
+    return {
+        "variant": variant,
+        "concurrency": concurrency,
+        "profile": profile,
+        "runs": runs,
+        "throughput_rps": runs / wall,
+        "p50_s": percentile(values, 0.50),
+        "p95_s": percentile(values, 0.95),
+        "p99_s": percentile(values, 0.99),
+        "peak_mem_mb": peak / 1024 / 1024,
+        "nodes": nodes,
+        "queue": queue,
+    }
+
+
+# ============================================================
+# 基线对比
+# ============================================================
+
+def _key(result: dict) -> tuple:
+    return result["variant"], result["concurrency"], result.get("profile", "default")
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    """返回退化项的描述（吞吐量下降或 p95 上升超过 threshold）"""
+    previous = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get(_key(r))
+        if old is None:
+            continue
+        label = f"{r['variant']}/{r.get('profile', 'default')} @ {r['concurrency']}"
+        if r["throughput_rps"] < old["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{label}: 吞吐量 {old['throughput_rps']:.1f} -> {r['throughput_rps']:.1f} 次/秒")
+        if r["p95_s"] > old["p95_s"] * (1 + threshold):
+            regressions.append(f"{label}: p95 {old['p95_s'] * 1000:.1f} -> {r['p95_s'] * 1000:.1f} ms")
+    return regressions
+
+
+def node_savings(results: list[dict], baseline_profile: str) -> list[tuple]:
+    """每个节点相对 baseline_profile 的 p50 变化: [(变体, 并发, 档位, 节点, 基准 p50, p50)]"""
+    base = {(r["variant"], r["concurrency"]): r for r in results if r["profile"] == baseline_profile}
+    rows = []
+    for r in results:
+        other = base.get((r["variant"], r["concurrency"]))
+        if r["profile"] == baseline_profile or other is None:
+            continue
+        for name, stats in r["nodes"].items():
+            if name in other["nodes"]:
+                rows.append((r["variant"], r["concurrency"], r["profile"], name, other["nodes"][name]["p50_s"], stats["p50_s"]))
+    return rows
+
+
+def print_savings(rows: list[tuple], baseline_profile: str):
+    print(f"\n每个节点的 p50 变化（相对 {baseline_profile} 档位）")
+    print(f"{'变体':<12}{'并发':>6}  {'档位':<10}{'节点':<18}{'基准(ms)':>10}{'p50(ms)':>10}{'节省(ms)':>10}")
+    print("-" * 78)
+    for variant, concurrency, profile, name, before, after in rows:
+        print(
+            f"{variant:<12}{concurrency:>6}  {profile:<10}{name:<18}"
+            f"{before * 1000:>10.1f}{after * 1000:>10.1f}{(before - after) * 1000:>10.1f}"
+        )
+
+
+def print_results(results: list[dict], show_nodes: bool):
+    print(f"{'变体':<12}{'并发':>6}  {'档位':<10}{'次/秒':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'内存(MB)':>10}")
+    print("-" * 80)
+    for r in results:
+        print(
+            f"{r['variant']:<12}{r['concurrency']:>6}  {r['profile']:<10}{r['throughput_rps']:>10.1f}"
+            f"{r['p50_s'] * 1000:>10.1f}{r['p95_s'] * 1000:>10.1f}{r['p99_s'] * 1000:>10.1f}"
+            f"{r['peak_mem_mb']:>10.1f}"
+        )
+        if show_nodes:
+            rows = [*r["nodes"].items(), *((f"排队:{name}", stats) for name, stats in r.get("queue", {}).items())]
+            for name, stats in rows:
+                print(
+                    f"  └ {name:<20}{stats['count']:>8}"
+                    f"{stats['p50_s'] * 1000:>10.1f}{stats['p95_s'] * 1000:>10.1f}{stats['p99_s'] * 1000:>10.1f}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图编排基准测试（本地替身模型）")
+    parser.add_argument("--variants", nargs="+", default=list(GRAPH_BUILDERS), choices=list(GRAPH_BUILDERS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64], help="并发度")
+    parser.add_argument("--runs", type=int, default=64, help="每个组合运行次数")
+    parser.add_argument("--profiles", nargs="+", default=["default"], choices=list(get_profiles()),
+                        help="模型档位（多个时显示每个节点相对第一个档位节省的时间）")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="每次模型调用的延迟（秒）")
+    parser.add_argument("--fast-latency", type=float, default=0.005, help="快模型每次调用的延迟（秒）")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="慢调用的比例")
+    parser.add_argument("--tail-latency", type=float, default=0.0, help="慢调用的延迟（秒）")
+    parser.add_argument("--hedge", action="store_true", help="模型调用开启对冲请求（超过 p95 时再发一个）")
+    parser.add_argument("--search-latency", type=float, default=0.01, help="每次搜索的延迟（秒）")
+    parser.add_argument("--llm-rps", type=float, default=0, help="模型调用的每秒请求数上限（0 表示不限流）")
+    parser.add_argument("--llm-tpm", type=float, default=0, help="模型调用的每分钟 token 上限")
+    parser.add_argument("--llm-inflight", type=int, default=0, help="最多同时进行的模型调用数")
+    parser.add_argument("--search-rps", type=float, default=0, help="搜索的每秒请求数上限")
+    parser.add_argument("--output-tokens", type=int, default=50, help="每次回复的 token 数")
+    parser.add_argument("--tool-calls", type=int, default=1, help="研究员每次发起的工具调用数")
+    parser.add_argument("--fanout", type=int, default=3, help="并行规划器拆出的子问题数")
+    parser.add_argument("--nodes", action="store_true", help="显示每个节点的耗时分位数")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--save-baseline", metavar="PATH", help="把结果保存为基线")
+    parser.add_argument("--compare", metavar="PATH", help="与基线对比，退化时退出码为 1")
+    parser.add_argument("--threshold", type=float, default=0.10, help="允许的退化比例")
+    args = parser.parse_args()
+
+    # 节点的进度日志会淹没结果表格
+    configure_logging(level="WARNING")
+    models = setup_fakes(args)
+    results = [
+        measure(variant, concurrency, args.runs, profile)
+        for variant in args.variants
+        for concurrency in args.concurrency
+        for profile in args.profiles
+    ]
+    print_results(results, args.nodes)
+    if len(args.profiles) > 1:
+        print_savings(node_savings(results, args.profiles[0]), args.profiles[0])
+    print(f"\n模型调用次数: {sum(model.calls for model in models)}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "save_baseline", "compare")},
+        },
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"结果已保存: {path}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ 相对基线退化超过 {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✅ 与基线相比没有超过 {args.threshold:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
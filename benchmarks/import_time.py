@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+启动时间基准测试 - 测量 import 和首次获取图的耗时
+
+每个场景都在全新的子进程中运行多次，取中位数，避免模块缓存影响结果。
+
+运行方式:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 场景名称 -> 在子进程中执行的代码
+SCENARIOS = {
+    "import src.graph": "import src.graph",
+    "import + get_graph('condition')": "import src.graph; src.graph.get_graph('condition')",
+    "import + 创建模型": "import src.graph; from src.llm import get_model; get_model()",
+}
+
+TIMER = """
+import time
+_t = time.perf_counter()
+{code}
+print(time.perf_counter() - _t)
+"""
+
+
+def measure(code: str, runs: int) -> list[float]:
+    """在全新子进程中执行 code，返回每次的耗时（毫秒）"""
+    env = dict(os.environ)
+    # 没有配置 API Key 时也能创建客户端，只测启动开销
+    env.setdefault("ALIBABA_API_KEY", "benchmark")
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", TIMER.format(code=code)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动时间基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景运行次数")
+    args = parser.parse_args()
+
+    print(f"{'场景':<36}{'中位数(ms)':>12}{'最小(ms)':>12}")
+    print("-" * 60)
+    for name, code in SCENARIOS.items():
+        timings = measure(code, args.runs)
+        print(f"{name:<36}{statistics.median(timings):>12.1f}{min(timings):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,13 +21,20 @@ from langgraph.checkpoint.memory import MemorySaver
 # 如果想持久化到文件，取消下面的注释：
 # from langgraph.checkpoint.sqlite import SqliteSaver
 
-from src.graph.state import State
+from src.graph.state import State, WindowedState
+from src.checkpoint import get_history_page
 from src.graph.nodes import planner_node, researcher_node, writer_node
+from src.observability import configure_logging
 
 
-def build_graph_with_memory():
-    """构建带记忆的工作流"""
-    builder = StateGraph(State)
+def build_graph_with_memory(state_schema: type = State):
+    """
+    构建带记忆的工作流
+    
+    长期存在的会话可以传入 WindowedState：只保留最近的消息窗口，
+    更早的消息折叠成滚动摘要，避免消息历史和 checkpoint 无限增长。
+    """
+    builder = StateGraph(state_schema)
     
     builder.add_node("planner", planner_node)
     builder.add_node("researcher", researcher_node)
@@ -44,6 +51,16 @@ def build_graph_with_memory():
     # 如果想持久化到 SQLite 文件：
     # memory = SqliteSaver.from_conn_string("checkpoints.db")
     
+    # 长对话建议再加上增量 + 压缩，checkpoint 体积能小一个数量级：
+    # from src.checkpoint import CompressedSerializer, DeltaCheckpointSaver
+    # conn = sqlite3.connect("checkpoints.db", check_same_thread=False)
+    # memory = DeltaCheckpointSaver(SqliteSaver(conn, serde=CompressedSerializer()))
+    
+    # 异步服务（多个 worker 并发）请用项目统一的 checkpointer：
+    # from src.checkpoint import create_checkpointer
+    # async with create_checkpointer("checkpoints.db") as checkpointer:
+    #     graph = build_graph(checkpointer=checkpointer)
+    
     return builder.compile(checkpointer=memory)
 
 
@@ -94,15 +111,17 @@ async def demo_state_history():
         config
     )
     
-    # 获取所有历史状态
+    # 分页获取历史摘要（不加载完整状态），需要完整状态时再用 get_history_state
     print("\n🕐 执行历史：")
-    history = list(graph.get_state_history(config))
+    page = get_history_page(graph, config, limit=5)
     
-    for i, state in enumerate(history):
-        node = state.metadata.get('langgraph_node', 'START')
-        step = state.metadata.get('step', 0)
-        keys_with_content = [k for k, v in state.values.items() if v]
-        print(f"  Step {step} | Node: {node:12} | 有数据的字段: {keys_with_content}")
+    while True:
+        for entry in page.entries:
+            node = ",".join(entry.node) or 'START'
+            print(f"  Step {entry.step} | Node: {node:12} | 有数据的字段: {list(entry.fields)}")
+        if page.cursor is None:
+            break
+        page = get_history_page(graph, config, cursor=page.cursor, limit=5)
 
 
 async def demo_resume_conversation():
@@ -146,7 +165,8 @@ async def interactive_mode():
     print("="*60)
     print("输入 'quit' 退出，输入 'history' 查看历史\n")
     
-    graph = build_graph_with_memory()
+    # 交互会话可能持续很久，使用窗口化的消息历史
+    graph = build_graph_with_memory(WindowedState)
     config = {"configurable": {"thread_id": "interactive-session"}}
     
     while True:
@@ -157,11 +177,11 @@ async def interactive_mode():
             break
             
         if user_input.lower() == 'history':
-            # 查看历史
-            history = list(graph.get_state_history(config))
-            print(f"\n📊 共 {len(history)} 个历史状态")
-            for i, state in enumerate(history[:5]):  # 只显示最近5个
-                node = state.metadata.get('langgraph_node', '?')
+            # 查看历史 - 只读取最近5个的摘要
+            page = get_history_page(graph, config, limit=5)
+            print(f"\n📊 最近 {len(page.entries)} 个历史状态")
+            for i, entry in enumerate(page.entries):
+                node = ",".join(entry.node) or '?'
                 print(f"  {i+1}. {node}")
             print()
             continue
@@ -193,4 +213,5 @@ async def main():
 
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
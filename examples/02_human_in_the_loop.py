@@ -9,6 +9,7 @@
 
 运行方式:
     python examples/02_human_in_the_loop.py
+    python examples/02_human_in_the_loop.py --queue   # 审核队列：多个运行等待审核，不阻塞进程
 """
 
 import asyncio
@@ -21,6 +22,7 @@ from langgraph.checkpoint.memory import MemorySaver
 
 from src.graph.state import State
 from src.graph.nodes import planner_node, researcher_node, writer_node
+from src.observability import configure_logging
 
 
 def build_graph_with_interrupt():
@@ -222,6 +224,47 @@ async def demo_modify_and_continue():
     print(f"\n最终答案: {final.values.get('final_answer', '')[:300]}...")
 
 
+async def demo_review_queue():
+    """
+    演示：审核队列（见 src/review/manager.py）
+    
+    上面的写法每个等待审核的运行都要占着一个阻塞在 input() 上的进程。
+    审核队列把暂停的运行保存在 checkpointer 里，只在提交审核结果后
+    由 worker 池用 graph.astream(None, config) 继续执行。
+    换成 create_checkpointer("reviews.db") 后，进程重启也能找回待审核的运行。
+    
+    speculative=True 时，运行一暂停就在后台生成写作者的草稿，
+    审核通过（且没有修改）时直接使用草稿，不用再等写作者。
+    """
+    from src.review import ReviewQueue
+    
+    print("\n" + "="*60)
+    print("📝 演示：审核队列")
+    print("="*60)
+    
+    reviews = ReviewQueue(MemorySaver(), workers=2, speculative=True)
+    await reviews.start()
+    
+    # 提交多个问题，worker 执行到 writer 之前暂停
+    for question in ["什么是区块链？", "Python 的优点是什么？", "什么是机器学习？"]:
+        await reviews.submit(question)
+    await reviews.join()
+    
+    pending = reviews.list()
+    print(f"⏸️ {len(pending)} 个运行等待审核")
+    
+    # 审核：第一个通过，第二个补充意见，第三个打回重新研究
+    decisions = [("approve", ""), ("modify", "请补充实际应用案例"), ("reject", "请侧重最新进展")]
+    for review, (action, feedback) in zip(pending, decisions):
+        print(f"   {review.task} -> {action}")
+        await reviews.decide(review.thread_id, action, feedback)
+    await reviews.join()
+    
+    print(f"✅ 已完成 {reviews.counts['completed']} 个（直接使用草稿 {reviews.counts['draft_hits']} 个），"
+          f"重新等待审核 {len(reviews.pending)} 个")
+    await reviews.stop()
+
+
 async def main():
     """主函数"""
     print("🦌 LangGraph 扩展学习 - Human-in-the-Loop（人工介入）")
@@ -232,6 +275,8 @@ async def main():
         question = input("请输入你的问题: ").strip()
         if question:
             await run_with_human_review(question)
+    elif len(sys.argv) > 1 and sys.argv[1] == "--queue":
+        await demo_review_queue()
     else:
         # 演示模式
         await demo_auto_approve()
@@ -243,4 +288,5 @@ async def main():
 
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
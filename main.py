@@ -5,63 +5,207 @@
 使用方法:
     python main.py "你的问题"
     python main.py --interactive
+    python main.py --batch questions.jsonl --concurrency 8 > answers.jsonl
+    python main.py --graph fanout --max-fanout 4 "你的问题"
+    python main.py --quiet "你的问题"        # 只输出答案
+    python main.py --profile tiered "你的问题"   # 规划用快模型，写作用强模型
 """
 
 import argparse
 import asyncio
+import json
+import sys
+import time
+import uuid
 from dotenv import load_dotenv
 
 # 加载环境变量
 load_dotenv()
 
-from src.graph import build_graph
-from src.graph.builder import build_graph_with_condition
+from src.graph import get_graph, make_initial_state
+from src.graph.builder import GRAPH_BUILDERS
+from src.llm.tiers import get_profiles
+from src.observability.log import configure_logging, get_logger, log_context
 
-async def run_workflow(question: str):
+logger = get_logger("main")
+
+async def run_workflow(question: str, variant: str = "condition", config: dict | None = None):
     """
     运行多Agent工作流
     
     Args:
         question: 用户的问题
+        variant: 图变体（default / condition / fanout）
+        config: 运行配置，如 {"configurable": {"max_fanout": 4}}
     """
-    print("=" * 60)
-    print(f"🦌 开始处理问题: {question}")
-    print("=" * 60)
+    logger.info("🦌 开始处理问题: %s", question)
     
-    # 构建图
-
-    graph = build_graph_with_condition()
+    # 获取图（只在第一次调用时编译，之后复用）
+    graph = get_graph(variant)
     
     # 初始状态
-    initial_state = {
-        "messages": [],
-        "task": question,
-        "plan": "",
-        "research_results": "",
-        "final_answer": ""
-    }
+    initial_state = make_initial_state(question)
     
     # 运行工作流
+    # 同时订阅两种流：
+    # - updates: 每个节点完成后的状态更新（用来拿到最终状态）
+    # - messages: LLM 生成的 token，写作者的 token 直接打印，用户不用等整篇答案生成完
+    # 答案是程序的输出，写到 stdout；进度日志由后台线程写到 stderr
     final_state = None
-    async for state in graph.astream(initial_state):
-        final_state = state
-    
-    # 输出最终答案
-    print("\n" + "=" * 60)
-    print("📝 最终答案")
-    print("=" * 60)
+    streamed = False
+    with log_context(run_id=uuid.uuid4().hex[:8]):
+        async for mode, chunk in graph.astream(initial_state, config, stream_mode=["updates", "messages"]):
+            if mode == "updates":
+                final_state = chunk
+                continue
+            
+            message, metadata = chunk
+            if metadata.get("langgraph_node") != "writer" or not message.content:
+                continue
+            if not streamed:
+                # 输出最终答案
+                print("\n" + "=" * 60)
+                print("📝 最终答案")
+                print("=" * 60)
+                streamed = True
+            print(message.content, end="", flush=True)
     
-    # 获取最终答案
-    if final_state and "writer" in final_state:
-        answer = final_state["writer"].get("final_answer", "")
-        print(answer)
+    if streamed:
+        print()
+    elif final_state and "writer" in final_state:
+        # 模型不支持流式输出时，直接打印完整答案
+        print("\n" + "=" * 60)
+        print("📝 最终答案")
+        print("=" * 60)
+        print(final_state["writer"].get("final_answer", ""))
     
     return final_state
 
 
-def run_sync(question: str):
+def run_sync(question: str, variant: str = "condition", config: dict | None = None):
     """同步运行工作流"""
-    return asyncio.run(run_workflow(question))
+    return asyncio.run(run_workflow(question, variant, config))
+
+
+async def run_interactive(variant: str = "condition", config: dict | None = None):
+    """交互模式 - 所有问题共用一个事件循环和一张编译好的图"""
+    print("🦌 欢迎使用多Agent研究助手！")
+    print("输入 'quit' 或 'exit' 退出\n")
+    
+    while True:
+        question = (await asyncio.to_thread(input, "请输入你的问题: ")).strip()
+        if question.lower() in ["quit", "exit", "q"]:
+            print("再见！👋")
+            break
+        if not question:
+            continue
+        
+        await run_workflow(question, variant, config)
+        print("\n")
+
+
+# ============================================================
+# 批量模式
+# ============================================================
+
+def _parse_question(line: str, line_no: int) -> dict:
+    """解析一行问题；格式不对时返回只有 id 和 error 的条目，批量模式照常为它输出一行结果"""
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"id": line_no, "error": f"无效的 JSON: {e}"}
+    if isinstance(item, str):
+        item = {"question": item}
+    if not isinstance(item, dict):
+        return {"id": line_no, "error": f"每行应为 JSON 对象或字符串，而不是 {type(item).__name__}"}
+    item.setdefault("id", line_no)
+    question = item.get("question")
+    if not isinstance(question, str) or not question.strip():
+        return {"id": item["id"], "error": "缺少 question 字段"}
+    return item
+
+
+def read_questions(path: str) -> list[dict]:
+    """
+    读取 JSONL 问题文件
+    
+    每行可以是 {"id": ..., "question": "..."}，也可以直接是一个 JSON 字符串。
+    没有 id 的行用行号作为 id；无法解析的行返回 {"id", "error"}，不会中断整个批次。
+    """
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = _parse_question(line, line_no)
+            if "error" in item:
+                logger.warning("第 %d 行无效: %s", line_no, item["error"])
+            items.append(item)
+    return items
+
+
+async def answer_question(graph, item: dict, config: dict | None = None) -> dict:
+    """运行一个问题，返回带耗时的结果（出错不抛异常，记录在 error 字段）"""
+    started = time.perf_counter()
+    result = {"id": item.get("id")}
+    if "error" in item:
+        # read_questions 没能解析的行（同样带 elapsed_s，每行输出的字段一致）
+        result["error"] = item["error"]
+        result["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return result
+    try:
+        result["question"] = item["question"]
+        with log_context(run_id=str(result["id"])):
+            final_state = await graph.ainvoke(make_initial_state(item["question"]), config)
+        result["final_answer"] = final_state.get("final_answer", "")
+    except Exception as e:
+        logger.warning("问题 %s 失败: %s: %s", result["id"], type(e).__name__, e)
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+async def run_batch(
+    path: str,
+    concurrency: int,
+    output=None,
+    variant: str = "condition",
+    config: dict | None = None,
+):
+    """
+    批量模式 - 在一个事件循环里并发处理 JSONL 文件中的所有问题
+    
+    图只编译一次，最多同时运行 concurrency 个问题，
+    每完成一个就立即输出一行 JSONL（完成顺序，不是输入顺序）。
+    
+    Args:
+        path: 问题文件路径
+        concurrency: 最大并发数
+        output: 结果输出流，默认标准输出
+        variant: 图变体
+        config: 运行配置
+    """
+    output = output or sys.stdout
+    items = read_questions(path)
+    graph = get_graph(variant)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def bounded(item: dict) -> dict:
+        async with semaphore:
+            return await answer_question(graph, item, config)
+    
+    started = time.perf_counter()
+    failed = 0
+    # 进度日志在 stderr 上，stdout 上只有 JSONL
+    for finished in asyncio.as_completed([bounded(item) for item in items]):
+        result = await finished
+        failed += "error" in result
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+    
+    elapsed = time.perf_counter() - started
+    logger.info("✅ 批量完成: %d 个问题, 失败 %d 个, 总耗时 %.1fs", len(items), failed, elapsed)
 
 
 def main():
@@ -69,24 +213,49 @@ def main():
     parser = argparse.ArgumentParser(description="我的多Agent研究助手")
     parser.add_argument("question", nargs="*", help="要研究的问题")
     parser.add_argument("--interactive", "-i", action="store_true", help="交互模式")
+    parser.add_argument("--batch", metavar="FILE", help="批量模式：JSONL 问题文件")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="批量模式的最大并发数")
+    parser.add_argument("--graph", "-g", choices=list(GRAPH_BUILDERS), default="condition", help="使用的图变体")
+    parser.add_argument("--profile", "-p", choices=list(get_profiles()), help="模型档位（默认 MODEL_PROFILE）")
+    parser.add_argument("--max-fanout", type=int, help="fanout 图最多并行研究的子问题数")
+    parser.add_argument("--max-iterations", type=int, help="研究循环的最大次数（0 表示不限制）")
+    parser.add_argument("--deadline", type=float, help="每次运行的研究时间上限，秒（0 表示不限制）")
+    parser.add_argument("--token-budget", type=int, help="每次运行的 token 上限（0 表示不限制）")
+    parser.add_argument("--context-tokens", type=int, help="写作者上下文的 token 预算（0 表示不限制）")
+    parser.add_argument("--quiet", "-q", action="store_true", help="只输出答案和警告，不输出进度日志")
+    parser.add_argument("--verbose", "-v", action="store_true", help="输出调试日志（包括计划和研究结果全文）")
     
     args = parser.parse_args()
     
-    if args.interactive:
+    if args.quiet:
+        configure_logging(level="WARNING")
+    elif args.verbose:
+        configure_logging(level="DEBUG")
+    else:
+        configure_logging()
+    
+    # 运行配置
+    configurable = {}
+    if args.profile:
+        configurable["model_profile"] = args.profile
+    if args.max_fanout:
+        configurable["max_fanout"] = args.max_fanout
+    if args.max_iterations is not None:
+        configurable["max_iterations"] = args.max_iterations
+    if args.deadline is not None:
+        configurable["deadline_s"] = args.deadline
+    if args.token_budget is not None:
+        configurable["token_budget"] = args.token_budget
+    if args.context_tokens is not None:
+        configurable["writer_context_tokens"] = args.context_tokens
+    config = {"configurable": configurable}
+    
+    if args.batch:
+        # 批量模式
+        asyncio.run(run_batch(args.batch, args.concurrency, variant=args.graph, config=config))
+    elif args.interactive:
         # 交互模式
-        print("🦌 欢迎使用多Agent研究助手！")
-        print("输入 'quit' 或 'exit' 退出\n")
-        
-        while True:
-            question = input("请输入你的问题: ").strip()
-            if question.lower() in ["quit", "exit", "q"]:
-                print("再见！👋")
-                break
-            if not question:
-                continue
-            
-            run_sync(question)
-            print("\n")
+        asyncio.run(run_interactive(args.graph, config))
     else:
         # 命令行模式
         if args.question:
@@ -95,7 +264,7 @@ def main():
             question = input("请输入你的问题: ").strip()
         
         if question:
-            run_sync(question)
+            run_sync(question, args.graph, config)
 
 
 if __name__ == "__main__":
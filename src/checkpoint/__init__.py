@@ -0,0 +1,34 @@
+from .serde import CompressedSerializer
+from .delta import DeltaCheckpointSaver
+from .history import (
+    HistoryEntry, HistoryPage,
+    get_history_page, aget_history_page,
+    iter_history, aiter_history,
+    get_history_state, aget_history_state,
+    aiter_metadata,
+)
+
+__all__ = [
+    "CompressedSerializer",
+    "DeltaCheckpointSaver",
+    "HistoryEntry",
+    "HistoryPage",
+    "get_history_page",
+    "aget_history_page",
+    "iter_history",
+    "aiter_history",
+    "get_history_state",
+    "aget_history_state",
+    "aiter_metadata",
+    "PooledAsyncSqliteSaver",
+    "RetentionPolicy",
+    "create_checkpointer",
+]
+
+
+def __getattr__(name: str):
+    # SQLite checkpointer 依赖 langgraph-checkpoint-sqlite / aiosqlite，用到时才导入
+    if name in ("PooledAsyncSqliteSaver", "RetentionPolicy", "create_checkpointer"):
+        from . import sqlite
+        return getattr(sqlite, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
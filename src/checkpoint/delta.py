@@ -0,0 +1,263 @@
+"""
+增量 checkpoint - 只保存相邻 checkpoint 之间变化的部分
+
+每个 super-step 都会保存完整的 State：很长的 plan / research_results / final_answer
+和全部 messages。像 SqliteSaver 这样把整个 checkpoint 存成一行的持久化存储，
+每一步都要写入完整的状态大小，而且随对话轮数线性增长。
+
+DeltaCheckpointSaver 包在任意 checkpointer 外面：
+- 写入时，只保存本步有新版本的通道（new_versions），
+  没变化的通道记录为"继承自父 checkpoint"
+- 列表通道（如 messages）如果只是在父 checkpoint 的基础上追加，只保存追加的部分
+- 每隔 keyframe_interval 步写一次完整的关键帧，限制读取时回溯的深度
+- 读取时沿父 checkpoint 链还原，返回的状态和不做增量时完全一样
+
+增量编码要求内部 saver 把 channel_values 原样存在 checkpoint 里。
+InMemorySaver / PostgresSaver 这类按 (通道, 版本) 单独存 blob 的 saver 只会保存
+new_versions 里的通道，增量标记和"只存追加部分"都会被破坏；它们本身已经不会
+重复存储没变化的通道，所以包装这类 saver 时直接透传，只保留历史摘要。
+
+配合 CompressedSerializer 使用，写入量和数据库大小都能明显下降：
+    saver = DeltaCheckpointSaver(SqliteSaver(conn, serde=CompressedSerializer()))
+"""
+
+from collections import OrderedDict
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+
+from .history import with_summary
+
+
+# 增量标记存放在 channel_values 的这个 key 下（不是真正的通道）
+DELTA_KEY = "__delta__"
+
+# 内存中最多记录多少个 thread 的最新 checkpoint
+MAX_TRACKED_THREADS = 1000
+
+# 按通道版本单独存 blob 的 saver 所在的模块（可选依赖，按模块名判断，不导入）
+PER_CHANNEL_MODULES = ("langgraph.checkpoint.postgres",)
+
+
+def _thread_key(config: RunnableConfig) -> tuple[str, str]:
+    configurable = config["configurable"]
+    return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+
+def _base_config(tup: CheckpointTuple, base_id: str) -> RunnableConfig:
+    thread_id, checkpoint_ns = _thread_key(tup.config)
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": base_id}}
+
+
+def _appended(old, new) -> int | None:
+    """new 是否是在 old 后面追加（或没有变化）得到的列表，是则返回 old 的长度"""
+    if not isinstance(old, list) or not isinstance(new, list) or len(new) < len(old):
+        return None
+    for a, b in zip(old, new):
+        if a is not b and a != b:
+            return None
+    return len(old)
+
+
+def stores_inline(saver: BaseCheckpointSaver) -> bool:
+    """saver 是否把 channel_values 原样存在 checkpoint 里（增量编码的前提）"""
+    if isinstance(saver, InMemorySaver):
+        return False
+    return not type(saver).__module__.startswith(PER_CHANNEL_MODULES)
+
+
+class DeltaCheckpointSaver(BaseCheckpointSaver):
+    """
+    增量 checkpoint 包装器
+
+    Args:
+        inner: 实际存储 checkpoint 的 saver（如 SqliteSaver / AsyncSqliteSaver）；
+            按通道存 blob 的 saver（如 InMemorySaver）不做增量编码，直接透传
+        keyframe_interval: 每隔多少个 checkpoint 写一次完整关键帧
+    """
+
+    def __init__(self, inner: BaseCheckpointSaver, keyframe_interval: int = 10):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.keyframe_interval = keyframe_interval
+        self.enabled = stores_inline(inner)
+        # (thread_id, checkpoint_ns) -> (最新 checkpoint id, 距离关键帧的步数, 完整的通道值)
+        # 只有父 checkpoint 正好是记录的最新 checkpoint 时才写增量，否则写关键帧
+        self._latest: OrderedDict[tuple, tuple[str, int, dict]] = OrderedDict()
+
+    # ------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------
+
+    def _encode(self, config: RunnableConfig, checkpoint: dict, new_versions: dict) -> dict:
+        """把完整的 checkpoint 转换为要存储的（可能是增量的）checkpoint"""
+        if not self.enabled:
+            return checkpoint
+        key = _thread_key(config)
+        parent_id = config["configurable"].get("checkpoint_id")
+        latest = self._latest.get(key)
+        values = checkpoint["channel_values"]
+
+        if latest is None or latest[0] != parent_id or latest[1] + 1 >= self.keyframe_interval:
+            depth = 0
+            stored = checkpoint
+        else:
+            depth = latest[1] + 1
+            parent_values = latest[2]
+            delta_values = {}
+            inherited = []
+            appended = {}
+            for channel, value in values.items():
+                if channel not in new_versions and channel in parent_values:
+                    inherited.append(channel)
+                    continue
+                offset = _appended(parent_values.get(channel), value)
+                if offset is not None:
+                    appended[channel] = offset
+                    value = value[offset:]
+                delta_values[channel] = value
+            delta_values[DELTA_KEY] = {"base": parent_id, "inherited": inherited, "appended": appended}
+            stored = {**checkpoint, "channel_values": delta_values}
+
+        self._latest[key] = (checkpoint["id"], depth, values)
+        self._latest.move_to_end(key)
+        while len(self._latest) > MAX_TRACKED_THREADS:
+            self._latest.popitem(last=False)
+        return stored
+
+    def put(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        # 历史摘要要在增量编码之前根据完整状态计算
+        metadata = with_summary(metadata, checkpoint, new_versions)
+        stored = self._encode(config, checkpoint, new_versions)
+        return self.inner.put(config, stored, metadata, new_versions)
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        metadata = with_summary(metadata, checkpoint, new_versions)
+        stored = self._encode(config, checkpoint, new_versions)
+        return await self.inner.aput(config, stored, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path="") -> None:
+        self.inner.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config, writes, task_id, task_path="") -> None:
+        await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    # ------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _base_id(tup: CheckpointTuple) -> str | None:
+        marker = tup.checkpoint["channel_values"].get(DELTA_KEY)
+        return marker["base"] if marker else None
+
+    @staticmethod
+    def _apply(tup: CheckpointTuple, resolved: dict) -> dict:
+        """用已还原的父 checkpoint 通道值还原 tup 的完整通道值"""
+        values = dict(tup.checkpoint["channel_values"])
+        marker = values.pop(DELTA_KEY, None)
+        if marker is None:
+            return values
+        base = resolved[marker["base"]]
+        try:
+            for channel in marker["inherited"]:
+                values[channel] = base[channel]
+            for channel, offset in marker.get("appended", {}).items():
+                values[channel] = base[channel][:offset] + values[channel]
+        except KeyError as e:
+            raise LookupError(f"父 checkpoint 中缺少通道: {e}") from None
+        return values
+
+    def _fold(self, chain: list, resolved: dict) -> CheckpointTuple:
+        """chain 从当前 checkpoint 到第一个已还原（或关键帧）的祖先，从后往前还原"""
+        for tup in reversed(chain):
+            resolved[tup.checkpoint["id"]] = self._apply(tup, resolved)
+        tup = chain[0]
+        return tup._replace(checkpoint={**tup.checkpoint, "channel_values": resolved[tup.checkpoint["id"]]})
+
+    @staticmethod
+    def _missing_base(base_id: str):
+        return LookupError(f"增量 checkpoint 的父 checkpoint {base_id} 不存在，可能已被删除")
+
+    def _resolve(self, tup: CheckpointTuple | None, raw: dict | None = None, resolved: dict | None = None):
+        if tup is None:
+            return None
+        raw = raw if raw is not None else {}
+        resolved = resolved if resolved is not None else {}
+        chain = [tup]
+        base_id = self._base_id(tup)
+        while base_id is not None and base_id not in resolved:
+            base = raw.get(base_id) or self.inner.get_tuple(_base_config(tup, base_id))
+            if base is None:
+                raise self._missing_base(base_id)
+            chain.append(base)
+            base_id = self._base_id(base)
+        return self._fold(chain, resolved)
+
+    async def _aresolve(self, tup: CheckpointTuple | None, raw: dict | None = None, resolved: dict | None = None):
+        if tup is None:
+            return None
+        raw = raw if raw is not None else {}
+        resolved = resolved if resolved is not None else {}
+        chain = [tup]
+        base_id = self._base_id(tup)
+        while base_id is not None and base_id not in resolved:
+            base = raw.get(base_id) or await self.inner.aget_tuple(_base_config(tup, base_id))
+            if base is None:
+                raise self._missing_base(base_id)
+            chain.append(base)
+            base_id = self._base_id(base)
+        return self._fold(chain, resolved)
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self._resolve(self.inner.get_tuple(config))
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await self._aresolve(await self.inner.aget_tuple(config))
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        # SqliteSaver 在遍历期间持有连接锁，先读完再还原；
+        # 同一批读到的原始 checkpoint 和还原结果可以给后面的 checkpoint 复用
+        tuples = list(self.inner.list(config, filter=filter, before=before, limit=limit))
+        raw = {tup.checkpoint["id"]: tup for tup in tuples}
+        resolved = {}
+        for tup in tuples:
+            yield self._resolve(tup, raw, resolved)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        tuples = [tup async for tup in self.inner.alist(config, filter=filter, before=before, limit=limit)]
+        raw = {tup.checkpoint["id"]: tup for tup in tuples}
+        resolved = {}
+        for tup in tuples:
+            yield await self._aresolve(tup, raw, resolved)
+
+    # ------------------------------------------------------------
+    # 其他操作直接交给内部 saver
+    # ------------------------------------------------------------
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    def _forget(self, thread_ids) -> None:
+        thread_ids = {str(thread_id) for thread_id in thread_ids}
+        for key in [key for key in self._latest if key[0] in thread_ids]:
+            del self._latest[key]
+
+    def prune(self, thread_ids, *, strategy: str = "keep_latest") -> None:
+        if strategy == "delete":
+            self._forget(thread_ids)
+        self.inner.prune(thread_ids, strategy=strategy)
+
+    async def aprune(self, thread_ids, *, strategy: str = "keep_latest") -> None:
+        if strategy == "delete":
+            self._forget(thread_ids)
+        await self.inner.aprune(thread_ids, strategy=strategy)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._forget([thread_id])
+        self.inner.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._forget([thread_id])
+        await self.inner.adelete_thread(thread_id)
@@ -0,0 +1,243 @@
+"""
+分页的状态历史 - Time Travel 用的轻量历史列表
+
+graph.get_state_history(config) 会读出并反序列化一个 thread 的全部 checkpoint，
+包括每一步完整的 messages 列表。thread 有几千个 checkpoint 时，
+只是想看最近几步也要把所有状态都加载一遍。
+
+这里提供按游标分页的历史 API：
+- 每页只读取 limit 个 checkpoint，返回轻量的 HistoryEntry（步数、节点、有数据的字段）
+- 写入时把摘要记录在 checkpoint 的 metadata 里（见 summarize_checkpoint），
+  PooledAsyncSqliteSaver 列历史时只读 metadata，不加载和反序列化状态本身
+- 需要完整状态时再用 get_history_state 按 checkpoint id 加载
+
+用法:
+    page = get_history_page(graph, config, limit=5)
+    for entry in page.entries:
+        print(entry.step, entry.node, entry.fields)
+    page = get_history_page(graph, config, cursor=page.cursor, limit=5)   # 下一页
+    snapshot = get_history_state(graph, page.entries[0])                  # 完整状态
+"""
+
+from dataclasses import dataclass
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+
+# 写入 checkpoint metadata 的摘要 key
+SUMMARY_KEY = "summary"
+
+
+def summarize_checkpoint(checkpoint: dict, updated=None) -> dict:
+    """
+    计算 checkpoint 的摘要
+
+    Args:
+        checkpoint: 完整的（非增量的）checkpoint
+        updated: 本步更新的通道（put 时的 new_versions），默认读取 checkpoint 的 updated_channels
+
+    Returns:
+        {"fields": 有数据的状态字段, "next": 下一步要执行的节点}
+    """
+    values = checkpoint["channel_values"]
+    if updated is None:
+        updated = checkpoint.get("updated_channels") or values.keys()
+
+    fields = [k for k, v in values.items() if v and not k.startswith(("branch:", "__"))]
+    next_nodes = [k.removeprefix("branch:to:") for k in values if k.startswith("branch:to:")]
+    if "__start__" in values:
+        next_nodes.append("__start__")
+    if "__pregel_tasks" in updated:
+        # Send 发出的任务（并行研究员）
+        for send in values.get("__pregel_tasks") or []:
+            node = getattr(send, "node", None)
+            if node and node not in next_nodes:
+                next_nodes.append(node)
+    return {"fields": fields, "next": next_nodes}
+
+
+def with_summary(metadata: dict, checkpoint: dict, new_versions) -> dict:
+    """给 metadata 加上摘要（已经有摘要时原样返回）"""
+    if SUMMARY_KEY in metadata:
+        return metadata
+    return {**metadata, SUMMARY_KEY: summarize_checkpoint(checkpoint, new_versions)}
+
+
+@dataclass(frozen=True)
+class HistoryEntry:
+    """历史中的一个 checkpoint（不含状态本身）"""
+
+    checkpoint_id: str
+    parent_id: str | None
+    step: int
+    source: str
+    node: tuple[str, ...]      # 产生这个 checkpoint 的节点
+    next: tuple[str, ...]      # 之后要执行的节点
+    fields: tuple[str, ...]    # 有数据的状态字段
+    config: RunnableConfig     # 传给 graph.get_state 即可加载完整状态
+
+
+@dataclass(frozen=True)
+class HistoryPage:
+    """一页历史，cursor 传给下一次调用获取更早的历史，None 表示没有更多了"""
+
+    entries: list[HistoryEntry]
+    cursor: str | None
+
+
+# ============================================================
+# 读取
+# ============================================================
+
+def _checkpointer(graph) -> BaseCheckpointSaver:
+    if isinstance(graph, BaseCheckpointSaver):
+        return graph
+    checkpointer = getattr(graph, "checkpointer", None)
+    if checkpointer is None:
+        bound = getattr(graph, "bound", None)    # get_graph 返回的 with_config 包装
+        checkpointer = getattr(bound, "checkpointer", None)
+    if not isinstance(checkpointer, BaseCheckpointSaver):
+        raise ValueError("图没有配置 checkpointer，无法查看历史")
+    return checkpointer
+
+
+def _metadata_source(checkpointer: BaseCheckpointSaver):
+    """找到能只读 metadata 的存储（跳过 DeltaCheckpointSaver 等包装）"""
+    while checkpointer is not None:
+        if hasattr(checkpointer, "alist_metadata"):
+            return checkpointer
+        checkpointer = getattr(checkpointer, "inner", None)
+    return None
+
+
+def _query(config: RunnableConfig, cursor: str | None):
+    configurable = config["configurable"]
+    thread_config = {"configurable": {
+        "thread_id": configurable["thread_id"],
+        "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+    }}
+    before = {"configurable": {"checkpoint_id": cursor}} if cursor else None
+    return thread_config, before
+
+
+def _row(config: RunnableConfig, parent_config: RunnableConfig | None, metadata: dict, checkpoint: dict | None):
+    summary = metadata.get(SUMMARY_KEY)
+    if summary is None:
+        # 没有写入摘要的 checkpoint（旧数据或其他 checkpointer），从状态本身计算
+        summary = summarize_checkpoint(checkpoint) if checkpoint is not None else {"fields": [], "next": []}
+    return config, parent_config, metadata, summary
+
+
+def _page(rows: list, limit: int) -> HistoryPage:
+    """rows 比 limit 多取一个：用来判断是否还有下一页，并补齐最后一个 entry 的 node"""
+    entries = []
+    for i, (config, parent_config, metadata, summary) in enumerate(rows[:limit]):
+        # 产生这个 checkpoint 的节点 = 上一个 checkpoint 的 next
+        older = rows[i + 1][3]["next"] if i + 1 < len(rows) else []
+        configurable = config["configurable"]
+        entries.append(HistoryEntry(
+            checkpoint_id=configurable["checkpoint_id"],
+            parent_id=parent_config["configurable"]["checkpoint_id"] if parent_config else None,
+            step=metadata.get("step", -1),
+            source=metadata.get("source", ""),
+            node=tuple(older),
+            next=tuple(summary["next"]),
+            fields=tuple(summary["fields"]),
+            config=config,
+        ))
+    cursor = entries[-1].checkpoint_id if len(rows) > limit and entries else None
+    return HistoryPage(entries=entries, cursor=cursor)
+
+
+def get_history_page(graph, config: RunnableConfig, cursor: str | None = None, limit: int = 20) -> HistoryPage:
+    """
+    读取一页历史（从新到旧）
+
+    Args:
+        graph: 编译好的图（或 checkpointer）
+        config: 包含 thread_id 的 config
+        cursor: 上一页返回的 cursor，None 表示从最新的 checkpoint 开始
+        limit: 每页的条数
+    """
+    checkpointer = _checkpointer(graph)
+    thread_config, before = _query(config, cursor)
+    source = _metadata_source(checkpointer)
+    if source is not None:
+        rows = [
+            _row(c, p, m, None)
+            for c, p, m in source.list_metadata(thread_config, before=before, limit=limit + 1)
+        ]
+    else:
+        rows = [
+            _row(t.config, t.parent_config, t.metadata, t.checkpoint)
+            for t in checkpointer.list(thread_config, before=before, limit=limit + 1)
+        ]
+    return _page(rows, limit)
+
+
+async def aget_history_page(graph, config: RunnableConfig, cursor: str | None = None, limit: int = 20) -> HistoryPage:
+    """get_history_page 的异步版本"""
+    checkpointer = _checkpointer(graph)
+    thread_config, before = _query(config, cursor)
+    source = _metadata_source(checkpointer)
+    if source is not None:
+        rows = [
+            _row(c, p, m, None)
+            async for c, p, m in source.alist_metadata(thread_config, before=before, limit=limit + 1)
+        ]
+    else:
+        rows = [
+            _row(t.config, t.parent_config, t.metadata, t.checkpoint)
+            async for t in checkpointer.alist(thread_config, before=before, limit=limit + 1)
+        ]
+    return _page(rows, limit)
+
+
+def iter_history(graph, config: RunnableConfig, page_size: int = 20):
+    """按页惰性遍历全部历史（从新到旧）"""
+    cursor = None
+    while True:
+        page = get_history_page(graph, config, cursor=cursor, limit=page_size)
+        yield from page.entries
+        if page.cursor is None:
+            return
+        cursor = page.cursor
+
+
+async def aiter_history(graph, config: RunnableConfig, page_size: int = 20):
+    """iter_history 的异步版本"""
+    cursor = None
+    while True:
+        page = await aget_history_page(graph, config, cursor=cursor, limit=page_size)
+        for entry in page.entries:
+            yield entry
+        if page.cursor is None:
+            return
+        cursor = page.cursor
+
+
+async def aiter_metadata(checkpointer: BaseCheckpointSaver, config: RunnableConfig | None, *, filter: dict | None = None):
+    """
+    只列出 checkpoint 的 (config, metadata)，从新到旧
+
+    存储支持只读 metadata（PooledAsyncSqliteSaver）时不加载状态本身，否则退回 alist。
+    config 为 None 时列出所有 thread。
+    """
+    source = _metadata_source(checkpointer)
+    if source is not None:
+        async for config, _, metadata in source.alist_metadata(config, filter=filter):
+            yield config, metadata
+    else:
+        async for tup in checkpointer.alist(config, filter=filter):
+            yield tup.config, tup.metadata
+
+
+def get_history_state(graph, entry: HistoryEntry):
+    """加载某个历史 checkpoint 的完整状态（StateSnapshot）"""
+    return graph.get_state(entry.config)
+
+
+async def aget_history_state(graph, entry: HistoryEntry):
+    """get_history_state 的异步版本"""
+    return await graph.aget_state(entry.config)
@@ -0,0 +1,73 @@
+"""
+压缩序列化器 - 在 LangGraph 默认序列化器外面包一层压缩
+
+checkpoint 里有很长的 plan / research_results / final_answer 字符串和完整的消息列表，
+文本压缩率很高。CompressedSerializer 对序列化后的字节做压缩：
+- 安装了 zstandard 时使用 zstd，否则使用标准库 zlib
+- 小于 min_size 的数据不压缩（压缩头的开销不划算）
+- 类型字符串加上 "+zstd" / "+zlib" 后缀，读取时自动识别，未压缩的旧数据也能正常读取
+"""
+
+import zlib
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:  # zstandard 是可选依赖
+    zstandard = None
+
+
+class CompressedSerializer(SerializerProtocol):
+    """
+    压缩序列化器
+
+    Args:
+        inner: 实际的序列化器，默认 JsonPlusSerializer
+        codec: "zstd" 或 "zlib"，默认有 zstandard 时用 zstd
+        level: 压缩级别
+        min_size: 小于这个字节数的数据不压缩
+    """
+
+    def __init__(
+        self,
+        inner: SerializerProtocol | None = None,
+        codec: str | None = None,
+        level: int = 3,
+        min_size: int = 256,
+    ):
+        self.inner = inner or JsonPlusSerializer()
+        self.codec = codec or ("zstd" if zstandard is not None else "zlib")
+        if self.codec == "zstd" and zstandard is None:
+            raise ImportError("使用 zstd 压缩需要安装 zstandard: pip install zstandard")
+        self.level = level
+        self.min_size = min_size
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, self.level)
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise ImportError("读取 zstd 压缩的 checkpoint 需要安装 zstandard")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec == "zlib":
+            return zlib.decompress(data)
+        raise ValueError(f"未知的压缩格式: {codec}")
+
+    def dumps_typed(self, obj) -> tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        if data is None or len(data) < self.min_size:
+            return type_, data
+        return f"{type_}+{self.codec}", self._compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]):
+        type_, payload = data
+        base, sep, codec = type_.rpartition("+")
+        if sep and codec in ("zstd", "zlib"):
+            return self.inner.loads_typed((base, self._decompress(codec, payload)))
+        return self.inner.loads_typed((type_, payload))
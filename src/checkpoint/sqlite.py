@@ -0,0 +1,586 @@
+"""
+异步 SQLite checkpointer - 连接池、WAL、批量提交、保留策略
+
+examples/01_persistence.py 用的 MemorySaver 进程重启就没了，同步的 SqliteSaver
+只有一个连接、每次写入都单独提交，多个异步 worker 同时运行时会互相阻塞。
+
+PooledAsyncSqliteSaver 在 AsyncSqliteSaver 的基础上：
+- WAL 模式：读写互不阻塞
+- 只读连接池：读取（get_state / 历史）从有上限的连接池中取连接，并发执行
+- 批量提交（group commit）：所有写入交给一个后台写入任务，
+  一小段时间窗口内的多次写入合并成一个事务提交，aput 仍然等到提交完成才返回
+- 保留策略：每个 thread 只保留最近 K 个 checkpoint，或者 T 秒内的 checkpoint，
+  每写入若干次就在后台清理一次；和 DeltaCheckpointSaver 一起使用时，
+  保留下来的增量 checkpoint 依赖的父 checkpoint 不会被删除
+
+使用 create_checkpointer 创建（所有图构建器都可以传入 checkpointer）:
+    async with create_checkpointer("checkpoints.db") as checkpointer:
+        graph = build_graph(checkpointer=checkpointer)
+        await graph.ainvoke(state, {"configurable": {"thread_id": "1"}})
+
+环境变量:
+    CHECKPOINT_DB             数据库文件路径
+    CHECKPOINT_POOL_SIZE      只读连接池大小
+    CHECKPOINT_BATCH_MS       批量提交的时间窗口（毫秒）
+    CHECKPOINT_MAX_BATCH      一个事务最多合并的写入数
+    CHECKPOINT_KEEP_LAST      每个 thread 保留最近多少个 checkpoint（0 表示不按数量清理）
+    CHECKPOINT_MAX_AGE_S      保留多少秒内的 checkpoint（0 表示不按时间清理）
+    CHECKPOINT_PRUNE_EVERY    每个 thread 每写入多少个 checkpoint 清理一次
+    CHECKPOINT_COMPRESS       是否压缩（1 / 0）
+    CHECKPOINT_DELTA          是否增量保存（1 / 0）
+"""
+
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import WRITES_IDX_MAP, CheckpointTuple, get_checkpoint_id, get_checkpoint_metadata
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.checkpoint.sqlite.utils import load_pending_writes, pending_writes_sql, search_where
+
+from .delta import DELTA_KEY, DeltaCheckpointSaver
+from .history import with_summary
+from .serde import CompressedSerializer
+
+
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", ".cache/checkpoints.db")
+CHECKPOINT_POOL_SIZE = int(os.getenv("CHECKPOINT_POOL_SIZE", "4"))
+CHECKPOINT_BATCH_MS = float(os.getenv("CHECKPOINT_BATCH_MS", "5"))
+CHECKPOINT_MAX_BATCH = int(os.getenv("CHECKPOINT_MAX_BATCH", "64"))
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    checkpoint 保留策略（0 表示不限制）
+
+    一个 checkpoint 只要满足任意一条就保留：属于最近 keep_last 个，或者在 max_age_s 秒内。
+    每个 thread 最新的 checkpoint 总是保留，保证会话可以继续。
+    """
+
+    keep_last: int = int(os.getenv("CHECKPOINT_KEEP_LAST", "0"))
+    max_age_s: float = float(os.getenv("CHECKPOINT_MAX_AGE_S", "0"))
+    prune_every: int = int(os.getenv("CHECKPOINT_PRUNE_EVERY", "20"))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.keep_last or self.max_age_s)
+
+    def keep(self, index: int, created_at: float | None, now: float) -> bool:
+        """index 是该 checkpoint 在 thread 中从新到旧的序号"""
+        if index == 0 or not self.enabled:
+            return True
+        if self.keep_last and index < self.keep_last:
+            return True
+        if self.max_age_s and created_at is not None and now - created_at <= self.max_age_s:
+            return True
+        return False
+
+
+def _timestamp(checkpoint: dict) -> float:
+    try:
+        return datetime.fromisoformat(checkpoint["ts"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+def _tuple(row, writes, serde) -> CheckpointTuple:
+    thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata = row
+    return CheckpointTuple(
+        {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+        serde.loads_typed((type_, checkpoint)),
+        json.loads(metadata) if metadata is not None else {},
+        (
+            {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+            if parent_checkpoint_id
+            else None
+        ),
+        load_pending_writes(writes, serde),
+    )
+
+
+_SELECT = (
+    "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata "
+    "FROM checkpoints"
+)
+
+
+class PooledAsyncSqliteSaver(AsyncSqliteSaver):
+    """
+    带只读连接池、批量提交和保留策略的 AsyncSqliteSaver
+
+    Args:
+        conn: 写入连接（也用于建表）
+        path: 数据库文件路径，用于打开只读连接（":memory:" 时读写共用 conn）
+        pool_size: 只读连接池大小
+        batch_ms: 批量提交的时间窗口（毫秒）
+        max_batch: 一个事务最多合并的写入数
+        retention: 保留策略
+        serde: 序列化器
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        path: str,
+        *,
+        pool_size: int = CHECKPOINT_POOL_SIZE,
+        batch_ms: float = CHECKPOINT_BATCH_MS,
+        max_batch: int = CHECKPOINT_MAX_BATCH,
+        retention: RetentionPolicy | None = None,
+        serde=None,
+    ):
+        super().__init__(conn, serde=serde)
+        self.path = path
+        self.pool_size = pool_size if path != ":memory:" else 0
+        self.batch_ms = batch_ms
+        self.max_batch = max_batch
+        self.retention = retention or RetentionPolicy()
+        self.commits = 0
+        self.batched_writes = 0
+        self.pruned = 0
+        self._readers: asyncio.Queue = asyncio.Queue()
+        self._reader_conns: list[aiosqlite.Connection] = []
+        self._writes: asyncio.Queue = asyncio.Queue()
+        self._writer: asyncio.Task | None = None
+        self._puts: dict[str, int] = {}
+        self._background: set[asyncio.Task] = set()
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        async with self.lock:
+            await self.conn.execute("PRAGMA synchronous=NORMAL")
+            await self.conn.execute("PRAGMA busy_timeout=5000")
+            try:
+                # 保留策略按写入时间清理，记录在额外的一列里
+                await self.conn.execute("ALTER TABLE checkpoints ADD COLUMN created_at REAL")
+            except aiosqlite.OperationalError as e:
+                if "duplicate column name" not in str(e):
+                    raise
+            await self.conn.commit()
+            for _ in range(self.pool_size - len(self._reader_conns)):
+                reader = await aiosqlite.connect(self.path)
+                await reader.execute("PRAGMA busy_timeout=5000")
+                await reader.execute("PRAGMA query_only=ON")
+                self._reader_conns.append(reader)
+                self._readers.put_nowait(reader)
+            if self._writer is None:
+                self._writer = asyncio.create_task(self._write_loop())
+
+    async def aclose(self) -> None:
+        """等待后台清理和排队中的写入完成，关闭写入任务和只读连接"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self._writer is not None:
+            await self._writes.put(None)
+            await self._writer
+            self._writer = None
+        for reader in self._reader_conns:
+            await reader.close()
+        self._reader_conns.clear()
+
+    # ------------------------------------------------------------
+    # 批量提交
+    # ------------------------------------------------------------
+
+    async def _submit(self, statements: list[tuple[str, list]]) -> None:
+        """把一组语句交给写入任务，等它们所在的事务提交后返回"""
+        await self.setup()
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((statements, future))
+        await future
+
+    async def _execute(self, statements: list[tuple[str, list]]) -> None:
+        for sql, rows in statements:
+            await self.conn.executemany(sql, rows)
+
+    async def _write_loop(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._writes.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_ms / 1000
+            # 在时间窗口内继续收集写入，合并到同一个事务
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._writes.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._writes.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            async with self.lock:
+                try:
+                    for statements, _ in batch:
+                        await self._execute(statements)
+                    await self.conn.commit()
+                    results = [None] * len(batch)
+                    self.commits += 1
+                except Exception:
+                    # 整批失败时逐个重试，一个写入出错不影响同一批的其他写入
+                    await self.conn.rollback()
+                    results = []
+                    for statements, _ in batch:
+                        try:
+                            await self._execute(statements)
+                            await self.conn.commit()
+                            results.append(None)
+                            self.commits += 1
+                        except Exception as e:
+                            await self.conn.rollback()
+                            results.append(e)
+            self.batched_writes += len(batch)
+
+            for (_, future), error in zip(batch, results):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+    # ------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        if DELTA_KEY not in checkpoint["channel_values"]:
+            # 列历史时只读 metadata 里的摘要（增量 checkpoint 的摘要由 DeltaCheckpointSaver 计算）
+            metadata = with_summary(metadata, checkpoint, new_versions)
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        await self._submit([(
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(
+                thread_id,
+                checkpoint_ns,
+                checkpoint["id"],
+                config["configurable"].get("checkpoint_id"),
+                type_,
+                serialized,
+                serialized_metadata,
+                _timestamp(checkpoint),
+            )],
+        )])
+
+        if self.retention.enabled:
+            count = self._puts.get(thread_id, 0) + 1
+            self._puts[thread_id] = count
+            if count % self.retention.prune_every == 0:
+                # 清理在后台进行，不增加本次写入的延迟
+                task = asyncio.create_task(self.apply_retention(thread_id))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    async def aput_writes(self, config, writes, task_id, task_path="") -> None:
+        replace = all(w[0] in WRITES_IDX_MAP for w in writes)
+        sql = (
+            f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes (thread_id, checkpoint_ns, checkpoint_id, "
+            "task_id, task_path, idx, channel, type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        configurable = config["configurable"]
+        rows = [
+            (
+                str(configurable["thread_id"]),
+                str(configurable.get("checkpoint_ns", "")),
+                str(configurable["checkpoint_id"]),
+                task_id,
+                task_path,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        await self._submit([(sql, rows)])
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._puts.pop(str(thread_id), None)
+        await self._submit([
+            ("DELETE FROM checkpoints WHERE thread_id = ?", [(str(thread_id),)]),
+            ("DELETE FROM writes WHERE thread_id = ?", [(str(thread_id),)]),
+        ])
+
+    # ------------------------------------------------------------
+    # 读取 - 从只读连接池中取连接
+    # ------------------------------------------------------------
+
+    @asynccontextmanager
+    async def _reader(self):
+        await self.setup()
+        if not self.pool_size:
+            async with self.lock:
+                yield self.conn
+            return
+        reader = await self._readers.get()
+        try:
+            yield reader
+        finally:
+            self._readers.put_nowait(reader)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        async with self._reader() as conn:
+            if checkpoint_id := get_checkpoint_id(config):
+                cursor = await conn.execute(
+                    f"{_SELECT} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            else:
+                cursor = await conn.execute(
+                    f"{_SELECT} WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                )
+            row = await cursor.fetchone()
+            if row is None:
+                return None
+            cursor = await conn.execute(pending_writes_sql(self._has_task_path), (thread_id, checkpoint_ns, row[2]))
+            writes = await cursor.fetchall()
+        return _tuple(row, writes, self.serde)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        where, params = search_where(config, filter, before)
+        query = f"{_SELECT} {where} ORDER BY checkpoint_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (*params, limit)
+        # 先读完再释放连接，遍历期间不占用连接池
+        async with self._reader() as conn:
+            cursor = await conn.execute(query, params)
+            rows = await cursor.fetchall()
+            pending = []
+            for row in rows:
+                cursor = await conn.execute(pending_writes_sql(self._has_task_path), (row[0], row[1], row[2]))
+                pending.append(await cursor.fetchall())
+        for row, writes in zip(rows, pending):
+            yield _tuple(row, writes, self.serde)
+
+    async def alist_metadata(self, config, *, filter=None, before=None, limit=None):
+        """
+        只列出 checkpoint 的 config / 父 config / metadata，不读取和反序列化状态本身
+
+        Args:
+            config: 只列这个 thread（None 表示所有 thread）
+            filter: 按 metadata 过滤，和 alist 的 filter 相同
+
+        Yields:
+            (config, parent_config, metadata)，从新到旧
+        """
+        where, params = search_where(config, filter, before)
+        query = (
+            f"SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, metadata FROM checkpoints "
+            f"{where} ORDER BY checkpoint_id DESC"
+        )
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (*params, limit)
+        async with self._reader() as conn:
+            cursor = await conn.execute(query, params)
+            rows = await cursor.fetchall()
+        for thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, metadata in rows:
+            yield (
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+                (
+                    {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                    if parent_checkpoint_id
+                    else None
+                ),
+                json.loads(metadata) if metadata is not None else {},
+            )
+
+    def list_metadata(self, config, *, filter=None, before=None, limit=None):
+        """alist_metadata 的同步版本（只能在事件循环之外的线程调用，和 list 一样）"""
+        async def collect():
+            return [row async for row in self.alist_metadata(config, filter=filter, before=before, limit=limit)]
+
+        return asyncio.run_coroutine_threadsafe(collect(), self.loop).result()
+
+    # ------------------------------------------------------------
+    # 保留策略
+    # ------------------------------------------------------------
+
+    async def apply_retention(self, thread_id: str | None = None) -> int:
+        """
+        按保留策略清理 checkpoint
+
+        Args:
+            thread_id: 只清理这个 thread，None 表示清理所有 thread
+
+        Returns:
+            删除的 checkpoint 数量
+        """
+        if not self.retention.enabled:
+            return 0
+        now = time.time()
+        thread_ids = None if thread_id is None else [str(thread_id)]
+        return await self._prune(thread_ids, lambda position, created_at: self.retention.keep(position, created_at, now))
+
+    async def aprune(self, thread_ids, *, strategy: str = "keep_latest") -> None:
+        """
+        BaseCheckpointSaver 的清理接口
+
+        Args:
+            thread_ids: 要清理的 thread 列表
+            strategy: "keep_latest" 每个 namespace 只保留最新的 checkpoint（以及它依赖的增量父链），
+                "delete" 删除整个 thread
+        """
+        if isinstance(thread_ids, str):
+            raise TypeError("thread_ids 应为 thread_id 的列表")
+        if strategy == "delete":
+            for thread_id in thread_ids:
+                await self.adelete_thread(thread_id)
+        elif strategy == "keep_latest":
+            thread_ids = [str(thread_id) for thread_id in thread_ids]
+            if thread_ids:
+                await self._prune(thread_ids, lambda position, created_at: position == 0)
+        else:
+            raise ValueError(f"未知的清理策略: {strategy}，可选: ['keep_latest', 'delete']")
+
+    async def _prune(self, thread_ids: list[str] | None, keep_fn) -> int:
+        """删除 keep_fn(从新到旧的序号, 创建时间) 为假的 checkpoint，thread_ids 为 None 表示所有 thread"""
+        async with self._reader() as conn:
+            if thread_ids is None:
+                cursor = await conn.execute(
+                    "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, created_at FROM checkpoints "
+                    "ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+                )
+            else:
+                cursor = await conn.execute(
+                    "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, created_at FROM checkpoints "
+                    f"WHERE thread_id IN ({', '.join('?' * len(thread_ids))}) "
+                    "ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC",
+                    thread_ids,
+                )
+            rows = await cursor.fetchall()
+
+            # 按 (thread_id, checkpoint_ns) 分组，从新到旧编号
+            keep: set[tuple] = set()
+            parents: dict[tuple, str | None] = {}
+            index: dict[tuple, int] = {}
+            for tid, ns, cid, parent_id, created_at in rows:
+                group = (tid, ns)
+                position = index.get(group, 0)
+                index[group] = position + 1
+                parents[(tid, ns, cid)] = parent_id
+                if keep_fn(position, created_at):
+                    keep.add((tid, ns, cid))
+
+            # 增量 checkpoint 需要父 checkpoint 才能还原，沿父链保留到最近的关键帧
+            frontier = [key for key in keep if parents[key] and (key[0], key[1], parents[key]) not in keep]
+            while frontier:
+                tid, ns, cid = frontier.pop()
+                cursor = await conn.execute(
+                    "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (tid, ns, cid),
+                )
+                row = await cursor.fetchone()
+                if row is None or DELTA_KEY not in self.serde.loads_typed(row)["channel_values"]:
+                    continue
+                parent = (tid, ns, parents[(tid, ns, cid)])
+                if parent[2] in (None, "") or parent in keep or parent not in parents:
+                    continue
+                keep.add(parent)
+                frontier.append(parent)
+
+        doomed = [key for key in parents if key not in keep]
+        if doomed:
+            await self._submit([
+                ("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", doomed),
+                ("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", doomed),
+            ])
+            self.pruned += len(doomed)
+        return len(doomed)
+
+    def stats(self) -> dict:
+        """写入和清理的统计信息"""
+        return {
+            "writes": self.batched_writes,
+            "commits": self.commits,
+            "writes_per_commit": self.batched_writes / self.commits if self.commits else 0.0,
+            "pruned": self.pruned,
+            "readers": self.pool_size,
+        }
+
+
+# ============================================================
+# 工厂函数
+# ============================================================
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+@asynccontextmanager
+async def create_checkpointer(
+    path: str | None = None,
+    *,
+    pool_size: int = CHECKPOINT_POOL_SIZE,
+    batch_ms: float = CHECKPOINT_BATCH_MS,
+    max_batch: int = CHECKPOINT_MAX_BATCH,
+    retention: RetentionPolicy | None = None,
+    compress: bool | None = None,
+    delta: bool | None = None,
+    keyframe_interval: int = 10,
+):
+    """
+    创建项目统一使用的异步 SQLite checkpointer
+
+    Args:
+        path: 数据库文件路径，默认 CHECKPOINT_DB
+        pool_size: 只读连接池大小
+        batch_ms: 批量提交的时间窗口（毫秒）
+        max_batch: 一个事务最多合并的写入数
+        retention: 保留策略，默认从环境变量读取
+        compress: 是否用 CompressedSerializer 压缩，默认读取 CHECKPOINT_COMPRESS
+        delta: 是否用 DeltaCheckpointSaver 增量保存，默认读取 CHECKPOINT_DELTA
+        keyframe_interval: 增量保存时关键帧的间隔
+
+    Yields:
+        可以传给 build_graph(checkpointer=...) 的 checkpointer，
+        开启增量保存时是包在 PooledAsyncSqliteSaver 外面的 DeltaCheckpointSaver
+    """
+    path = path or CHECKPOINT_DB
+    if compress is None:
+        compress = _env_flag("CHECKPOINT_COMPRESS", "1")
+    if delta is None:
+        delta = _env_flag("CHECKPOINT_DELTA", "1")
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    conn = await aiosqlite.connect(path)
+    saver = PooledAsyncSqliteSaver(
+        conn,
+        path,
+        pool_size=pool_size,
+        batch_ms=batch_ms,
+        max_batch=max_batch,
+        retention=retention,
+        serde=CompressedSerializer() if compress else None,
+    )
+    try:
+        await saver.setup()
+        yield DeltaCheckpointSaver(saver, keyframe_interval=keyframe_interval) if delta else saver
+    finally:
+        await saver.aclose()
+        await conn.close()
@@ -1,12 +1,34 @@
-from .builder import build_graph, graph
-from .state import State
-from .nodes import planner_node, researcher_node, writer_node
+from .builder import build_graph, build_graph_with_condition, build_graph_with_fanout, get_graph
+from .state import State, WindowedState, make_initial_state
+from .nodes import (
+    planner_node,
+    researcher_node,
+    writer_node,
+    aplanner_node,
+    aresearcher_node,
+    awriter_node,
+)
 
 __all__ = [
     "build_graph",
-    "graph", 
+    "build_graph_with_condition",
+    "build_graph_with_fanout",
+    "get_graph",
+    "graph",
     "State",
+    "WindowedState",
+    "make_initial_state",
     "planner_node",
     "researcher_node", 
-    "writer_node"
+    "writer_node",
+    "aplanner_node",
+    "aresearcher_node",
+    "awriter_node",
 ]
+
+
+def __getattr__(name: str):
+    # 默认图延迟编译，见 builder.get_graph
+    if name == "graph":
+        return get_graph("default")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
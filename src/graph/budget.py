@@ -0,0 +1,84 @@
+"""
+研究预算 - 限制 build_graph_with_condition 中研究循环的开销
+
+以前只要研究结果少于 100 个字符就回到 researcher，没有次数上限，
+回答简短的模型会一直循环、消耗 LLM 调用，直到触发 recursion limit。
+
+每次运行都有三种预算，任意一种用完就带着已收集的结果进入 writer：
+- max_iterations: 研究员最多执行的次数
+- deadline_s: 从规划器开始算起的墙钟时间上限（秒）
+- token_budget: 本次运行累计消耗的 token 上限
+
+默认值来自环境变量，也可以通过 config["configurable"] 按运行覆盖：
+    {"configurable": {"max_iterations": 3, "deadline_s": 60, "token_budget": 20000}}
+0 表示不限制。
+"""
+
+import os
+import time
+from dataclasses import dataclass
+
+from langchain_core.runnables import RunnableConfig
+
+
+@dataclass(frozen=True)
+class ResearchBudget:
+    """一次运行的研究预算（0 表示不限制）"""
+
+    max_iterations: int = int(os.getenv("RESEARCH_MAX_ITERATIONS", "3"))
+    deadline_s: float = float(os.getenv("RESEARCH_DEADLINE_S", "0"))
+    token_budget: int = int(os.getenv("RESEARCH_TOKEN_BUDGET", "0"))
+
+    @classmethod
+    def from_config(cls, config: RunnableConfig | None) -> "ResearchBudget":
+        """从 config["configurable"] 读取预算，没有配置的项使用默认值"""
+        configurable = (config or {}).get("configurable", {})
+        default = cls()
+        return cls(
+            max_iterations=int(configurable.get("max_iterations", default.max_iterations)),
+            deadline_s=float(configurable.get("deadline_s", default.deadline_s)),
+            token_budget=int(configurable.get("token_budget", default.token_budget)),
+        )
+
+
+def count_tokens(*responses) -> int:
+    """统计 LLM 响应消耗的 token（没有 usage_metadata 时计为 0）"""
+    total = 0
+    for response in responses:
+        usage = getattr(response, "usage_metadata", None) or {}
+        total += usage.get("total_tokens", 0)
+    return total
+
+
+def budget_usage(state: dict, budget: ResearchBudget) -> dict:
+    """
+    计算当前的预算使用情况
+
+    Returns:
+        {"iterations", "elapsed_s", "tokens", "limits", "exhausted"}，
+        exhausted 是最先用完的预算名称，都没用完时为 None
+    """
+    iterations = state.get("research_iterations", 0)
+    tokens = state.get("tokens_used", 0)
+    started_at = state.get("started_at")
+    elapsed = time.time() - started_at if started_at else 0.0
+
+    exhausted = None
+    if budget.max_iterations and iterations >= budget.max_iterations:
+        exhausted = "iterations"
+    elif budget.deadline_s and elapsed >= budget.deadline_s:
+        exhausted = "deadline"
+    elif budget.token_budget and tokens >= budget.token_budget:
+        exhausted = "tokens"
+
+    return {
+        "iterations": iterations,
+        "elapsed_s": round(elapsed, 3),
+        "tokens": tokens,
+        "limits": {
+            "max_iterations": budget.max_iterations,
+            "deadline_s": budget.deadline_s,
+            "token_budget": budget.token_budget,
+        },
+        "exhausted": exhausted,
+    }
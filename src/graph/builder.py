@@ -7,16 +7,46 @@
 3. 执行顺序是什么
 """
 
+import threading
+
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
+
+from .state import State, WindowedState
+from .budget import ResearchBudget, budget_usage
+from ..llm.models import ModelConfig
+from ..observability.metrics import instrument_node
+from .nodes import (
+    planner_node, researcher_node, writer_node,
+    aplanner_node, aresearcher_node, awriter_node,
+    fanout_planner_node, afanout_planner_node,
+    sub_researcher_node, asub_researcher_node,
+    merge_research_node, get_max_fanout,
+)
+
 
-from .state import State
-from .nodes import planner_node, researcher_node, writer_node
+def _node(name: str, func, afunc=None):
+    """
+    把同步和异步实现合成一个节点
+    
+    graph.invoke 调用 func，graph.astream / graph.ainvoke 调用 afunc，
+    默认注册异步实现，异步运行时 LLM 调用不会阻塞事件循环。
+    两个实现都会记录耗时、token 和错误（见 src/observability/metrics.py）。
+    """
+    func, afunc = instrument_node(name, func, afunc)
+    return RunnableLambda(func, afunc=afunc)
 
 
-def build_graph():
+def build_graph(state_schema: type = State, checkpointer=None, interrupt_before=None):
     """
     构建并返回工作流图
     
+    Args:
+        state_schema: 状态类型，长期多轮对话可以用 WindowedState 限制消息增长
+        checkpointer: 保存状态的 checkpointer，异步服务可以用 src.checkpoint.create_checkpointer 创建
+        interrupt_before: 在这些节点之前暂停（人工审核，需要 checkpointer），如 ["writer"]
+    
     工作流程:
     START -> planner -> researcher -> writer -> END
     
@@ -27,12 +57,12 @@ def build_graph():
     """
     
     # 1. 创建状态图，传入状态类型
-    builder = StateGraph(State)
+    builder = StateGraph(state_schema)
     
     # 2. 添加节点 - 每个节点是一个处理函数
-    builder.add_node("planner", planner_node)
-    builder.add_node("researcher", researcher_node)
-    builder.add_node("writer", writer_node)
+    builder.add_node("planner", _node("planner", planner_node, aplanner_node))
+    builder.add_node("researcher", _node("researcher", researcher_node, aresearcher_node))
+    builder.add_node("writer", _node("writer", writer_node, awriter_node))
     
     # 3. 添加边 - 定义执行顺序
     builder.add_edge(START, "planner")        # 开始 -> 规划器
@@ -41,35 +71,50 @@ def build_graph():
     builder.add_edge("writer", END)            # 写作者 -> 结束
     
     # 4. 编译图
-    graph = builder.compile()
+    graph = builder.compile(checkpointer=checkpointer, interrupt_before=interrupt_before)
     
     return graph
 
 
-def build_graph_with_condition():
+def build_graph_with_condition(state_schema: type = State, checkpointer=None, interrupt_before=None):
     """
     带条件分支的工作流示例
     
     这个示例展示了如何根据条件选择不同的路径
+    
+    研究循环受预算限制（最大次数、截止时间、token 上限，见 budget.py），
+    任意一项用完都会进入 writer，预算使用情况记录在 state["budget"] 中。
+    
+    Args:
+        state_schema: 状态类型，见 build_graph
+        checkpointer: 见 build_graph
+        interrupt_before: 见 build_graph
     """
     
-    def should_continue_research(state: State) -> str:
+    # 路由函数的 state 不标注 State：LangGraph 会把标注的类型当作额外的 schema 注册通道，
+    # 和 WindowedState 的 messages reducer 冲突
+    def should_continue_research(state: dict, config: RunnableConfig) -> str:
         """
         条件函数 - 决定是否需要继续研究
         
         返回下一个节点的名称
         """
+        # 预算用完（次数 / 时间 / token）就带着已有结果进入写作阶段
+        usage = budget_usage(state, ResearchBudget.from_config(config))
+        if usage["exhausted"]:
+            return "writer"
+        
         # 示例：如果研究结果太短，继续研究
         if len(state.get("research_results", "")) < 100:
             return "researcher"  # 返回研究员继续研究
         else:
             return "writer"      # 进入写作阶段
     
-    builder = StateGraph(State)
+    builder = StateGraph(state_schema)
     
-    builder.add_node("planner", planner_node)
-    builder.add_node("researcher", researcher_node)
-    builder.add_node("writer", writer_node)
+    builder.add_node("planner", _node("planner", planner_node, aplanner_node))
+    builder.add_node("researcher", _node("researcher", researcher_node, aresearcher_node))
+    builder.add_node("writer", _node("writer", writer_node, awriter_node))
     
     builder.add_edge(START, "planner")
     builder.add_edge("planner", "researcher")
@@ -86,8 +131,132 @@ def build_graph_with_condition():
     
     builder.add_edge("writer", END)
     
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer, interrupt_before=interrupt_before)
+
+
+def build_graph_with_fanout(state_schema: type = State, checkpointer=None, interrupt_before=None):
+    """
+    并行研究的工作流
+    
+    工作流程:
+    START -> planner -> [sub_researcher x N] -> merge -> writer -> END
+    
+    规划器把任务拆成多个子问题，通过 Send 为每个子问题启动一个研究员实例，
+    这些研究员在同一步里并行执行，研究时间不再随计划的广度线性增长。
+    并行数上限见 nodes.MAX_FANOUT（可用 config["configurable"]["max_fanout"] 覆盖）。
+    
+    Args:
+        state_schema: 状态类型，见 build_graph
+        checkpointer: 见 build_graph
+        interrupt_before: 见 build_graph
+    """
+    
+    # state 不标注 State，原因见 build_graph_with_condition
+    def dispatch_research(state: dict, config: RunnableConfig) -> list[Send]:
+        """
+        分发函数 - 每个子问题发送给一个研究员实例
+        """
+        sub_questions = state.get("sub_questions") or [state["task"]]
+        return [
+            Send("sub_researcher", {"task": state["task"], "sub_question": q})
+            for q in sub_questions[:get_max_fanout(config)]
+        ]
+    
+    builder = StateGraph(state_schema)
+    
+    builder.add_node("planner", _node("planner", fanout_planner_node, afanout_planner_node))
+    builder.add_node("sub_researcher", _node("sub_researcher", sub_researcher_node, asub_researcher_node))
+    builder.add_node("merge", _node("merge", merge_research_node))
+    builder.add_node("writer", _node("writer", writer_node, awriter_node))
+    
+    builder.add_edge(START, "planner")
+    
+    # 扇出 - 返回 Send 列表，每个 Send 启动一个并行的研究员
+    builder.add_conditional_edges("planner", dispatch_research, ["sub_researcher"])
+    
+    # 扇入 - 所有研究员完成后才进入合并节点
+    builder.add_edge("sub_researcher", "merge")
+    builder.add_edge("merge", "writer")
+    builder.add_edge("writer", END)
+    
+    return builder.compile(checkpointer=checkpointer, interrupt_before=interrupt_before)
+
+
+# ============================================================
+# 图缓存 - 编译好的图按 (变体, 模型配置) 缓存
+# ============================================================
+
+GRAPH_BUILDERS = {
+    "default": build_graph,
+    "condition": build_graph_with_condition,
+    "fanout": build_graph_with_fanout,
+}
+
+# 每次运行可以通过 config["configurable"] 覆盖的选项（服务和审核队列按这个列表校验、保存）
+RUN_OPTIONS = (
+    "model_profile",          # 模型档位，见 llm/tiers.py
+    "max_fanout",             # fanout 图最多并行研究的子问题数
+    "max_iterations",         # 研究预算，见 budget.py
+    "deadline_s",
+    "token_budget",
+    "writer_context_tokens",  # 写作者上下文的 token 预算，见 context.py
+)
+
+# 消息历史的管理方式 -> 状态类型
+MEMORY_SCHEMAS = {
+    "full": State,              # 保留全部消息
+    "windowed": WindowedState,  # 只保留最近的窗口 + 滚动摘要
+}
+
+_graphs: dict[tuple, object] = {}
+_graphs_lock = threading.Lock()
+
+
+def get_graph(
+    variant: str = "default",
+    model_config: ModelConfig | None = None,
+    memory: str = "full",
+    checkpointer=None,
+    interrupt_before: tuple[str, ...] = (),
+):
+    """
+    获取编译好的图（第一次调用时编译，之后直接复用）
+    
+    Args:
+        variant: 图变体名称，见 GRAPH_BUILDERS
+        model_config: 该图使用的模型配置，默认从环境变量读取
+        memory: 消息历史的管理方式，见 MEMORY_SCHEMAS
+        checkpointer: 保存状态的 checkpointer（同一个 checkpointer 的图也会缓存）
+        interrupt_before: 在这些节点之前暂停，见 build_graph
+    
+    Returns:
+        编译好的图
+    """
+    interrupt_before = tuple(interrupt_before)
+    key = (variant, model_config, memory, checkpointer, interrupt_before)
+    compiled = _graphs.get(key)
+    if compiled is not None:
+        return compiled
+    
+    with _graphs_lock:
+        compiled = _graphs.get(key)
+        if compiled is None:
+            if variant not in GRAPH_BUILDERS:
+                raise ValueError(f"未知的图变体: {variant}，可选: {list(GRAPH_BUILDERS)}")
+            if memory not in MEMORY_SCHEMAS:
+                raise ValueError(f"未知的消息管理方式: {memory}，可选: {list(MEMORY_SCHEMAS)}")
+            compiled = GRAPH_BUILDERS[variant](
+                MEMORY_SCHEMAS[memory], checkpointer=checkpointer, interrupt_before=list(interrupt_before) or None,
+            )
+            if model_config is not None:
+                # 把模型配置绑定到图上，节点通过 config["configurable"] 读取
+                compiled = compiled.with_config(configurable={"model_config": model_config})
+            _graphs[key] = compiled
+        return compiled
 
 
-# 默认图
-graph = build_graph()
+def __getattr__(name: str):
+    # 默认图 - 第一次访问 graph 时才编译
+    if name == "graph":
+        return get_graph("default")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,299 @@
+"""
+写作者的上下文组装 - 按 token 预算排序、去重、截断研究结果
+
+以前 writer 把整个 research_results 原样拼进提示词：搜索返回多少内容，
+写作者的延迟和成本就跟着涨多少，而且多个研究员 / 多轮研究的结果里常有大段重复。
+
+assemble_context 在写作者调用模型前：
+1. 切块：按标题和段落切分，过长的段落再按句子切开
+2. 去重：字符 shingle + MinHash（bottom-k 签名）估计相似度，近似重复的块只保留一个
+3. 排序：按和 task 的相关度（BM25，中文按字的二元组、英文按单词）排序
+4. 装箱：按相关度把块放进 token 预算，放不下的最后一块截断，输出时恢复原文顺序
+
+token 计数用缓存的分词器：CONTEXT_TOKENIZER 指定 tiktoken 编码时用 tiktoken（只加载一次），
+默认用中英文分别估算的近似计数；同一段文本的计数结果会被缓存。
+
+预算来自 config["configurable"]["writer_context_tokens"]，默认 WRITER_CONTEXT_TOKENS，
+0 表示不限制（原样使用 research_results）。默认不限制：开启后写作者看到的是重新排版、
+可能被截断的研究结果，需要按模型的上下文和成本自己选择预算（如 3000）。
+去重后没有删掉任何内容、也放得下预算时，原样使用 research_results。
+
+环境变量:
+    WRITER_CONTEXT_TOKENS     写作者上下文的 token 预算，默认 0（不限制）
+    CONTEXT_DEDUP_THRESHOLD   相似度超过多少算重复，默认 0.8
+    CONTEXT_TOKENIZER         tiktoken 编码名（如 cl100k_base），默认近似计数
+"""
+
+import heapq
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+from langchain_core.runnables import RunnableConfig
+
+
+WRITER_CONTEXT_TOKENS = int(os.getenv("WRITER_CONTEXT_TOKENS", "0"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "")
+
+# 每个块最多多少 token（超过的段落按句子切开）
+CHUNK_TOKENS = 200
+# shingle 长度（字符）和 MinHash 签名大小
+SHINGLE_CHARS = 5
+SIGNATURE_SIZE = 64
+# 截断后少于这么多 token 的块不值得放进去
+MIN_TRUNCATED_TOKENS = 32
+
+
+# ============================================================
+# token 计数
+# ============================================================
+
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """tiktoken 编码（加载很慢，只加载一次）；没有配置或加载失败时返回 None"""
+    if not CONTEXT_TOKENIZER:
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(CONTEXT_TOKENIZER)
+    except Exception:
+        return None
+
+
+def _count(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # 近似：中文大约一个字一个 token，其余大约 4 个字符一个 token
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+@lru_cache(maxsize=8192)
+def count_text_tokens(text: str) -> int:
+    """文本的 token 数（结果按文本缓存）"""
+    return _count(text)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """把文本截断到 max_tokens 以内（按字符二分）"""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if _count(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low].rstrip() + "..."
+
+
+# ============================================================
+# 切块
+# ============================================================
+
+@dataclass
+class Chunk:
+    index: int          # 在原文中的顺序
+    heading: str        # 所属的标题（没有时为空）
+    text: str
+    tokens: int
+    score: float = 0.0
+    section: int = 0    # 原文中被 --- 分隔线分开的第几段
+
+
+_HEADING = re.compile(r"^#{1,6}\s")
+_SEPARATOR = re.compile(r"\n-{3,}\n")
+_SENTENCE = re.compile(r"(?<=[。！？；!?;.])\s*")
+
+
+def _split_long(text: str) -> list[str]:
+    """把过长的段落按句子切成不超过 CHUNK_TOKENS 的块"""
+    if count_text_tokens(text) <= CHUNK_TOKENS:
+        return [text]
+    parts, current = [], ""
+    for sentence in filter(None, _SENTENCE.split(text)):
+        if current and count_text_tokens(current + sentence) > CHUNK_TOKENS:
+            parts.append(current)
+            current = ""
+        current += sentence
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_chunks(text: str) -> list[Chunk]:
+    """按标题、空行和分隔线切块（记下每个块在第几个分隔段里）"""
+    chunks = []
+    heading = ""
+    for section, part_text in enumerate(_SEPARATOR.split(text)):
+        for block in re.split(r"\n\s*\n", part_text):
+            lines = block.strip().splitlines()
+            if lines and _HEADING.match(lines[0]):
+                heading = lines[0].strip()
+                lines = lines[1:]
+            body = "\n".join(lines).strip()
+            if not body:
+                continue
+            for part in _split_long(body):
+                chunks.append(Chunk(len(chunks), heading, part, count_text_tokens(part), section=section))
+    return chunks
+
+
+# ============================================================
+# 去重：shingle + MinHash
+# ============================================================
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def minhash_signature(text: str, size: int = SIGNATURE_SIZE) -> frozenset:
+    """
+    bottom-k MinHash 签名：所有字符 shingle 哈希值中最小的 size 个
+
+    每个 shingle 只哈希一次，比 size 个独立哈希函数快得多，估计的相似度一样无偏。
+    """
+    text = _normalize(text)
+    if len(text) <= SHINGLE_CHARS:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_CHARS] for i in range(len(text) - SHINGLE_CHARS + 1)}
+    hashes = {zlib.crc32(s.encode("utf-8")) for s in shingles}
+    return frozenset(heapq.nsmallest(size, hashes))
+
+
+def estimate_similarity(a: frozenset, b: frozenset, size: int = SIGNATURE_SIZE) -> float:
+    """用两个 bottom-k 签名估计 Jaccard 相似度"""
+    if not a or not b:
+        return 0.0
+    union = heapq.nsmallest(size, a | b)
+    return sum(1 for h in union if h in a and h in b) / len(union)
+
+
+def _similar(a: frozenset, b: frozenset, threshold: float) -> bool:
+    # 估计值不会超过 |a ∩ b| / max(|a|, |b|)，大多数不相似的块用集合交集就能排除
+    if len(a & b) < threshold * max(len(a), len(b)):
+        return False
+    return estimate_similarity(a, b) >= threshold
+
+
+def dedupe(chunks: list[Chunk], threshold: float = CONTEXT_DEDUP_THRESHOLD) -> list[Chunk]:
+    """去掉近似重复的块（按传入顺序，先出现的保留）"""
+    kept, signatures = [], []
+    for chunk in chunks:
+        signature = minhash_signature(chunk.text)
+        if any(_similar(signature, other, threshold) for other in signatures):
+            continue
+        kept.append(chunk)
+        signatures.append(signature)
+    return kept
+
+
+# ============================================================
+# 相关度排序：BM25
+# ============================================================
+
+_WORD = re.compile(r"[a-z0-9]+")
+_HAN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+")
+
+
+def _terms(text: str) -> list[str]:
+    """英文按单词，中文按相邻两个字"""
+    text = text.lower()
+    terms = _WORD.findall(text)
+    for run in _HAN.findall(text):
+        terms.extend(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+    return terms
+
+
+def rank(chunks: list[Chunk], query: str, k1: float = 1.5, b: float = 0.75) -> list[Chunk]:
+    """按和 query 的 BM25 相关度从高到低排序（同分时保持原文顺序）"""
+    query_terms = set(_terms(query))
+    docs = [Counter(_terms(chunk.heading + " " + chunk.text)) for chunk in chunks]
+    if not docs or not query_terms:
+        return list(chunks)
+
+    avg_len = sum(sum(doc.values()) for doc in docs) / len(docs) or 1
+    df = Counter(term for doc in docs for term in query_terms if term in doc)
+    for chunk, doc in zip(chunks, docs):
+        length = sum(doc.values())
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(docs) - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        chunk.score = score
+    return sorted(chunks, key=lambda c: (-c.score, c.index))
+
+
+# ============================================================
+# 装箱
+# ============================================================
+
+def pack(chunks: list[Chunk], budget: int) -> list[Chunk]:
+    """按顺序把块放进预算，放不下的块截断后放入并结束；返回按原文顺序排列的块"""
+    packed, used = [], 0
+    for chunk in chunks:
+        cost = chunk.tokens + (count_text_tokens(chunk.heading) if chunk.heading else 0)
+        if used + cost <= budget:
+            packed.append(chunk)
+            used += cost
+            continue
+        remaining = budget - used - (cost - chunk.tokens)
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            text = _truncate(chunk.text, remaining)
+            packed.append(replace(chunk, text=text, tokens=_count(text)))
+            break
+        # 剩余预算太少，不截断，看后面更短的块能不能放下
+    return sorted(packed, key=lambda c: c.index)
+
+
+def render(chunks: list[Chunk]) -> str:
+    """拼回文本，保留原文的 --- 分隔线，同一标题下的块只输出一次标题"""
+    parts, heading, section = [], None, None
+    for chunk in chunks:
+        if section is not None and chunk.section != section:
+            parts.append("---")
+        if chunk.heading and chunk.heading != heading:
+            parts.append(chunk.heading)
+        heading, section = chunk.heading, chunk.section
+        parts.append(chunk.text)
+    return "\n\n".join(parts)
+
+
+def get_context_budget(config: RunnableConfig | None) -> int:
+    """本次运行写作者上下文的 token 预算"""
+    configurable = (config or {}).get("configurable", {})
+    return int(configurable.get("writer_context_tokens", WRITER_CONTEXT_TOKENS))
+
+
+def assemble_context(task: str, research_results: str, budget: int = WRITER_CONTEXT_TOKENS) -> str:
+    """
+    组装写作者的上下文
+
+    Args:
+        task: 用户的问题（用于相关度排序）
+        research_results: 研究结果全文
+        budget: token 预算，0 表示不限制
+
+    Returns:
+        去重、按相关度取舍后的研究结果（原文顺序）
+    """
+    if not budget or not research_results:
+        return research_results
+    all_chunks = split_chunks(research_results)
+    chunks = dedupe(all_chunks)
+    if sum(chunk.tokens for chunk in chunks) <= budget:
+        # 去重后已经放得下，不用取舍；没有重复时原样返回，不重新排版
+        return render(chunks) if len(chunks) < len(all_chunks) else research_results
+    return render(pack(rank(chunks, task), budget))
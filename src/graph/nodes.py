@@ -6,175 +6,443 @@
 - 输出: dict (要更新的状态字段)
 """
 
+import json
 import os
-from pathlib import Path
+import re
+import time
 
-from langchain.chat_models import init_chat_model
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
 
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from .state import State
-from ..tools.tools import get_research_tools
+from .budget import ResearchBudget, budget_usage, count_tokens
+from .context import assemble_context, get_context_budget
+from .prompts import load_prompt, prompt_messages
+from ..llm.models import get_model
+from ..llm.tiers import model_config_for
+from ..tools.registry import registry
+from ..tools.executor import run_tool_calls, arun_tool_calls
+from ..observability.log import get_logger
+
+
+logger = get_logger(__name__)
 
 
 # ============================================================
 # 辅助函数
 # ============================================================
 
-## 读取模型api 选择自己的模型 这里用的是百炼平台提供的大模型api
-ALIBABA_BASE_URL = os.environ.get("ALIBABA_BASE_URL")
-ALIBABA_API_KEY = os.getenv("ALIBABA_API_KEY")
-model = init_chat_model(
-    "deepseek-v3",  # 1. 模型名称：请在百炼控制台确认准确的 model ID
-    model_provider="openai",  # 2. 提供商：必须填 openai
-    base_url= ALIBABA_BASE_URL,  # 3. 地址：百炼的兼容入口
-    api_key=ALIBABA_API_KEY,  # 4. 你的百炼 API Key
-)
+def _get_llm(config: RunnableConfig | None, role: str):
+    """
+    获取当前运行中某个角色使用的模型
+
+    模型在第一次使用时才创建（见 src/llm/models.py）。
+    - config["configurable"]["model_config"]：整张图 / 整次运行都用这个模型
+    - 否则按档位选择角色的模型（config["configurable"]["model_profile"] 或 MODEL_PROFILE，
+      见 src/llm/tiers.py），比如规划器用快模型、写作者用强模型
+    """
+    configurable = (config or {}).get("configurable", {})
+    model_config = configurable.get("model_config")
+    if model_config is None:
+        model_config = model_config_for(role, configurable.get("model_profile"))
+    return get_model(model_config)
 
 
-def load_prompt(name: str) -> str:
-    """加载提示词文件"""
-    prompt_path = Path(__file__).parent.parent / "prompts" / f"{name}.md"
-    if prompt_path.exists():
-        return prompt_path.read_text(encoding="utf-8")
-    return ""
+def __getattr__(name: str):
+    # 兼容旧代码中的 nodes.model：访问时才创建默认模型
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ============================================================
+# 消息构建 - 同步/异步节点共用
+# ============================================================
+
+def _planner_messages(state: State) -> list:
+    """构建规划器的输入消息"""
+    return [
+        *prompt_messages("planner"),
+        HumanMessage(content=f"请为以下任务制定研究计划：\n\n{state['task']}")
+    ]
+
+
+def _researcher_messages(state: State) -> list:
+    """构建研究员的输入消息"""
+    return [
+        *prompt_messages("researcher"),
+        HumanMessage(content=f"""
+任务: {state['task']}
+
+研究计划:
+{state['plan']}
+
+请根据计划搜索相关信息。
+""")
+    ]
+
+
+def _writer_messages(state: State, config: RunnableConfig | None = None) -> list:
+    """
+    构建写作者的输入消息
+
+    研究结果先经过上下文组装（去重、按相关度取舍到 token 预算内，见 context.py），
+    写作者的延迟和成本不再随搜索返回的内容量增长。
+    """
+    research_results = assemble_context(state["task"], state["research_results"], get_context_budget(config))
+    return [
+        *prompt_messages("writer"),
+        HumanMessage(content=f"""
+用户问题: {state['task']}
+
+研究结果:
+{research_results}
+
+请根据以上研究结果，撰写一份完整的回答。
+""")
+    ]
+
+
+def _research_update(state: State, response, tokens: int, config: RunnableConfig | None) -> dict:
+    """
+    研究员的状态更新
+    
+    除了研究结果，还累加研究次数和 token 消耗，并记录预算使用情况，
+    供 build_graph_with_condition 的条件边判断是否继续研究。
+    """
+    update = {
+        "research_results": response.content,
+        "research_iterations": state.get("research_iterations", 0) + 1,
+        "tokens_used": state.get("tokens_used", 0) + tokens,
+        "messages": [response]
+    }
+    update["budget"] = budget_usage({**state, **update}, ResearchBudget.from_config(config))
+    return update
 
 
 # ============================================================
 # 节点实现
 # ============================================================
 
-def planner_node(state: State) -> dict:
+def planner_node(state: State, config: RunnableConfig | None = None) -> dict:
     """
     规划器节点 - 制定研究计划
     
     输入: 用户的任务
     输出: 执行计划
     """
-    print("\n🎯 [规划器] 正在制定计划...")
+    logger.info("🎯 [规划器] 正在制定计划...")
     
-    llm = model
-    system_prompt = load_prompt("planner")
+    llm = _get_llm(config, "planner")
     
     # 构建消息
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"请为以下任务制定研究计划：\n\n{state['task']}")
-    ]
+    messages = _planner_messages(state)
     
     # 调用 LLM
     response = llm.invoke(messages)
     plan = response.content
     
-    print(f"📋 计划已生成:\n{plan}\n")
+    logger.info("📋 计划已生成")
+    logger.debug("计划内容:\n%s", plan)
     
-    # 返回要更新的状态
+    # 返回要更新的状态（同时开始本次运行的预算计时）
     return {
         "plan": plan,
+        "started_at": time.time(),
+        "research_iterations": 0,
+        "tokens_used": count_tokens(response),
         "messages": [response]
     }
 
 
-def researcher_node(state: State) -> dict:
+def researcher_node(state: State, config: RunnableConfig | None = None) -> dict:
     """
     研究员节点 - 搜索和收集信息
     
     输入: 执行计划
     输出: 研究结果
     """
-    print("\n🔍 [研究员] 正在收集信息...")
+    logger.info("🔍 [研究员] 正在收集信息...")
     
-    llm = model
-    system_prompt = load_prompt("researcher")
+    llm = _get_llm(config, "researcher")
     
-    # 绑定工具到 LLM
-    tools = get_research_tools()
-    llm_with_tools = llm.bind_tools(tools)
+    # 绑定工具到 LLM（注册表会缓存绑定结果，不会每次重新推导 Schema）
+    # 选择工具这一步用 researcher_tools 角色的模型（tiered 档位下是快模型）
+    tools = registry.get_tool_map("research")
+    llm_with_tools = registry.bind(_get_llm(config, "researcher_tools"), "research")
     
     # 构建消息
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"""
-任务: {state['task']}
-
-研究计划:
-{state['plan']}
-
-请根据计划搜索相关信息。
-""")
-    ]
+    messages = _researcher_messages(state)
     
     # 第一次调用 - LLM 决定是否使用工具
     response = llm_with_tools.invoke(messages)
+    tokens = count_tokens(response)
 
     # 如果 LLM 想要调用工具
     if response.tool_calls:
-        print(f"🔧 调用工具: {[tc['name'] for tc in response.tool_calls]}")
+        logger.info("🔧 调用工具: %s", [tc["name"] for tc in response.tool_calls])
 
         # 先把 assistant 的响应加入消息列表
         messages.append(response)
 
-        # 执行每个工具调用，并用 ToolMessage 返回结果
-        for tool_call in response.tool_calls:
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            tool_call_id = tool_call["id"]  # 获取 tool_call_id
-
-            # 找到并执行对应的工具
-            result = "工具未找到"
-            for tool in tools:
-                if tool.name == tool_name:
-                    result = tool.invoke(tool_args)
-                    break
-
-            # 使用 ToolMessage 返回结果（必须指定 tool_call_id）
-            messages.append(ToolMessage(
-                content=str(result),
-                tool_call_id=tool_call_id
-            ))
+        # 并发执行所有工具调用，结果按 tool_call_id 顺序以 ToolMessage 返回
+        messages.extend(run_tool_calls(response.tool_calls, tools))
 
         # 让 LLM 整理工具返回的结果
         response = llm.invoke(messages)
+        tokens += count_tokens(response)
     
-    research_results = response.content
-    print(f"📚 研究完成，收集到信息\n")
+    logger.info("📚 研究完成，收集到信息")
     
-    return {
-        "research_results": research_results,
-        "messages": [response]
-    }
+    return _research_update(state, response, tokens, config)
 
 
-def writer_node(state: State) -> dict:
+def writer_node(state: State, config: RunnableConfig | None = None) -> dict:
     """
     写作者节点 - 生成最终答案
     
     输入: 研究结果
     输出: 最终答案
     """
-    print("\n✍️ [写作者] 正在撰写答案...")
+    logger.info("✍️ [写作者] 正在撰写答案...")
     
-    llm = model
-    system_prompt = load_prompt("writer")
+    llm = _get_llm(config, "writer")
+    messages = _writer_messages(state, config)
     
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"""
-用户问题: {state['task']}
+    response = llm.invoke(messages)
+    final_answer = response.content
+    
+    logger.info("✅ 答案已生成")
+    logger.debug("答案内容:\n%s", final_answer)
+    
+    return {
+        "final_answer": final_answer,
+        "tokens_used": state.get("tokens_used", 0) + count_tokens(response),
+        "messages": [response]
+    }
 
-研究结果:
-{state['research_results']}
 
-请根据以上研究结果，撰写一份完整的回答。
-""")
-    ]
+# ============================================================
+# 异步节点 - 供 graph.astream / graph.ainvoke 使用
+#
+# 与同步版本逻辑一致，只是把 invoke 换成 ainvoke，
+# 这样 LLM 往返期间不会阻塞事件循环，一个进程可以同时推进多个运行。
+# ============================================================
+
+async def aplanner_node(state: State, config: RunnableConfig | None = None) -> dict:
+    """规划器节点（异步版本）"""
+    logger.info("🎯 [规划器] 正在制定计划...")
     
-    response = llm.invoke(messages)
+    response = await _get_llm(config, "planner").ainvoke(_planner_messages(state))
+    plan = response.content
+    
+    logger.info("📋 计划已生成")
+    logger.debug("计划内容:\n%s", plan)
+    
+    return {
+        "plan": plan,
+        "started_at": time.time(),
+        "research_iterations": 0,
+        "tokens_used": count_tokens(response),
+        "messages": [response]
+    }
+
+
+async def aresearcher_node(state: State, config: RunnableConfig | None = None) -> dict:
+    """研究员节点（异步版本）"""
+    logger.info("🔍 [研究员] 正在收集信息...")
+    
+    llm = _get_llm(config, "researcher")
+    tools = registry.get_tool_map("research")
+    llm_with_tools = registry.bind(_get_llm(config, "researcher_tools"), "research")
+    
+    messages = _researcher_messages(state)
+    response = await llm_with_tools.ainvoke(messages)
+    tokens = count_tokens(response)
+
+    if response.tool_calls:
+        logger.info("🔧 调用工具: %s", [tc["name"] for tc in response.tool_calls])
+
+        messages.append(response)
+
+        messages.extend(await arun_tool_calls(response.tool_calls, tools))
+
+        response = await llm.ainvoke(messages)
+        tokens += count_tokens(response)
+    
+    logger.info("📚 研究完成，收集到信息")
+    
+    return _research_update(state, response, tokens, config)
+
+
+async def awriter_node(state: State, config: RunnableConfig | None = None) -> dict:
+    """写作者节点（异步版本）"""
+    logger.info("✍️ [写作者] 正在撰写答案...")
+    
+    response = await _get_llm(config, "writer").ainvoke(_writer_messages(state, config))
     final_answer = response.content
     
-    print(f"✅ 答案已生成\n")
+    logger.info("✅ 答案已生成")
+    logger.debug("答案内容:\n%s", final_answer)
     
     return {
         "final_answer": final_answer,
+        "tokens_used": state.get("tokens_used", 0) + count_tokens(response),
+        "messages": [response]
+    }
+
+
+# ============================================================
+# 并行研究（fan-out）节点 - 供 build_graph_with_fanout 使用
+#
+# 规划器把任务拆成多个子问题，每个子问题由一个研究员实例并行研究，
+# 结果通过 State.research_findings 的 reducer 合并，再交给写作者。
+# ============================================================
+
+# 最多同时研究的子问题数，可以通过 config["configurable"]["max_fanout"] 覆盖
+MAX_FANOUT = int(os.getenv("MAX_FANOUT", "4"))
+
+_LIST_ITEM = re.compile(r"^\s*(?:\d+[.)、]|[-*•])\s*(.+?)\s*$")
+
+
+def get_max_fanout(config: RunnableConfig | None) -> int:
+    """读取本次运行的最大并行数"""
+    configurable = (config or {}).get("configurable", {})
+    return max(1, int(configurable.get("max_fanout", MAX_FANOUT)))
+
+
+def parse_sub_questions(text: str, max_fanout: int = MAX_FANOUT) -> list[str]:
+    """
+    从规划器输出中解析子问题
+    
+    优先解析 JSON（{"sub_questions": [...]}），
+    模型没有按格式输出时，退回到解析编号/列表行。
+    结果去重并截断到 max_fanout 个。
+    """
+    questions = []
+    match = re.search(r"\{.*\}", text, re.S)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+            questions = [str(q) for q in data.get("sub_questions", [])]
+        except (ValueError, AttributeError):
+            questions = []
+    
+    if not questions:
+        for line in text.splitlines():
+            item = _LIST_ITEM.match(line)
+            if item:
+                questions.append(item.group(1))
+    
+    unique = []
+    for question in (q.strip() for q in questions):
+        if question and question not in unique:
+            unique.append(question)
+    return unique[:max_fanout]
+
+
+def _fanout_planner_messages(state: State) -> list:
+    """构建并行规划器的输入消息"""
+    return [
+        *prompt_messages("fanout_planner"),
+        HumanMessage(content=f"请把以下任务拆分为可以并行研究的子问题：\n\n{state['task']}")
+    ]
+
+
+def _fanout_plan_update(state: State, response, config: RunnableConfig | None) -> dict:
+    """把规划器输出转换为状态更新"""
+    sub_questions = parse_sub_questions(response.content, get_max_fanout(config)) or [state["task"]]
+    plan = "\n".join(f"{i}. {q}" for i, q in enumerate(sub_questions, 1))
+    
+    logger.info("📋 拆分为 %d 个子问题", len(sub_questions))
+    logger.debug("子问题:\n%s", plan)
+    
+    return {
+        "plan": plan,
+        "sub_questions": sub_questions,
+        "research_findings": None,  # 清空上一轮的研究结果
+        "started_at": time.time(),
+        "research_iterations": 0,
+        "tokens_used": count_tokens(response),
         "messages": [response]
     }
+
+
+def fanout_planner_node(state: State, config: RunnableConfig | None = None) -> dict:
+    """
+    并行规划器节点 - 把任务拆分为子问题
+    
+    输入: 用户的任务
+    输出: 子问题列表（以及渲染成文本的计划）
+    """
+    logger.info("🎯 [规划器] 正在拆分子问题...")
+    
+    response = _get_llm(config, "planner").invoke(_fanout_planner_messages(state))
+    return _fanout_plan_update(state, response, config)
+
+
+async def afanout_planner_node(state: State, config: RunnableConfig | None = None) -> dict:
+    """并行规划器节点（异步版本）"""
+    logger.info("🎯 [规划器] 正在拆分子问题...")
+    
+    response = await _get_llm(config, "planner").ainvoke(_fanout_planner_messages(state))
+    return _fanout_plan_update(state, response, config)
+
+
+def _sub_research_input(state: dict) -> dict:
+    """子研究员的输入：把子问题当作研究计划"""
+    return {"task": state["task"], "plan": state["sub_question"]}
+
+
+def _sub_research_update(state: dict, update: dict) -> dict:
+    """
+    把研究员的输出包装成一条研究发现
+    
+    并行的研究员不能同时写 tokens_used 等普通字段，token 消耗记在研究发现里，
+    由合并节点统一累加。
+    """
+    finding = {
+        "question": state["sub_question"],
+        "result": update["research_results"],
+        "tokens": update["tokens_used"],
+    }
+    return {
+        "research_findings": [finding],
+        "messages": update["messages"]
+    }
+
+
+def sub_researcher_node(state: dict, config: RunnableConfig | None = None) -> dict:
+    """
+    子研究员节点 - 研究一个子问题
+    
+    输入: Send 传入的 {"task": ..., "sub_question": ...}
+    输出: 一条研究发现，由 merge_findings 合并到 research_findings
+    """
+    update = researcher_node(_sub_research_input(state), config)
+    return _sub_research_update(state, update)
+
+
+async def asub_researcher_node(state: dict, config: RunnableConfig | None = None) -> dict:
+    """子研究员节点（异步版本）"""
+    update = await aresearcher_node(_sub_research_input(state), config)
+    return _sub_research_update(state, update)
+
+
+def merge_research_node(state: State) -> dict:
+    """
+    合并节点 - 把所有子问题的研究发现整理成 research_results
+    
+    按子问题的顺序输出，和各研究员完成的先后无关。
+    """
+    order = {q: i for i, q in enumerate(state.get("sub_questions", []))}
+    findings = sorted(state.get("research_findings", []), key=lambda f: order.get(f["question"], len(order)))
+    research_results = "\n\n".join(f"### {f['question']}\n{f['result']}" for f in findings)
+    
+    logger.info("📚 已合并 %d 个子问题的研究结果", len(findings))
+    
+    return {
+        "research_results": research_results,
+        "research_iterations": len(findings),
+        "tokens_used": state.get("tokens_used", 0) + sum(f.get("tokens", 0) for f in findings)
+    }
@@ -0,0 +1,103 @@
+"""
+提示词缓存 - 每个提示词模板只读取一次
+
+以前每次节点调用都会检查文件是否存在并完整读取 src/prompts/*.md，
+一次运行至少 3 次磁盘读取，研究循环重复时更多。
+
+PromptCache 把模板和预先构建好的 SystemMessage 前缀一起缓存起来，
+只有当文件的 mtime 变化时才重新加载，所以仍然可以直接修改提示词文件，
+不需要重启 worker。
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from langchain_core.messages import SystemMessage
+
+
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+
+# 两次 mtime 检查之间的最小间隔（秒），0 表示每次都检查
+PROMPT_CHECK_INTERVAL = float(os.getenv("PROMPT_CHECK_INTERVAL", "1.0"))
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """
+    缓存的提示词
+
+    Attributes:
+        text: 提示词模板原文（文件不存在时为空字符串）
+        messages: 预先构建好的消息前缀，直接拼在用户消息前面
+        mtime: 加载时文件的修改时间（文件不存在时为 None）
+    """
+
+    text: str
+    messages: tuple
+    mtime: float | None
+
+
+class PromptCache:
+    """按 mtime 热更新的提示词缓存"""
+
+    def __init__(self, prompts_dir: Path = PROMPTS_DIR, check_interval: float = PROMPT_CHECK_INTERVAL):
+        self.prompts_dir = Path(prompts_dir)
+        self.check_interval = check_interval
+        self._entries: dict[str, Prompt] = {}
+        self._checked_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _mtime(self, path: Path) -> float | None:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _load(self, path: Path, mtime: float | None) -> Prompt:
+        text = ""
+        if mtime is not None:
+            try:
+                text = path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                mtime = None
+        return Prompt(text=text, messages=(SystemMessage(content=text),), mtime=mtime)
+
+    def get(self, name: str) -> Prompt:
+        """获取提示词，文件修改过则自动重新加载"""
+        now = time.monotonic()
+        entry = self._entries.get(name)
+        if entry is not None and now - self._checked_at.get(name, 0.0) < self.check_interval:
+            return entry
+
+        path = self.prompts_dir / f"{name}.md"
+        mtime = self._mtime(path)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.mtime != mtime:
+                entry = self._load(path, mtime)
+                self._entries[name] = entry
+            self._checked_at[name] = now
+        return entry
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._checked_at.clear()
+
+
+# 默认缓存 - 所有节点共享
+prompt_cache = PromptCache()
+
+
+def load_prompt(name: str) -> str:
+    """加载提示词文件"""
+    return prompt_cache.get(name).text
+
+
+def prompt_messages(name: str) -> list:
+    """获取提示词对应的消息前缀（新列表，可以直接追加）"""
+    return list(prompt_cache.get(name).messages)
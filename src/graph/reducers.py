@@ -0,0 +1,117 @@
+"""
+消息合并函数（reducer）- 限制长对话中 messages 的增长
+
+State.messages 使用 add_messages，每个节点都把完整响应追加进去。
+在多轮对话（见 examples/01_persistence.py）里，历史会无限增长，
+每次写 checkpoint、每次加载状态的开销也随之增长。
+
+make_windowed_reducer 生成一个替代的 reducer：
+- 先按 add_messages 的规则合并（同 id 覆盖、RemoveMessage 删除等）
+- 只保留最近 max_messages 条消息，且总 token 数不超过 max_tokens
+- 被挤出窗口的旧消息折叠进开头的一条"滚动摘要" SystemMessage
+
+使用 WindowedState（见 state.py）构建图即可开启，例如:
+    build_graph(state_schema=WindowedState)
+    get_graph("default", memory="windowed")
+"""
+
+import os
+
+from langchain_core.messages import SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import add_messages
+
+
+# 滚动摘要消息的固定 id，合并时总是覆盖同一条
+SUMMARY_ID = "conversation-summary"
+SUMMARY_HEADER = "[之前对话的摘要]\n"
+
+MESSAGE_WINDOW = int(os.getenv("MESSAGE_WINDOW", "20"))
+MESSAGE_WINDOW_TOKENS = int(os.getenv("MESSAGE_WINDOW_TOKENS", "4000"))
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "2000"))
+
+
+def extractive_summary(previous: str, dropped: list, line_chars: int = 120) -> str:
+    """
+    默认的摘要函数 - 不调用 LLM，取每条旧消息的开头一段
+
+    Args:
+        previous: 之前的摘要内容
+        dropped: 本次被挤出窗口的消息
+        line_chars: 每条消息保留的最大字符数
+    """
+    lines = [previous] if previous else []
+    for message in dropped:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        content = " ".join(content.split())
+        if not content:
+            continue
+        if len(content) > line_chars:
+            content = content[:line_chars] + "..."
+        lines.append(f"- [{message.type}] {content}")
+    return "\n".join(lines)
+
+
+def make_windowed_reducer(
+    max_messages: int = MESSAGE_WINDOW,
+    max_tokens: int = MESSAGE_WINDOW_TOKENS,
+    summary_max_chars: int = SUMMARY_MAX_CHARS,
+    summarize=extractive_summary,
+):
+    """
+    生成一个窗口化的消息 reducer
+
+    Args:
+        max_messages: 窗口内最多保留的消息数（不含摘要）
+        max_tokens: 窗口内消息的 token 上限（近似计数，至少保留最新一条；0 表示不限制）
+        summary_max_chars: 摘要的最大字符数，超出时丢弃最早的部分
+        summarize: 摘要函数 (之前的摘要, 被挤出的消息) -> 新摘要
+
+    Returns:
+        可以用在 Annotated[list, reducer] 中的合并函数
+    """
+
+    def windowed_add_messages(left, right):
+        merged = add_messages(left, right)
+
+        summary = ""
+        history = []
+        for message in merged:
+            if message.id == SUMMARY_ID:
+                summary = message.content.removeprefix(SUMMARY_HEADER)
+            else:
+                history.append(message)
+
+        # 从最新的消息往前数，直到达到条数或 token 上限
+        keep = 0
+        tokens = 0
+        for message in reversed(history[-max_messages:] if max_messages else history):
+            tokens += count_tokens_approximately([message])
+            if max_tokens and keep and tokens > max_tokens:
+                break
+            keep += 1
+        start = len(history) - keep
+
+        # 窗口不能以 ToolMessage 开头（对应的 tool_calls 已经被挤出去了）
+        while start < len(history) - 1 and isinstance(history[start], ToolMessage):
+            start += 1
+
+        dropped = history[:start]
+        if not dropped:
+            return merged
+
+        summary = summarize(summary, dropped)
+        if len(summary) > summary_max_chars:
+            # 丢弃最早的部分，并从完整的一行开始
+            summary = summary[-summary_max_chars:]
+            summary = summary[summary.find("\n") + 1:]
+        return [
+            SystemMessage(content=SUMMARY_HEADER + summary, id=SUMMARY_ID),
+            *history[start:],
+        ]
+
+    return windowed_add_messages
+
+
+# 默认参数的窗口化 reducer
+windowed_messages = make_windowed_reducer()
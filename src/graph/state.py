@@ -8,6 +8,20 @@ State 就像一个"共享白板"，所有Agent都可以读写。
 from typing import Annotated, TypedDict
 from langgraph.graph.message import add_messages
 
+from .reducers import windowed_messages
+
+
+def merge_findings(left: list | None, right: list | None) -> list:
+    """
+    研究发现的合并函数（reducer）
+    
+    并行的研究员各自返回 [{"question": ..., "result": ...}]，这里把它们拼接起来。
+    返回 None 表示清空（新一轮研究开始时由规划器清空上一轮的结果）。
+    """
+    if right is None:
+        return []
+    return (left or []) + right
+
 
 class State(TypedDict):
     """
@@ -19,6 +33,12 @@ class State(TypedDict):
         plan: 规划器生成的执行计划
         research_results: 研究员收集的信息
         final_answer: 最终输出给用户的答案
+        sub_questions: 规划器拆分出的子问题（并行研究图使用）
+        research_findings: 并行研究员的结果，使用 merge_findings 合并
+        started_at: 本次运行开始的时间戳（由规划器设置，用于时间预算）
+        research_iterations: 本次运行研究员已执行的次数
+        tokens_used: 本次运行累计消耗的 token
+        budget: 研究预算的使用情况（见 budget.py）
     """
     
     # 对话历史 - Annotated[..., add_messages] 表示新消息会追加而不是覆盖
@@ -35,3 +55,37 @@ class State(TypedDict):
     
     # 最终答案 (由 Writer 生成)
     final_answer: str
+    
+    # 子问题 (并行研究图中由 Planner 生成)
+    sub_questions: list[str]
+    
+    # 并行研究的结果 - 多个研究员同时写入，由 merge_findings 合并
+    research_findings: Annotated[list, merge_findings]
+    
+    # 预算相关 - 限制研究循环的次数、时间和 token 消耗
+    started_at: float
+    research_iterations: int
+    tokens_used: int
+    budget: dict
+
+
+class WindowedState(State):
+    """
+    窗口化的工作流状态 - 用于长期存在的多轮对话
+    
+    与 State 相同，只是 messages 只保留最近的窗口，
+    更早的消息折叠成一条滚动摘要（见 reducers.py），内存和 checkpoint 大小保持有界。
+    """
+    
+    messages: Annotated[list, windowed_messages]
+
+
+def make_initial_state(task: str) -> dict:
+    """构建一次运行的初始状态"""
+    return {
+        "messages": [],
+        "task": task,
+        "plan": "",
+        "research_results": "",
+        "final_answer": ""
+    }
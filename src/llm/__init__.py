@@ -0,0 +1,41 @@
+from .models import ModelConfig, get_model, set_model, reset_models
+from .cache import CachedModel, SQLiteLLMCache, get_llm_cache, set_llm_cache
+from .tiers import ROLES, get_profiles, model_config_for, reset_profiles
+from .ratelimit import RateLimit, RateLimiter, RateLimitedModel, get_limiter, set_limiter
+from .resilience import (
+    CircuitBreaker, CircuitOpenError, ResiliencePolicy, ResilientModel, with_resilience,
+)
+
+__all__ = [
+    "ModelConfig",
+    "get_model",
+    "set_model",
+    "reset_models",
+    "CachedModel",
+    "SQLiteLLMCache",
+    "get_llm_cache",
+    "set_llm_cache",
+    "ROLES",
+    "get_profiles",
+    "model_config_for",
+    "reset_profiles",
+    "RateLimit",
+    "RateLimiter",
+    "RateLimitedModel",
+    "get_limiter",
+    "set_limiter",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "ResiliencePolicy",
+    "ResilientModel",
+    "with_resilience",
+    "FakeChatModel",
+]
+
+
+def __getattr__(name: str):
+    # 替身模型只在测试和基准测试中使用，用到时才导入
+    if name == "FakeChatModel":
+        from .fake import FakeChatModel
+        return FakeChatModel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,301 @@
+"""
+LLM 响应缓存 - 基于 SQLite 的持久化缓存（可选开启）
+
+线上有大量重复或几乎相同的问题，每次都要完整调用规划器和写作者的 LLM。
+这里实现一个 LangChain 的 BaseCache，挂在模型上之后，三个节点的所有 LLM 调用
+都会先查缓存：
+
+- key = 模型标识（llm_string，包含模型名、参数、绑定的工具）的哈希
+        + 归一化后的消息哈希（去掉消息 id、合并多余空白）
+- TTL：超过有效期的条目视为未命中并删除
+- LRU：条目数超过上限时，淘汰最久未被访问的条目
+- 命中/未命中/淘汰/过期 计数，见 stats()
+- CachedModel 包在限流器外面：先查缓存，命中时不经过限流器，不占 RPS/TPM 额度，
+  也不计入排队时间；只有真正要发出的请求才去排队
+
+开启方式（环境变量）:
+    LLM_CACHE_PATH=.cache/llm_cache.db   # 设置后才开启
+    LLM_CACHE_TTL=86400                  # 有效期（秒），0 表示永不过期
+    LLM_CACHE_MAX_ENTRIES=10000          # 最大条目数
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.caches import BaseCache
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from langchain_core.runnables import Runnable, RunnableBinding
+
+from .ratelimit import RateLimitedModel
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(node):
+    """递归归一化序列化后的消息：去掉消息 id，合并内容中的空白"""
+    if isinstance(node, list):
+        return [_normalize(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    normalized = {}
+    for key, value in node.items():
+        if key == "kwargs" and isinstance(value, dict):
+            # kwargs.id 是每次运行都会变的消息 id，不参与缓存 key
+            value = {k: v for k, v in value.items() if k != "id"}
+        if key == "content" and isinstance(value, str):
+            value = _WHITESPACE.sub(" ", value).strip()
+        normalized[key] = _normalize(value)
+    return normalized
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(prompt: str, llm_string: str) -> str:
+    """
+    计算缓存 key
+
+    Args:
+        prompt: LangChain 传入的序列化消息（JSON 字符串）
+        llm_string: LangChain 传入的模型标识字符串
+    """
+    try:
+        normalized = json.dumps(_normalize(json.loads(prompt)), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        normalized = _WHITESPACE.sub(" ", prompt).strip()
+    return f"{_hash(llm_string)[:32]}:{_hash(normalized)}"
+
+
+def _dump_generations(generations) -> str:
+    items = []
+    for gen in generations:
+        if isinstance(gen, ChatGeneration):
+            message = message_to_dict(gen.message)
+            # 不缓存消息 id：同一个 thread 里 add_messages 会按 id 覆盖而不是追加
+            message["data"]["id"] = None
+            items.append({"message": message})
+        else:
+            items.append({"text": gen.text})
+    return json.dumps(items, ensure_ascii=False)
+
+
+def _load_generations(value: str) -> list:
+    generations = []
+    for item in json.loads(value):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message))
+        else:
+            generations.append(Generation(text=item["text"]))
+    return generations
+
+
+class SQLiteLLMCache(BaseCache):
+    """带 TTL 和 LRU 淘汰的 SQLite LLM 响应缓存"""
+
+    def __init__(self, path: str | Path, ttl: float = 0, max_entries: int = 10000):
+        """
+        Args:
+            path: SQLite 数据库文件路径（":memory:" 表示只存内存）
+            ttl: 有效期（秒），0 表示永不过期
+            max_entries: 最大条目数，超过后按最近访问时间淘汰
+        """
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def lookup(self, prompt: str, llm_string: str):
+        """查询缓存，未命中返回 None"""
+        key = make_cache_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return _load_generations(value)
+
+    def contains(self, prompt: str, llm_string: str) -> bool:
+        """是否有未过期的条目（只查询，不计入命中率，也不更新访问时间）"""
+        key = make_cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        return row is not None and not (self.ttl and time.time() - row[0] > self.ttl)
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        """写入缓存，超过上限时淘汰最久未访问的条目"""
+        key = make_cache_key(prompt, llm_string)
+        value = _dump_generations(return_val)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def clear(self, **kwargs) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        """命中率等统计信息"""
+        total = self.hits + self.misses
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": size,
+        }
+
+
+# ============================================================
+# 限流之前查缓存
+# ============================================================
+
+class CachedModel(Runnable):
+    """
+    先查缓存再限流：命中时直接调用模型（由模型上挂的缓存返回结果），未命中才经过限流器
+
+    缓存 key 和 LangChain 在模型内部查缓存时用的完全一样（序列化的消息 + llm_string），
+    回调、流式输出、usage 统计都和以前一样由模型自己处理。
+
+    Args:
+        model: 挂了 cache 的聊天模型（或 bind_tools 之后的模型）
+        cache: 模型上挂的缓存
+        provider: 未命中时使用的限流器名称
+    """
+
+    def __init__(self, model, cache: SQLiteLLMCache, provider: str = "llm"):
+        self.model = model
+        self.cache = cache
+        self.provider = provider
+        self.limited = RateLimitedModel(model, provider)
+
+    def bind_tools(self, tools, **kwargs) -> "CachedModel":
+        return CachedModel(self.model.bind_tools(tools, **kwargs), self.cache, self.provider)
+
+    def __getattr__(self, name: str):
+        if name in ("model", "cache", "provider", "limited"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __repr__(self) -> str:
+        return f"CachedModel({self.model!r}, provider={self.provider!r})"
+
+    def _cached(self, input, kwargs: dict) -> bool:
+        """这次调用会不会命中缓存（和 BaseChatModel._agenerate_with_cache 算出同一个 key）"""
+        model, params = self.model, dict(kwargs)
+        if isinstance(model, RunnableBinding):
+            params = {**model.kwargs, **params}
+            model = model.bound
+        if not isinstance(model, BaseChatModel):
+            return False
+        params.pop("ls_structured_output_format", None)
+        params.pop("structured_output_format", None)
+        stop = params.pop("stop", None)
+        messages = model._convert_input(input).to_messages()
+        return self.cache.contains(dumps(messages), model._get_llm_string(stop=stop, **params))
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        if self._cached(input, kwargs):
+            return await self.model.ainvoke(input, config, **kwargs)
+        return await self.limited.ainvoke(input, config, **kwargs)
+
+    def invoke(self, input, config=None, **kwargs):
+        if self._cached(input, kwargs):
+            return self.model.invoke(input, config, **kwargs)
+        return self.limited.invoke(input, config, **kwargs)
+
+
+_llm_cache: SQLiteLLMCache | None = None
+_llm_cache_loaded = False
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> SQLiteLLMCache | None:
+    """
+    获取全局 LLM 缓存
+
+    没有设置 LLM_CACHE_PATH 时返回 None（不开启缓存）。
+    """
+    global _llm_cache, _llm_cache_loaded
+    if _llm_cache_loaded:
+        return _llm_cache
+
+    with _llm_cache_lock:
+        if not _llm_cache_loaded:
+            path = os.getenv("LLM_CACHE_PATH")
+            if path:
+                _llm_cache = SQLiteLLMCache(
+                    path,
+                    ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+                )
+            _llm_cache_loaded = True
+    return _llm_cache
+
+
+def set_llm_cache(cache: SQLiteLLMCache | None):
+    """手动设置全局 LLM 缓存（None 表示关闭），只影响之后创建的模型"""
+    global _llm_cache, _llm_cache_loaded
+    with _llm_cache_lock:
+        _llm_cache = cache
+        _llm_cache_loaded = True
@@ -0,0 +1,144 @@
+"""
+本地替身模型 - 用于测试和基准测试
+
+真实模型的网络延迟和波动会掩盖编排本身的开销。FakeChatModel 不访问网络，
+行为完全确定，可以通过 set_model(FakeChatModel(...)) 注入所有节点：
+
+- latency: 每次调用的延迟（流式输出时平均分摊到每个 chunk）
+- tail_rate / tail_latency: 按这个比例出现的慢调用及其延迟（模拟服务商的长尾）
+- output_tokens: 每次回复的 token 数（一个词算一个 token）
+- tool_calls: 绑定了工具、且对话中还没有工具结果时，返回多少个工具调用
+- fanout: 提示词要求输出 sub_questions（并行规划器）时，返回多少个子问题
+- 每次回复都带 usage_metadata，预算和指标能正常统计 token
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+
+def _usage(input_tokens: int, output_tokens: int) -> dict:
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+class FakeChatModel(BaseChatModel):
+    """不访问网络、输出确定的聊天模型"""
+
+    latency: float = 0.0
+    tail_rate: float = 0.0
+    tail_latency: float = 0.0
+    output_tokens: int = 50
+    tool_calls: int = 1
+    tool_name: str = "web_search"
+    fanout: int = 3
+
+    _calls: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _random: random.Random = PrivateAttr(default_factory=lambda: random.Random(0))
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def calls(self) -> int:
+        """累计调用次数"""
+        return self._calls
+
+    def _latency(self) -> float:
+        """本次调用的延迟（固定种子，慢调用的分布可以复现）"""
+        with self._lock:
+            slow = self.tail_rate and self._random.random() < self.tail_rate
+        return self.tail_latency if slow else self.latency
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[getattr(tool, "name", str(tool)) for tool in tools], **kwargs)
+
+    # ------------------------------------------------------------
+    # 生成回复
+    # ------------------------------------------------------------
+
+    def _respond(self, messages: list, tools: list | None) -> AIMessage:
+        with self._lock:
+            self._calls += 1
+
+        last = messages[-1].content if messages else ""
+        seed = hashlib.md5(str(last).encode("utf-8")).hexdigest()[:8]
+        input_tokens = count_tokens_approximately(messages)
+
+        if tools and self.tool_calls and not any(isinstance(m, ToolMessage) for m in messages):
+            calls = [
+                {"name": self.tool_name, "args": {"query": f"{seed} {i}"}, "id": f"call_{seed}_{i}"}
+                for i in range(self.tool_calls)
+            ]
+            usage = _usage(input_tokens, 10 * len(calls))
+            return AIMessage(content="", tool_calls=calls, usage_metadata=usage)
+
+        if any("sub_questions" in str(m.content) for m in messages[:1]):
+            content = json.dumps(
+                {"sub_questions": [f"子问题 {i + 1} ({seed})" for i in range(self.fanout)]},
+                ensure_ascii=False,
+            )
+        else:
+            content = " ".join(f"w{seed}{i}" for i in range(self.output_tokens))
+        return AIMessage(content=content, usage_metadata=_usage(input_tokens, self.output_tokens))
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        latency = self._latency()
+        if latency:
+            time.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, tools))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        latency = self._latency()
+        if latency:
+            await asyncio.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, tools))])
+
+    def _chunks(self, message: AIMessage) -> list[AIMessageChunk]:
+        if message.tool_calls:
+            return [AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                    for i, tc in enumerate(message.tool_calls)
+                ],
+                usage_metadata=message.usage_metadata,
+            )]
+        words = message.content.split(" ")
+        chunks = [AIMessageChunk(content=word if i == 0 else " " + word) for i, word in enumerate(words)]
+        chunks[-1].usage_metadata = message.usage_metadata
+        return chunks
+
+    def _stream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        chunks = self._chunks(self._respond(messages, tools))
+        latency = self._latency()
+        for chunk in chunks:
+            if latency:
+                time.sleep(latency / len(chunks))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        chunks = self._chunks(self._respond(messages, tools))
+        latency = self._latency()
+        for chunk in chunks:
+            if latency:
+                await asyncio.sleep(latency / len(chunks))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,137 @@
+"""
+模型管理 - 延迟创建并缓存模型客户端
+
+以前 nodes.py 在模块加载时就调用 init_chat_model(...)，
+导致仅仅 import src.graph 就要加载 langchain/openai 整套依赖，
+并且环境变量缺失时直接在 import 阶段报错。
+
+现在模型客户端在第一次使用时才创建，并按 ModelConfig 缓存：
+相同配置只创建一次，所有节点、所有图共享同一个客户端。
+创建的客户端默认用 ResilientModel 包装（超时、重试、对冲、熔断，见 resilience.py），
+每次请求前经过共享的限流器（见 ratelimit.py）；开启了 LLM 缓存时先查缓存，
+命中的调用不经过限流器（见 cache.py 的 CachedModel）。
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+
+from .cache import get_llm_cache
+
+
+# 设为 0 时不包装容错策略，直接使用模型客户端
+LLM_RESILIENCE = os.getenv("LLM_RESILIENCE", "1") != "0"
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    """
+    模型配置 - 可哈希，用作客户端缓存的 key
+
+    Attributes:
+        model: 模型名称，请在百炼控制台确认准确的 model ID
+        model_provider: 提供商，百炼的兼容接口填 openai
+        base_url: 接口地址
+        api_key: API Key（不出现在 repr 中）
+    """
+
+    model: str = "deepseek-v3"
+    model_provider: str = "openai"
+    base_url: str | None = None
+    api_key: str | None = field(default=None, repr=False)
+
+    @classmethod
+    def from_env(cls) -> "ModelConfig":
+        """从环境变量读取配置（这里用的是百炼平台提供的大模型api）"""
+        return cls(
+            model=os.getenv("MODEL_NAME", cls.model),
+            base_url=os.environ.get("ALIBABA_BASE_URL"),
+            api_key=os.getenv("ALIBABA_API_KEY"),
+        )
+
+
+_models: dict[ModelConfig, object] = {}
+_override = None
+_lock = threading.Lock()
+
+
+def get_model(config: ModelConfig | None = None):
+    """
+    获取模型客户端（第一次调用时创建）
+
+    Args:
+        config: 模型配置，默认从环境变量读取
+
+    Returns:
+        聊天模型；如果用 set_model 注入过模型，则总是返回注入的模型
+    """
+    if _override is not None:
+        return _override
+
+    config = config or ModelConfig.from_env()
+    model = _models.get(config)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(config)
+        if model is None:
+            # 延迟导入：langchain / openai 依赖很重，只在真正需要模型时加载
+            from langchain.chat_models import init_chat_model
+
+            # 配置了 LLM_CACHE_PATH 时，给模型挂上持久化响应缓存
+            cache = get_llm_cache()
+            extra = {"cache": cache} if cache is not None else {}
+
+            if LLM_RESILIENCE:
+                # 重试由 ResilientModel 统一负责，客户端自己不再重试
+                extra["max_retries"] = 0
+
+            model = init_chat_model(
+                config.model,
+                model_provider=config.model_provider,
+                base_url=config.base_url,
+                api_key=config.api_key,
+                **extra,
+            )
+            # 每次实际发出的请求（包括重试和对冲）都先取得限流额度；
+            # 缓存命中的调用不发请求，在限流之前就返回
+            if cache is not None:
+                from .cache import CachedModel
+                model = CachedModel(model, cache, "llm")
+            else:
+                from .ratelimit import RateLimitedModel
+                model = RateLimitedModel(model, "llm")
+            if LLM_RESILIENCE:
+                from .resilience import with_resilience
+                model = with_resilience(model)
+            _models[config] = model
+        return model
+
+
+def set_model(model, config: ModelConfig | None = None):
+    """
+    注入一个模型，替代按配置创建的客户端（用于测试、基准测试和本地假模型）
+
+    Args:
+        model: 注入的模型，None 表示取消注入
+        config: 只替换这个配置的客户端（比如给不同档位注入不同的假模型），
+            默认替换所有配置
+    """
+    global _override
+    if config is None:
+        _override = model
+        return
+    with _lock:
+        if model is None:
+            _models.pop(config, None)
+        else:
+            _models[config] = model
+
+
+def reset_models():
+    """清空所有缓存的模型客户端和注入的模型"""
+    global _override
+    with _lock:
+        _models.clear()
+        _override = None
@@ -0,0 +1,340 @@
+"""
+限流 - 进程内共享的令牌桶和并发上限
+
+同时运行很多个图时，百炼接口和 Tavily 会返回 429，重试又进一步拖垮吞吐量。
+这里按服务商（"llm"、"search"）各建一个共享的限流器：
+- requests/sec：请求数令牌桶
+- tokens/min：token 令牌桶（调用前按输入估算，返回后按实际用量多退少补）
+- max in-flight：同时进行中的请求数上限
+
+调用方等待额度而不是失败：异步调用 await 等待，不阻塞事件循环；
+同步调用（线程池里的节点和搜索）在自己的线程里等待。
+每次等待的时间作为 kind="queue" 的指标记录，名称是服务商。
+
+所有限额都是 0（默认）时不做限流。
+
+环境变量（PROVIDER 为 LLM / SEARCH）:
+    RATE_LIMIT_{PROVIDER}_RPS        每秒请求数
+    RATE_LIMIT_{PROVIDER}_TPM        每分钟 token 数
+    RATE_LIMIT_{PROVIDER}_INFLIGHT   最多同时进行的请求数
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+
+from langchain_core.runnables import Runnable
+
+from ..observability.metrics import record
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """一个服务商的限额，0 表示不限制"""
+
+    rps: float = 0.0
+    tokens_per_min: float = 0.0
+    max_inflight: int = 0
+
+    @classmethod
+    def from_env(cls, provider: str) -> "RateLimit":
+        prefix = f"RATE_LIMIT_{provider.upper()}_"
+        return cls(
+            rps=float(os.getenv(prefix + "RPS", "0")),
+            tokens_per_min=float(os.getenv(prefix + "TPM", "0")),
+            max_inflight=int(os.getenv(prefix + "INFLIGHT", "0")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rps or self.tokens_per_min or self.max_inflight)
+
+
+# ============================================================
+# 令牌桶和并发上限
+# ============================================================
+
+class TokenBucket:
+    """
+    预约式令牌桶：取令牌时直接扣减（可以扣成负数），返回需要等待的时间
+
+    先到先得，不需要轮询；同步和异步调用方共用一个桶。
+
+    Args:
+        rate: 每秒补充的令牌数
+        capacity: 桶容量（允许的突发量）
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """取 amount 个令牌，返回要等待多少秒才能使用"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """事后修正用量：amount > 0 补扣，< 0 退还"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class InflightLimit:
+    """
+    跨线程、跨事件循环的并发上限（先到先得）
+
+    asyncio.Semaphore 只能在一个事件循环里用，threading.Semaphore 会阻塞事件循环，
+    这里两种调用方排在同一个队列里。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._active = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, waiter) -> bool:
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def acquire(self):
+        event = threading.Event()
+        if not self._try_acquire(event):
+            event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._try_acquire((loop, future)):
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+                    raise
+            # 取消的同时已经拿到了名额，交给下一个
+            self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            # 名额直接转交给排在最前面的等待者（_active 不变）
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+            return
+        loop, future = waiter
+        try:
+            loop.call_soon_threadsafe(_resolve, future)
+        except RuntimeError:
+            # 等待者的事件循环已经关闭，名额继续往后传
+            self.release()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# ============================================================
+# 限流器
+# ============================================================
+
+class RateLimiter:
+    """
+    一个服务商的限流器
+
+    用法:
+        async with limiter.acquire(tokens=估算的 token 数) as slot:
+            response = await model.ainvoke(...)
+            slot.settle(实际 token 数)
+    """
+
+    def __init__(self, name: str, limit: RateLimit):
+        self.name = name
+        self.limit = limit
+        self._requests = TokenBucket(limit.rps, max(1.0, limit.rps)) if limit.rps else None
+        self._tokens = (
+            TokenBucket(limit.tokens_per_min / 60, limit.tokens_per_min) if limit.tokens_per_min else None
+        )
+        self._inflight = InflightLimit(limit.max_inflight) if limit.max_inflight else None
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens is not None and tokens:
+            wait = max(wait, self._tokens.reserve(tokens))
+        return wait
+
+    def _record(self, started: float):
+        record("queue", self.name, time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int = 0):
+        """异步等待额度"""
+        started = time.perf_counter()
+        if self._inflight is not None:
+            await self._inflight.aacquire()
+        try:
+            wait = self._reserve(tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            self._record(started)
+            yield _Slot(self, tokens)
+        finally:
+            if self._inflight is not None:
+                self._inflight.release()
+
+    @contextmanager
+    def hold(self, tokens: int = 0):
+        """同步等待额度（在调用方的线程里等待）"""
+        started = time.perf_counter()
+        if self._inflight is not None:
+            self._inflight.acquire()
+        try:
+            wait = self._reserve(tokens)
+            if wait:
+                time.sleep(wait)
+            self._record(started)
+            yield _Slot(self, tokens)
+        finally:
+            if self._inflight is not None:
+                self._inflight.release()
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self._inflight.active if self._inflight else 0,
+            "waiting": self._inflight.waiting if self._inflight else 0,
+        }
+
+
+class _Slot:
+    """一次获得的额度，调用完成后用 settle 修正 token 用量"""
+
+    def __init__(self, limiter: RateLimiter, estimated: int):
+        self._limiter = limiter
+        self._estimated = estimated
+
+    def settle(self, actual: int):
+        bucket = self._limiter._tokens
+        if bucket is not None and actual:
+            bucket.adjust(actual - self._estimated)
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> RateLimiter | None:
+    """获取服务商的共享限流器（第一次调用时按环境变量创建），没有配置限额时返回 None"""
+    if provider in _limiters:
+        return _limiters[provider]
+    with _limiters_lock:
+        if provider not in _limiters:
+            limit = RateLimit.from_env(provider)
+            _limiters[provider] = RateLimiter(provider, limit) if limit.enabled else None
+    return _limiters[provider]
+
+
+def set_limiter(provider: str, limit: RateLimit | None) -> RateLimiter | None:
+    """替换服务商的限额（测试、基准测试），None 表示不限流"""
+    with _limiters_lock:
+        _limiters[provider] = RateLimiter(provider, limit) if limit is not None and limit.enabled else None
+    return _limiters[provider]
+
+
+# ============================================================
+# 模型包装
+# ============================================================
+
+def _estimate_tokens(input) -> int:
+    from langchain_core.messages.utils import count_tokens_approximately
+
+    try:
+        return count_tokens_approximately(input) if isinstance(input, list) else 0
+    except Exception:
+        return 0
+
+
+def _usage_tokens(response) -> int:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+class RateLimitedModel(Runnable):
+    """
+    每次模型请求前先取得服务商的额度
+
+    限流器每次调用时才查找，set_limiter 之后立即生效。
+
+    Args:
+        model: 聊天模型（或 bind_tools 之后的模型）
+        provider: 服务商名称，对应 RATE_LIMIT_{PROVIDER}_* 环境变量
+    """
+
+    def __init__(self, model, provider: str = "llm"):
+        self.model = model
+        self.provider = provider
+
+    def bind_tools(self, tools, **kwargs) -> "RateLimitedModel":
+        return RateLimitedModel(self.model.bind_tools(tools, **kwargs), self.provider)
+
+    def __getattr__(self, name: str):
+        if name in ("model", "provider"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __repr__(self) -> str:
+        return f"RateLimitedModel({self.model!r}, provider={self.provider!r})"
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        limiter = get_limiter(self.provider)
+        if limiter is None:
+            return await self.model.ainvoke(input, config, **kwargs)
+        async with limiter.acquire(_estimate_tokens(input)) as slot:
+            response = await self.model.ainvoke(input, config, **kwargs)
+            slot.settle(_usage_tokens(response))
+        return response
+
+    def invoke(self, input, config=None, **kwargs):
+        limiter = get_limiter(self.provider)
+        if limiter is None:
+            return self.model.invoke(input, config, **kwargs)
+        with limiter.hold(_estimate_tokens(input)) as slot:
+            response = self.model.invoke(input, config, **kwargs)
+            slot.settle(_usage_tokens(response))
+        return response
@@ -0,0 +1,443 @@
+"""
+模型调用的容错包装 - 超时、重试、对冲请求、熔断
+
+所有节点共享同一个模型客户端，以前调用时没有任何超时策略：
+服务商一次慢响应就拖住整条流水线，服务商故障时每个运行都挂起。
+
+ResilientModel 包装模型客户端（get_model 创建的客户端默认都会包装）:
+- 超时：每次调用有超时，可以按节点单独设置（写作者输出长，可以给更久）
+- 重试：超时、连接错误、429 / 5xx 按指数退避 + 随机抖动重试，其他错误直接抛出
+- 对冲请求（可选）：调用超过该节点最近延迟的 p95 还没返回，就再发一个相同的请求，
+  用先返回的结果，取消另一个。只多花少量请求，换来长尾延迟明显下降
+- 熔断：连续失败达到阈值后，在冷却时间内直接失败（CircuitOpenError），不再等超时；
+  冷却结束后放行一个探测请求，成功则恢复
+
+流式输出（stream_mode="messages"）的调用不做对冲：两个请求的 token 会混在同一个流里；
+已经输出过 token 的流式调用失败后也不再重试，否则重试会把同样的 token 再输出一遍。
+
+环境变量:
+    LLM_RESILIENCE         设为 0 关闭包装
+    LLM_TIMEOUT            每次调用的超时（秒），默认 60
+    LLM_NODE_TIMEOUTS      按节点覆盖超时，如 planner=30,writer=120
+    LLM_MAX_RETRIES        最多重试次数，默认 2
+    LLM_BACKOFF_BASE       退避的基础时间（秒），默认 0.5
+    LLM_BACKOFF_MAX        退避的最长时间（秒），默认 8
+    LLM_HEDGE              设为 1 开启对冲请求
+    LLM_HEDGE_DELAY        固定的对冲延迟（秒），默认 0 = 使用该节点最近延迟的 p95
+    LLM_HEDGE_MIN_SAMPLES  样本数达到多少后才按 p95 对冲，默认 20
+    LLM_BREAKER_FAILURES   连续失败多少次后熔断，默认 5（0 表示不熔断）
+    LLM_BREAKER_RESET      熔断后多久放行探测请求（秒），默认 30
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import ensure_config
+
+from ..observability.log import get_logger
+from ..observability.metrics import current_node, percentile
+
+
+logger = get_logger(__name__)
+
+
+def _parse_node_timeouts(text: str) -> tuple[tuple[str, float], ...]:
+    """"planner=30,writer=120" -> (("planner", 30.0), ("writer", 120.0))"""
+    pairs = []
+    for item in text.split(","):
+        if "=" in item:
+            node, value = item.split("=", 1)
+            pairs.append((node.strip(), float(value)))
+    return tuple(pairs)
+
+
+@dataclass(frozen=True)
+class ResiliencePolicy:
+    """容错策略（可哈希，和 ModelConfig 一样可以用作缓存 key）"""
+
+    timeout_s: float = 60.0
+    node_timeouts: tuple[tuple[str, float], ...] = ()
+    max_retries: int = 2
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    hedge: bool = False
+    hedge_delay_s: float = 0.0        # 0 = 按 p95 自动计算
+    hedge_min_samples: int = 20
+    breaker_failures: int = 5
+    breaker_reset_s: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ResiliencePolicy":
+        return cls(
+            timeout_s=float(os.getenv("LLM_TIMEOUT", "60")),
+            node_timeouts=_parse_node_timeouts(os.getenv("LLM_NODE_TIMEOUTS", "")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            backoff_base_s=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+            backoff_max_s=float(os.getenv("LLM_BACKOFF_MAX", "8")),
+            hedge=os.getenv("LLM_HEDGE", "0") == "1",
+            hedge_delay_s=float(os.getenv("LLM_HEDGE_DELAY", "0")),
+            hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+            breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            breaker_reset_s=float(os.getenv("LLM_BREAKER_RESET", "30")),
+        )
+
+    def timeout_for(self, node: str) -> float | None:
+        """某个节点的超时，0 表示不限制"""
+        timeout = dict(self.node_timeouts).get(node, self.timeout_s)
+        return timeout or None
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter）"""
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开，调用被直接拒绝"""
+
+
+# ============================================================
+# 熔断器
+# ============================================================
+
+class CircuitBreaker:
+    """
+    连续失败计数的熔断器
+
+    closed:    正常放行，连续失败达到 failure_threshold 后打开
+    open:      直接拒绝，reset_s 之后进入 half_open
+    half_open: 只放行一个探测请求，成功则关闭，失败则重新打开；
+               探测请求被取消时既不算成功也不算失败，放行下一个探测
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """放行则返回（本次调用是探测请求时返回 True），否则抛出 CircuitOpenError"""
+        if not self.failure_threshold:
+            return False
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_s:
+                    raise CircuitOpenError(f"模型服务熔断中（连续失败 {self._failures} 次）")
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open":
+                if self._probing:
+                    raise CircuitOpenError("模型服务熔断中（正在探测是否恢复）")
+                self._probing = True
+                return True
+            return False
+
+    def release(self, probe: bool):
+        """调用被取消（CancelledError 等），只归还探测名额，不影响计数"""
+        if not probe:
+            return
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("模型服务已恢复，熔断器关闭")
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("模型服务连续失败 %d 次，熔断 %gs", self._failures, self.reset_s)
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+# ============================================================
+# 可重试的错误
+# ============================================================
+
+_RETRYABLE_NAMES = ("Timeout", "Connection", "RateLimit", "InternalServer", "ServiceUnavailable", "Overloaded")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """超时、连接错误、429 / 5xx 可以重试；参数错误、鉴权失败等重试也没用"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, FutureTimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return any(name in type(error).__name__ for name in _RETRYABLE_NAMES)
+
+
+def _is_streaming(config: dict) -> bool:
+    """调用方是否在消费 token 流（graph.astream 的 messages 模式）"""
+    from langchain_core.tracers._streaming import _StreamingCallbackHandler
+
+    callbacks = config.get("callbacks")
+    handlers = getattr(callbacks, "handlers", callbacks) or []
+    return any(isinstance(handler, _StreamingCallbackHandler) for handler in handlers)
+
+
+class _TokenWatcher(BaseCallbackHandler):
+    """记录这次调用是否已经输出过 token"""
+
+    def __init__(self):
+        self.emitted = False
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.emitted = True
+
+
+def _watch_tokens(config: dict) -> tuple[dict, _TokenWatcher | None]:
+    """流式调用时在 callbacks 里挂上 _TokenWatcher，非流式调用原样返回"""
+    if not _is_streaming(config):
+        return config, None
+    watcher = _TokenWatcher()
+    callbacks = config.get("callbacks")
+    if isinstance(callbacks, BaseCallbackManager):
+        callbacks = callbacks.copy()
+        callbacks.add_handler(watcher)
+    else:
+        callbacks = [*(callbacks or []), watcher]
+    return {**config, "callbacks": callbacks}, watcher
+
+
+# 同步调用用的线程池（超时和对冲都需要在另一个线程里发请求）
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm")
+    return _executor
+
+
+# ============================================================
+# 包装
+# ============================================================
+
+@dataclass
+class _Shared:
+    """同一个客户端的所有包装（包括 bind_tools 之后的）共享熔断器和延迟样本"""
+
+    breaker: CircuitBreaker
+    latencies: dict[str, deque] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class ResilientModel(Runnable):
+    """
+    给聊天模型加上超时、重试、对冲和熔断
+
+    Args:
+        model: 聊天模型（或 bind_tools 之后的模型）
+        policy: 容错策略，默认从环境变量读取
+    """
+
+    def __init__(self, model, policy: ResiliencePolicy | None = None, _shared: _Shared | None = None):
+        self.model = model
+        self.policy = policy or ResiliencePolicy.from_env()
+        self._shared = _shared or _Shared(CircuitBreaker(self.policy.breaker_failures, self.policy.breaker_reset_s))
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._shared.breaker
+
+    def bind_tools(self, tools, **kwargs) -> "ResilientModel":
+        return ResilientModel(self.model.bind_tools(tools, **kwargs), self.policy, self._shared)
+
+    def __getattr__(self, name: str):
+        # 其余属性（model_name、with_structured_output 等）交给被包装的模型
+        if name in ("model", "policy", "_shared"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def __repr__(self) -> str:
+        return f"ResilientModel({self.model!r})"
+
+    # ------------------------------------------------------------
+    # 延迟统计（对冲用）
+    # ------------------------------------------------------------
+
+    def _observe(self, node: str, elapsed: float):
+        with self._shared.lock:
+            samples = self._shared.latencies.get(node)
+            if samples is None:
+                samples = self._shared.latencies[node] = deque(maxlen=200)
+            samples.append(elapsed)
+
+    def hedge_delay(self, node: str) -> float | None:
+        """该节点的对冲延迟，None 表示不对冲"""
+        if not self.policy.hedge:
+            return None
+        if self.policy.hedge_delay_s:
+            return self.policy.hedge_delay_s
+        with self._shared.lock:
+            samples = sorted(self._shared.latencies.get(node, ()))
+        if len(samples) < self.policy.hedge_min_samples:
+            return None
+        return percentile(samples, 0.95)
+
+    def _retry_or_raise(self, error: BaseException, attempt: int, node: str, watcher=None) -> float:
+        """记录失败；可以重试时返回退避时间，否则重新抛出"""
+        if isinstance(error, (FutureTimeoutError, asyncio.TimeoutError)):
+            error = TimeoutError(f"模型调用超时（{self.policy.timeout_for(node)}s）")
+        retryable = is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # 参数错误等说明服务本身是通的
+            self.breaker.record_success()
+        if not retryable or attempt >= self.policy.max_retries:
+            raise error
+        if watcher is not None and watcher.emitted:
+            logger.warning("流式模型调用在输出部分 token 后失败（%s），不再重试", type(error).__name__)
+            raise error
+        delay = self.policy.backoff(attempt)
+        logger.warning("模型调用失败（%s），%.2fs 后第 %d 次重试", type(error).__name__, delay, attempt + 1)
+        return delay
+
+    # ------------------------------------------------------------
+    # 异步调用
+    # ------------------------------------------------------------
+
+    async def _ahedged(self, input, config, node: str, **kwargs):
+        """发出请求，超过对冲延迟还没返回就再发一个，取先成功的结果"""
+        delay = None if _is_streaming(config) else self.hedge_delay(node)
+        if delay is None:
+            return await self.model.ainvoke(input, config, **kwargs)
+
+        pending = {asyncio.ensure_future(self.model.ainvoke(input, config, **kwargs))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return done.pop().result()
+            logger.debug("模型调用超过 %.2fs，发出对冲请求", delay)
+            pending.add(asyncio.ensure_future(self.model.ainvoke(input, config, **kwargs)))
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        return task.result()
+        finally:
+            # 超时被取消或已经拿到结果时，取消还在进行的请求
+            for task in pending:
+                task.cancel()
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        node = current_node.get()
+        timeout = self.policy.timeout_for(node)
+        attempt = 0
+        while True:
+            probe = self.breaker.allow()
+            attempt_config, watcher = _watch_tokens(config)
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(self._ahedged(input, attempt_config, node, **kwargs), timeout)
+            except Exception as e:
+                delay = self._retry_or_raise(e, attempt, node, watcher)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # 被取消（运行被取消、对冲的另一路先返回、草稿被丢弃）
+                self.breaker.release(probe)
+                raise
+            self.breaker.record_success()
+            self._observe(node, time.perf_counter() - started)
+            return result
+
+    # ------------------------------------------------------------
+    # 同步调用
+    # ------------------------------------------------------------
+
+    def _submit(self, input, config, **kwargs):
+        # 在线程里保留调用方的上下文（当前节点、运行 id、LangChain 的父 config）
+        context = contextvars.copy_context()
+        return _get_executor().submit(context.run, self.model.invoke, input, config, **kwargs)
+
+    def _hedged(self, input, config, node: str, timeout: float | None, **kwargs):
+        delay = None if _is_streaming(config) else self.hedge_delay(node)
+        if timeout is None and delay is None:
+            return self.model.invoke(input, config, **kwargs)
+
+        deadline = time.monotonic() + timeout if timeout else None
+        pending = {self._submit(input, config, **kwargs)}
+        if delay is not None and (timeout is None or delay < timeout):
+            done, _ = wait(pending, timeout=delay)
+            if done:
+                return done.pop().result()
+            logger.debug("模型调用超过 %.2fs，发出对冲请求", delay)
+            pending.add(self._submit(input, config, **kwargs))
+
+        try:
+            while pending:
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    raise FutureTimeoutError()
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    raise FutureTimeoutError()
+                for future in done:
+                    if future.exception() is None or not pending:
+                        return future.result()
+        finally:
+            # 已经开始的请求无法中断，会在后台自然结束
+            for future in pending:
+                future.cancel()
+
+    def invoke(self, input, config=None, **kwargs):
+        config = ensure_config(config)
+        node = current_node.get()
+        timeout = self.policy.timeout_for(node)
+        attempt = 0
+        while True:
+            probe = self.breaker.allow()
+            attempt_config, watcher = _watch_tokens(config)
+            started = time.perf_counter()
+            try:
+                result = self._hedged(input, attempt_config, node, timeout, **kwargs)
+            except Exception as e:
+                delay = self._retry_or_raise(e, attempt, node, watcher)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.release(probe)
+                raise
+            self.breaker.record_success()
+            self._observe(node, time.perf_counter() - started)
+            return result
+
+
+def with_resilience(model, policy: ResiliencePolicy | None = None) -> ResilientModel:
+    """用容错策略包装模型（已经包装过的原样返回）"""
+    if isinstance(model, ResilientModel):
+        return model
+    return ResilientModel(model, policy)
@@ -0,0 +1,132 @@
+"""
+按节点选择模型 - 规划用快模型，写作用强模型
+
+以前三个 Agent 都用同一个 deepseek-v3。规划和研究员选择工具这一步
+不需要最大模型的延迟和成本，写作者才需要最强的模型。
+
+节点里的每次模型调用属于一个角色（ROLES），档位配置（profile）把角色映射到 ModelConfig：
+- default: 所有角色都用默认模型（和以前一样）
+- tiered:  planner / researcher_tools 用快模型，researcher / writer 用强模型
+- fast:    所有角色都用快模型（本地调试、省钱）
+
+get_model 按 ModelConfig 缓存客户端，不同档位里相同的配置共享同一个客户端。
+
+选择档位（优先级从高到低）:
+    config["configurable"]["model_profile"]   某张图 / 某次运行（main.py --profile）
+    MODEL_PROFILE                             环境变量，默认 default
+
+环境变量:
+    MODEL_PROFILE            默认档位
+    MODEL_FAST               快模型名称，默认 qwen-turbo（请在百炼控制台确认 model ID）
+    MODEL_STRONG             强模型名称，默认同 ModelConfig.from_env()
+    MODEL_<ROLE>             覆盖某个角色的模型名称，如 MODEL_PLANNER=qwen-plus
+    MODEL_TIERS_FILE         档位配置文件（.json 或 .toml），格式:
+                             {"profiles": {"my": {"planner": {"model": "qwen-turbo"},
+                                                  "writer": {"model": "deepseek-v3"}}}}
+                             没写的角色和字段沿用默认配置
+"""
+
+import json
+import os
+import threading
+from dataclasses import replace
+from pathlib import Path
+
+from .models import ModelConfig
+
+
+# 节点中发起模型调用的角色
+ROLES = (
+    "planner",            # 规划器（包括并行规划器拆分子问题）
+    "researcher_tools",   # 研究员第一次调用：决定调用哪些工具
+    "researcher",         # 研究员整理工具结果
+    "writer",             # 写作者
+)
+
+MODEL_PROFILE = os.getenv("MODEL_PROFILE", "default")
+MODEL_FAST = os.getenv("MODEL_FAST", "qwen-turbo")
+MODEL_TIERS_FILE = os.getenv("MODEL_TIERS_FILE")
+
+# 内置档位：角色 -> "fast" / "strong"
+BUILTIN_PROFILES = {
+    "default": {role: "strong" for role in ROLES},
+    "tiered": {"planner": "fast", "researcher_tools": "fast", "researcher": "strong", "writer": "strong"},
+    "fast": {role: "fast" for role in ROLES},
+}
+
+
+def _load_file(path: str) -> dict:
+    """读取档位配置文件，返回 {档位: {角色: 字段}}"""
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".toml"):
+        import tomllib
+        data = tomllib.loads(text)
+    else:
+        data = json.loads(text)
+    return data.get("profiles", data)
+
+
+def _tier_config(tier: str, base: ModelConfig) -> ModelConfig:
+    if tier == "fast":
+        return replace(base, model=MODEL_FAST)
+    return replace(base, model=os.getenv("MODEL_STRONG") or base.model)
+
+
+def _build_profiles() -> dict[str, dict[str, ModelConfig]]:
+    base = ModelConfig.from_env()
+    profiles = {
+        name: {role: _tier_config(tier, base) for role, tier in roles.items()}
+        for name, roles in BUILTIN_PROFILES.items()
+    }
+    if MODEL_TIERS_FILE:
+        for name, roles in _load_file(MODEL_TIERS_FILE).items():
+            profile = dict(profiles.get(name) or profiles["default"])
+            for role, fields in roles.items():
+                if role not in ROLES:
+                    raise ValueError(f"档位 {name} 中有未知的角色: {role}，可选: {list(ROLES)}")
+                profile[role] = replace(base, **fields)
+            profiles[name] = profile
+
+    # 环境变量单独覆盖某个角色，对所有档位生效
+    for role in ROLES:
+        model = os.getenv(f"MODEL_{role.upper()}")
+        if model:
+            for profile in profiles.values():
+                profile[role] = replace(profile[role], model=model)
+    return profiles
+
+
+_profiles: dict[str, dict[str, ModelConfig]] | None = None
+_lock = threading.Lock()
+
+
+def get_profiles() -> dict[str, dict[str, ModelConfig]]:
+    """所有档位（第一次调用时根据环境变量和配置文件构建）"""
+    global _profiles
+    if _profiles is None:
+        with _lock:
+            if _profiles is None:
+                _profiles = _build_profiles()
+    return _profiles
+
+
+def reset_profiles():
+    """环境变量或配置文件改变后重新构建档位"""
+    global _profiles
+    with _lock:
+        _profiles = None
+
+
+def model_config_for(role: str, profile: str | None = None) -> ModelConfig:
+    """
+    某个角色在某个档位下的模型配置
+
+    Args:
+        role: 见 ROLES
+        profile: 档位名称，默认 MODEL_PROFILE
+    """
+    profiles = get_profiles()
+    name = profile or MODEL_PROFILE
+    if name not in profiles:
+        raise ValueError(f"未知的模型档位: {name}，可选: {list(profiles)}")
+    return profiles[name][role]
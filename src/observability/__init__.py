@@ -0,0 +1,28 @@
+from .metrics import (
+    MetricEvent,
+    Metrics,
+    InMemoryMetrics,
+    JsonlMetricsSink,
+    PrometheusExporter,
+    render_prometheus,
+    get_metrics,
+    set_metrics,
+    instrument_node,
+)
+from .log import configure_logging, ensure_logging, get_logger, log_context
+
+__all__ = [
+    "MetricEvent",
+    "Metrics",
+    "InMemoryMetrics",
+    "JsonlMetricsSink",
+    "PrometheusExporter",
+    "render_prometheus",
+    "get_metrics",
+    "set_metrics",
+    "instrument_node",
+    "configure_logging",
+    "ensure_logging",
+    "get_logger",
+    "log_context",
+]
@@ -0,0 +1,218 @@
+"""
+结构化日志 - 替代节点里的 print
+
+以前每个节点直接 print 进度和完整的计划 / 结果：并发运行时输出互相穿插，
+stdout 是慢管道时还会阻塞节点。
+
+这里的日志：
+- 节点只把记录放进内存队列（QueueHandler），由后台线程（QueueListener）写到终端，
+  节点所在的事件循环 / 线程不做阻塞的终端 I/O
+- 每条记录带 run_id、thread_id 和当前节点，并发运行的日志可以按运行区分
+- 分级别：进度是 INFO，计划、研究结果等大段内容是 DEBUG（默认不输出）
+- text 格式适合终端，json 格式每条一行，方便采集
+
+用法:
+    configure_logging()                  # 入口启动时调用一次（库模块导入时不配置）
+
+    from src.observability.log import get_logger
+    logger = get_logger(__name__)
+    logger.info("正在制定计划")
+    logger.debug("计划内容:\\n%s", plan)
+
+    with log_context(run_id="abc123"):   # 这个上下文里的日志都带 run_id
+        ...
+
+环境变量:
+    LOG_LEVEL    日志级别，默认 INFO（DEBUG 时输出计划和结果全文）
+    LOG_FORMAT   text（默认）或 json
+    LOG_FILE     设置后写入这个文件，而不是 stderr
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .metrics import current_node, current_run
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_FILE = os.getenv("LOG_FILE")
+
+# 项目所有 logger 的根
+ROOT_LOGGER = "agent"
+
+# 调用方设置的运行 id / thread id（没有设置 thread_id 时取节点上下文里的）
+_run_id: ContextVar[str] = ContextVar("log_run_id", default="")
+_thread_id: ContextVar[str] = ContextVar("log_thread_id", default="")
+
+
+@contextmanager
+def log_context(run_id: str | None = None, thread_id: str | None = None):
+    """在这个上下文里（包括其中创建的 asyncio 任务）产生的日志都带上 run_id / thread_id"""
+    resets = []
+    if run_id is not None:
+        resets.append((_run_id, _run_id.set(run_id)))
+    if thread_id is not None:
+        resets.append((_thread_id, _thread_id.set(thread_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(resets):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """在调用方的线程 / 任务里给记录补上 run_id、thread_id、node（之后才进入队列）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = _run_id.get()
+        record.thread_id = _thread_id.get() or current_run.get()
+        record.node = current_node.get()
+        return True
+
+
+# ============================================================
+# 格式
+# ============================================================
+
+class TextFormatter(logging.Formatter):
+    """终端格式: 时间 级别 [run thread node] 消息"""
+
+    def __init__(self):
+        super().__init__(datefmt="%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        tags = " ".join(
+            f"{key}={value}"
+            for key, value in (("run", record.run_id), ("thread", record.thread_id), ("node", record.node))
+            if value
+        )
+        prefix = f"{self.formatTime(record, self.datefmt)} {record.levelname:<7}"
+        if tags:
+            prefix += f" [{tags}]"
+        text = f"{prefix} {record.getMessage()}"
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+# LogRecord 自带的属性，其余的都是 extra 传入的字段
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "run_id", "thread_id", "node"}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行 JSON（extra 传入的字段原样输出）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "run_id": record.run_id,
+            "thread_id": record.thread_id,
+            "node": record.node,
+            "msg": record.getMessage(),
+        }
+        data.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+FORMATTERS = {
+    "text": TextFormatter,
+    "json": JsonFormatter,
+}
+
+
+# ============================================================
+# 配置
+# ============================================================
+
+_listener: logging.handlers.QueueListener | None = None
+_configured = False
+_lock = threading.Lock()
+
+
+def configure_logging(level: str | int | None = None, fmt: str | None = None, stream=None, path: str | None = None):
+    """
+    配置项目日志（可以重复调用，后一次覆盖前一次）
+
+    Args:
+        level: 日志级别，默认 LOG_LEVEL
+        fmt: text / json，默认 LOG_FORMAT
+        stream: 输出流，默认 stderr（stdout 留给答案和批量模式的 JSONL）
+        path: 写入文件，默认 LOG_FILE
+    """
+    global _listener, _configured
+    fmt = fmt or LOG_FORMAT
+    if fmt not in FORMATTERS:
+        raise ValueError(f"未知的日志格式: {fmt}，可选: {list(FORMATTERS)}")
+    path = path or LOG_FILE
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+
+        if path:
+            handler = logging.FileHandler(path, encoding="utf-8")
+        else:
+            handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(FORMATTERS[fmt]())
+
+        records = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(records)
+        queue_handler.addFilter(ContextFilter())
+
+        logger = logging.getLogger(ROOT_LOGGER)
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+        logger.addHandler(queue_handler)
+        logger.setLevel(level if level is not None else LOG_LEVEL)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+        _listener.start()
+        if not _configured:
+            atexit.register(shutdown_logging)
+        _configured = True
+
+
+def shutdown_logging():
+    """等待队列里的日志全部写出（进程退出时自动调用）"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def ensure_logging():
+    """还没有配置过时按环境变量配置（入口在启动时调用，已经配置过则什么都不做）"""
+    with _lock:
+        needs_setup = not _configured
+    if needs_setup:
+        configure_logging()
+
+
+def get_logger(name: str = "") -> logging.Logger:
+    """
+    获取项目 logger
+
+    只返回 logger，不做配置：导入库模块不应该启动后台线程。
+    由入口（main.py、src/server）调用 configure_logging / ensure_logging；
+    没有配置时按 logging 的默认行为，只有 WARNING 以上输出到 stderr。
+
+    Args:
+        name: 模块名，如 __name__（"src." 前缀会去掉）
+    """
+    name = name.removeprefix("src.")
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}" if name else ROOT_LOGGER)
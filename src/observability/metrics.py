@@ -0,0 +1,500 @@
+"""
+指标采集 - 每个节点、每次 LLM 调用、每次工具调用的耗时和 token
+
+以前节点只打印 emoji 日志，看不出哪个 Agent 最慢、花了多少 token、工具是否出错。
+
+采集的事件（MetricEvent）:
+- node: 每个节点的墙钟时间、是否出错、节点内 LLM 调用的 prompt / completion token
+- llm:  每次 LLM 调用的耗时和 token（按发起调用的节点归类）
+- tool: 每次工具调用的耗时、是否出错 / 超时
+- queue: 等待限流额度的时间（按服务商归类，见 llm/ratelimit.py）
+
+事件发给可插拔的 sink：
+- InMemoryMetrics:   进程内聚合，按名称统计 p50 / p95 / p99，以及每次运行的汇总
+- JsonlMetricsSink:  每个事件写一行 JSON，方便离线分析
+- PrometheusExporter: 以 Prometheus 文本格式暴露 /metrics
+
+接入方式:
+- 节点：builder._node 用 instrument_node 包装（所有图自动生效）
+- LLM：注册一个全局的 LangChain callback（不需要改节点代码）
+- 工具：tools/executor.py 在执行每个工具调用时记录
+
+环境变量:
+    METRICS_JSONL    设置后把事件写入这个 JSONL 文件
+    METRICS_PORT     设置后在这个端口启动 Prometheus /metrics
+    METRICS_WINDOW   每个名称保留最近多少个样本用于计算分位数
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from pathlib import Path
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import ensure_config
+from langgraph.errors import GraphBubbleUp
+
+
+METRICS_JSONL = os.getenv("METRICS_JSONL")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "10000"))
+
+# 当前正在执行的节点、运行 id、节点内累计的 token（LLM callback 和工具执行器读取）
+current_node: ContextVar[str] = ContextVar("current_node", default="")
+current_run: ContextVar[str] = ContextVar("current_run", default="")
+_node_tokens: ContextVar[dict | None] = ContextVar("node_tokens", default=None)
+
+
+@dataclass
+class MetricEvent:
+    """一次节点执行 / LLM 调用 / 工具调用"""
+
+    kind: str                  # "node" / "llm" / "tool" / "queue"（限流排队）
+    name: str                  # 节点名 / 发起 LLM 调用的节点名 / 工具名
+    duration_s: float
+    ok: bool = True
+    error: str = ""
+    node: str = ""             # llm / tool 事件所属的节点
+    run_id: str = ""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    ts: float = field(default_factory=time.time)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """已排序列表的分位数（最近秩法），q 取 0~1"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))
+    return values[index]
+
+
+# ============================================================
+# Sink
+# ============================================================
+
+class _Series:
+    """一个名称的统计：总数 / 总耗时是全量的，分位数基于最近 window 个样本"""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def add(self, event: MetricEvent):
+        self.count += 1
+        self.errors += 0 if event.ok else 1
+        self.total_s += event.duration_s
+        self.prompt_tokens += event.prompt_tokens
+        self.completion_tokens += event.completion_tokens
+        self.samples.append(event.duration_s)
+
+    def summary(self) -> dict:
+        values = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_s": self.total_s / self.count if self.count else 0.0,
+            "p50_s": percentile(values, 0.50),
+            "p95_s": percentile(values, 0.95),
+            "p99_s": percentile(values, 0.99),
+            "total_s": self.total_s,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+class InMemoryMetrics:
+    """
+    进程内聚合
+
+    Args:
+        window: 每个名称保留最近多少个样本用于计算分位数
+        max_runs: 最多保留多少次运行的汇总
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW, max_runs: int = 1000):
+        self.window = window
+        self.max_runs = max_runs
+        self._series: dict[tuple[str, str], _Series] = {}
+        self._runs: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, event: MetricEvent):
+        with self._lock:
+            key = (event.kind, event.name)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.window)
+            series.add(event)
+
+            if event.run_id:
+                run = self._runs.get(event.run_id)
+                if run is None:
+                    run = self._runs[event.run_id] = {
+                        "nodes": {}, "prompt_tokens": 0, "completion_tokens": 0,
+                        "tool_calls": 0, "tool_errors": 0, "errors": 0,
+                    }
+                    while len(self._runs) > self.max_runs:
+                        self._runs.popitem(last=False)
+                if event.kind == "node":
+                    run["nodes"][event.name] = run["nodes"].get(event.name, 0.0) + event.duration_s
+                    run["errors"] += 0 if event.ok else 1
+                elif event.kind == "llm":
+                    run["prompt_tokens"] += event.prompt_tokens
+                    run["completion_tokens"] += event.completion_tokens
+                elif event.kind == "tool":
+                    run["tool_calls"] += 1
+                    run["tool_errors"] += 0 if event.ok else 1
+
+    def summary(self) -> dict:
+        """{"node": {名称: 统计}, "llm": {...}, "tool": {...}}"""
+        with self._lock:
+            result: dict[str, dict] = {"node": {}, "llm": {}, "tool": {}}
+            for (kind, name), series in sorted(self._series.items()):
+                result.setdefault(kind, {})[name] = series.summary()
+            return result
+
+    def runs(self) -> dict:
+        """每次运行（按 thread_id）的汇总"""
+        with self._lock:
+            return {run_id: {**run, "nodes": dict(run["nodes"])} for run_id, run in self._runs.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._runs.clear()
+
+
+class JsonlMetricsSink:
+    """每个事件写一行 JSON"""
+
+    def __init__(self, path: str | Path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, event: MetricEvent):
+        line = json.dumps(asdict(event), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(aggregator: InMemoryMetrics, prefix: str = "agent") -> str:
+    """把聚合结果渲染成 Prometheus 文本格式"""
+    lines = []
+    for kind, items in aggregator.summary().items():
+        if not items:
+            continue
+        metric = f"{prefix}_{kind}_duration_seconds"
+        lines.append(f"# HELP {metric} {kind} 耗时（秒）")
+        lines.append(f"# TYPE {metric} summary")
+        for name, stats in items.items():
+            label = f'name="{_label(name)}"'
+            for q, key in (("0.5", "p50_s"), ("0.95", "p95_s"), ("0.99", "p99_s")):
+                lines.append(f'{metric}{{{label},quantile="{q}"}} {stats[key]:.6f}')
+            lines.append(f"{metric}_sum{{{label}}} {stats['total_s']:.6f}")
+            lines.append(f"{metric}_count{{{label}}} {stats['count']}")
+
+        metric = f"{prefix}_{kind}_errors_total"
+        lines.append(f"# TYPE {metric} counter")
+        for name, stats in items.items():
+            lines.append(f'{metric}{{name="{_label(name)}"}} {stats["errors"]}')
+
+        if kind in ("node", "llm"):
+            metric = f"{prefix}_{kind}_tokens_total"
+            lines.append(f"# TYPE {metric} counter")
+            for name, stats in items.items():
+                for token_type in ("prompt", "completion"):
+                    value = stats[f"{token_type}_tokens"]
+                    lines.append(f'{metric}{{name="{_label(name)}",type="{token_type}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """
+    在后台线程里提供 Prometheus /metrics
+
+    Args:
+        aggregator: 要暴露的进程内聚合
+        port: 监听端口
+        host: 监听地址
+    """
+
+    def __init__(self, aggregator: InMemoryMetrics, port: int, host: str = "0.0.0.0"):
+        self.aggregator = aggregator
+        self.port = port
+        self.host = host
+        self._server = None
+
+    def record(self, event: MetricEvent):
+        # 数据来自 aggregator，这里不需要处理事件
+        pass
+
+    def start(self) -> "PrometheusExporter":
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        aggregator = self.aggregator
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(aggregator).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# ============================================================
+# 指标入口
+# ============================================================
+
+class Metrics:
+    """把事件分发给所有 sink（sink 出错不影响业务）"""
+
+    def __init__(self, sinks: list | None = None):
+        self.sinks = list(sinks or [])
+
+    @property
+    def aggregator(self) -> InMemoryMetrics | None:
+        """第一个进程内聚合 sink"""
+        for sink in self.sinks:
+            if isinstance(sink, InMemoryMetrics):
+                return sink
+        return None
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def record(self, event: MetricEvent):
+        for sink in self.sinks:
+            try:
+                sink.record(event)
+            except Exception:
+                pass
+
+
+_metrics: Metrics | None = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """获取全局指标实例（第一次调用时根据环境变量创建 sink）"""
+    global _metrics
+    if _metrics is not None:
+        return _metrics
+
+    with _metrics_lock:
+        if _metrics is None:
+            aggregator = InMemoryMetrics()
+            sinks = [aggregator]
+            if METRICS_JSONL:
+                sinks.append(JsonlMetricsSink(METRICS_JSONL))
+            if METRICS_PORT:
+                sinks.append(PrometheusExporter(aggregator, METRICS_PORT).start())
+            _metrics = Metrics(sinks)
+            _install_llm_callback()
+    return _metrics
+
+
+def set_metrics(metrics: Metrics) -> Metrics:
+    """替换全局指标实例（测试、基准测试或自定义 sink）"""
+    global _metrics
+    with _metrics_lock:
+        _metrics = metrics
+        _install_llm_callback()
+    return metrics
+
+
+def record(kind: str, name: str, duration_s: float, **kwargs):
+    """记录一个事件，node / run_id 默认取当前上下文"""
+    kwargs.setdefault("node", current_node.get())
+    kwargs.setdefault("run_id", current_run.get())
+    get_metrics().record(MetricEvent(kind=kind, name=name, duration_s=duration_s, **kwargs))
+
+
+# ============================================================
+# LLM 调用 - 全局 callback
+# ============================================================
+
+def _usage(response) -> tuple[int, int]:
+    """从 LLMResult 中取出 (prompt_tokens, completion_tokens)"""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt += usage.get("input_tokens", 0)
+            completion += usage.get("output_tokens", 0)
+    if not prompt and not completion:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """记录每次 LLM 调用的耗时和 token，并累加到所在节点"""
+
+    # 在调用方的上下文里同步执行，才能读到当前节点
+    run_inline = True
+
+    def __init__(self):
+        self._starts: dict = {}
+
+    def _start(self, run_id):
+        self._starts[run_id] = (time.perf_counter(), current_node.get(), current_run.get(), _node_tokens.get())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        started, node, run, tokens = start
+        prompt, completion = _usage(response)
+        if tokens is not None:
+            tokens["prompt"] += prompt
+            tokens["completion"] += completion
+        get_metrics().record(MetricEvent(
+            kind="llm", name=node or "-", duration_s=time.perf_counter() - started,
+            node=node, run_id=run, prompt_tokens=prompt, completion_tokens=completion,
+        ))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        started, node, run, _ = start
+        get_metrics().record(MetricEvent(
+            kind="llm", name=node or "-", duration_s=time.perf_counter() - started,
+            ok=False, error=type(error).__name__, node=node, run_id=run,
+        ))
+
+
+_llm_callback_installed = False
+
+
+def _install_llm_callback():
+    """注册全局 callback：之后所有 LangChain 模型调用都会带上它"""
+    global _llm_callback_installed
+    if _llm_callback_installed:
+        return
+    from langchain_core.tracers.context import register_configure_hook
+
+    # ContextVar 的默认值在所有线程 / 任务中都可见
+    register_configure_hook(ContextVar("metrics_callback", default=MetricsCallbackHandler()), inheritable=True)
+    _llm_callback_installed = True
+
+
+# ============================================================
+# 节点包装
+# ============================================================
+
+def _run_id(config) -> str:
+    config = ensure_config(config)
+    configurable = config.get("configurable", {})
+    return str(configurable.get("thread_id") or config.get("metadata", {}).get("thread_id") or "")
+
+
+def _enter(name: str, config):
+    get_metrics()
+    tokens = {"prompt": 0, "completion": 0}
+    return (
+        current_node.set(name),
+        current_run.set(_run_id(config)),
+        _node_tokens.set(tokens),
+    ), tokens
+
+
+def _exit(name: str, resets, tokens: dict, started: float, error: BaseException | None):
+    node_token, run_token, tokens_token = resets
+    get_metrics().record(MetricEvent(
+        kind="node", name=name, duration_s=time.perf_counter() - started,
+        ok=error is None, error=type(error).__name__ if error else "",
+        node=name, run_id=current_run.get(),
+        prompt_tokens=tokens["prompt"], completion_tokens=tokens["completion"],
+    ))
+    _node_tokens.reset(tokens_token)
+    current_run.reset(run_token)
+    current_node.reset(node_token)
+
+
+def instrument_node(name: str, func, afunc=None):
+    """
+    包装节点函数，记录耗时、错误和节点内的 token
+
+    Returns:
+        (包装后的同步函数, 包装后的异步函数或 None)
+    """
+
+    @wraps(func)
+    def wrapped(state, config=None):
+        resets, tokens = _enter(name, config)
+        started = time.perf_counter()
+        error = None
+        try:
+            return func(state, config) if config is not None else func(state)
+        except Exception as e:
+            # interrupt() 等控制流异常不算节点出错
+            error = None if isinstance(e, GraphBubbleUp) else e
+            raise
+        finally:
+            _exit(name, resets, tokens, started, error)
+
+    if afunc is None:
+        return wrapped, None
+
+    @wraps(afunc)
+    async def awrapped(state, config=None):
+        resets, tokens = _enter(name, config)
+        started = time.perf_counter()
+        error = None
+        try:
+            return await (afunc(state, config) if config is not None else afunc(state))
+        except Exception as e:
+            error = None if isinstance(e, GraphBubbleUp) else e
+            raise
+        finally:
+            _exit(name, resets, tokens, started, error)
+
+    return wrapped, awrapped
@@ -0,0 +1,7 @@
+from .manager import ACTIONS, PendingReview, ReviewQueue
+
+__all__ = [
+    "ACTIONS",
+    "PendingReview",
+    "ReviewQueue",
+]
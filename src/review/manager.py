@@ -0,0 +1,494 @@
+"""
+人工审核队列 - 暂停的运行保存在 checkpointer 里，由 worker 池恢复执行
+
+examples/02_human_in_the_loop.py 里，运行在 writer 之前暂停后，进程阻塞在 input() 上，
+暂停的运行只存在于这个进程的 MemorySaver 里：等待审核的运行有多少个，就要占着多少个进程。
+
+ReviewQueue 把审核流程拆开：
+- 运行在 interrupt_before 的节点（默认 writer）之前暂停后，写入一个标记为 pending 的
+  checkpoint（metadata 中的 review_status），之后不占用任何任务或进程
+- 审核结果（approve / reject / modify）也作为 checkpoint 写入，然后把 thread 交给 worker 池
+- worker 用 graph.astream(None, config) 从断点继续；reject 之后会重新研究并再次暂停
+- 进程重启后 recover() 从 checkpointer 里找回待审核和已审核未完成的运行
+
+推测执行（speculative=True，默认关闭）：
+审核通过后才开始写作，审核人要再等一遍写作者的延迟。开启推测执行后，运行一暂停就在后台
+生成写作者的草稿，按写作者读取的状态（task、research_results 等）和运行选项的哈希缓存：
+- approve 时状态没有变化：草稿直接作为 writer 的输出写入，运行立即结束
+  （草稿还在生成时由 worker 等它完成，仍然比重新开始快）
+- modify / reject 改变了状态：草稿作废（正在生成的被取消）；reject 重新研究后
+  再次暂停时会按新的状态重新生成草稿
+被作废的草稿是多花的模型调用，适合审核通过率高的场景。
+
+审核结果:
+    approve   原样继续，生成最终答案
+    reject    清空研究结果和预算，带着审核意见重新研究（会再次进入待审核）
+    modify    把审核意见追加到研究结果后继续
+
+用法:
+    async with create_checkpointer("reviews.db") as checkpointer:
+        reviews = ReviewQueue(checkpointer, workers=8)
+        await reviews.start()                      # 恢复未完成的审核，启动 worker
+        thread_id = await reviews.submit("什么是机器学习？")
+        ...
+        for review in reviews.list():              # 待审核的运行
+            await reviews.decide(review.thread_id, "approve")
+        await reviews.stop()
+
+环境变量:
+    REVIEW_WORKERS       恢复运行的 worker 数，默认 4
+    REVIEW_SPECULATIVE   是否在等待审核时推测执行写作者（1 / 0），默认 0
+    REVIEW_DRAFTS        最多同时生成多少个草稿，默认 4
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+
+from ..checkpoint import aiter_metadata
+from ..graph import get_graph, make_initial_state
+from ..graph.builder import GRAPH_BUILDERS, RUN_OPTIONS
+from ..graph.nodes import awriter_node, writer_node
+from ..observability.log import get_logger, log_context
+from ..observability.metrics import instrument_node
+
+
+REVIEW_WORKERS = int(os.getenv("REVIEW_WORKERS", "4"))
+REVIEW_SPECULATIVE = os.getenv("REVIEW_SPECULATIVE", "0").lower() in ("1", "true", "yes", "on")
+REVIEW_DRAFTS = int(os.getenv("REVIEW_DRAFTS", "4"))
+
+# checkpoint metadata 中的键（config["configurable"] 里的字符串 / 数字会写入 metadata）
+STATUS_KEY = "review_status"
+FEEDBACK_KEY = "review_feedback"
+VARIANT_KEY = "graph_variant"
+
+# 审核操作 -> 写入 metadata 的状态
+ACTIONS = {
+    "approve": "approved",
+    "reject": "rejected",
+    "modify": "modified",
+}
+PENDING = "pending"
+
+# reject 没有给出意见时使用
+DEFAULT_REJECT_FEEDBACK = "请换一个角度重新研究"
+
+# 推测执行的节点，以及它读取的状态字段（这些字段和运行选项不变，草稿就仍然有效）
+DRAFT_NODE = "writer"
+DRAFT_FIELDS = ("task", "research_results", "tokens_used")
+
+# 草稿的耗时和 token 单独记为 writer_draft 节点
+_, _adraft = instrument_node("writer_draft", writer_node, awriter_node)
+
+logger = get_logger(__name__)
+
+
+def state_hash(values: dict, configurable: dict) -> str:
+    """写作者读取的状态和运行选项的哈希（草稿的缓存键）"""
+    data = {"state": {key: values.get(key) for key in DRAFT_FIELDS}, "config": configurable}
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class PendingReview:
+    """一个等待审核的运行"""
+
+    thread_id: str
+    task: str
+    graph: str
+    configurable: dict = field(default_factory=dict)   # 运行选项（恢复时沿用）
+    paused_at: float = field(default_factory=time.time)
+    rounds: int = 1                                      # 第几次进入审核（reject 后加一）
+
+
+@dataclass
+class _Draft:
+    """一个推测生成的写作者输出"""
+
+    state_hash: str
+    task: asyncio.Task
+
+    def result(self) -> dict | None:
+        """已经生成好的输出；还在生成、被取消或失败时返回 None"""
+        if not self.task.done() or self.task.cancelled():
+            return None
+        return self.task.result()
+
+
+@dataclass
+class _Job:
+    thread_id: str
+    graph: str
+    input: dict | None                 # 初始状态；None 表示从断点继续
+    configurable: dict
+    rounds: int = 0
+    draft: _Draft | None = None        # approve 时还在生成的草稿
+
+
+class ReviewQueue:
+    """
+    待审核运行的队列和恢复运行的 worker 池
+
+    Args:
+        checkpointer: 保存运行状态和审核标记的 checkpointer（需要支持按 metadata 过滤的 alist）
+        workers: worker 数，即最多同时执行的运行数
+        interrupt_before: 在这些节点之前暂停等待审核
+        default_graph: submit 没有指定时使用的图变体
+        speculative: 等待审核时是否推测执行写作者
+        max_drafts: 最多同时生成多少个草稿
+    """
+
+    def __init__(
+        self,
+        checkpointer,
+        workers: int = REVIEW_WORKERS,
+        interrupt_before: tuple[str, ...] = ("writer",),
+        default_graph: str = "condition",
+        speculative: bool = REVIEW_SPECULATIVE,
+        max_drafts: int = REVIEW_DRAFTS,
+    ):
+        if checkpointer is None:
+            raise ValueError("审核队列需要 checkpointer 保存暂停的运行")
+        self.checkpointer = checkpointer
+        self.workers = max(1, workers)
+        self.interrupt_before = tuple(interrupt_before)
+        self.default_graph = default_graph
+        self.speculative = speculative and DRAFT_NODE in self.interrupt_before
+        self.pending: dict[str, PendingReview] = {}
+        self.active: set[str] = set()
+        self.counts: Counter = Counter()
+        self._queued: set[str] = set()
+        self._jobs: asyncio.Queue[_Job] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self._drafts: dict[str, _Draft] = {}
+        self._draft_slots = asyncio.Semaphore(max(1, max_drafts))
+
+    def graph(self, variant: str):
+        return get_graph(variant, checkpointer=self.checkpointer, interrupt_before=self.interrupt_before)
+
+    @staticmethod
+    def _config(thread_id: str, variant: str, configurable: dict, **extra) -> dict:
+        return {"configurable": {**configurable, **extra, "thread_id": thread_id, VARIANT_KEY: variant}}
+
+    def busy(self, thread_id: str) -> bool:
+        """thread 正在等待审核、排队或执行中"""
+        return thread_id in self.pending or thread_id in self._queued or thread_id in self.active
+
+    # ------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------
+
+    async def start(self, recover: bool = True):
+        """恢复 checkpointer 里未完成的审核，启动 worker"""
+        if recover:
+            await self.recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """停止 worker（正在执行的运行被取消，下次 recover 时会重新排队）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        drafts = [draft.task for draft in self._drafts.values()]
+        for task in drafts:
+            task.cancel()
+        await asyncio.gather(*drafts, return_exceptions=True)
+        self._drafts.clear()
+
+    async def join(self):
+        """等待已排队的运行全部执行完（执行完可能又进入待审核）"""
+        await self._jobs.join()
+
+    async def recover(self) -> int:
+        """
+        从 checkpointer 里找回待审核、已审核但没有执行完的运行
+
+        Returns:
+            找回的运行数
+        """
+        # 只读 metadata，不还原每个历史审核标记的完整状态；
+        # 同一个 thread 可能有多个审核标记，按 checkpoint_id（时间有序）取所有状态中最新的那个
+        found: dict[str, tuple[str, dict]] = {}
+        for status in (PENDING, *ACTIONS.values()):
+            async for config, metadata in aiter_metadata(self.checkpointer, None, filter={STATUS_KEY: status}):
+                thread_id = config["configurable"]["thread_id"]
+                checkpoint_id = config["configurable"]["checkpoint_id"]
+                if thread_id not in found or checkpoint_id > found[thread_id][0]:
+                    found[thread_id] = (checkpoint_id, metadata)
+
+        recovered = 0
+        for thread_id, (_, metadata) in found.items():
+            if thread_id in self.pending or thread_id in self._queued:
+                continue
+            variant = metadata.get(VARIANT_KEY, self.default_graph)
+            if variant not in GRAPH_BUILDERS:
+                continue
+            configurable = {key: metadata[key] for key in RUN_OPTIONS if key in metadata}
+            config = self._config(thread_id, variant, configurable)
+            snapshot = await self.graph(variant).aget_state(config)
+            if not snapshot.next:
+                continue    # 已经执行完
+            status = snapshot.metadata.get(STATUS_KEY)
+            if status == PENDING or (not status and self._paused(snapshot)):
+                self._add_pending(thread_id, variant, configurable, snapshot)
+            else:
+                # 已审核，或者恢复执行到一半进程退出了
+                self._enqueue(_Job(thread_id, variant, None, configurable))
+            recovered += 1
+        if recovered:
+            logger.info("找回 %d 个未完成的审核: 待审核 %d 个", recovered, len(self.pending))
+        return recovered
+
+    # ------------------------------------------------------------
+    # 提交运行和审核
+    # ------------------------------------------------------------
+
+    async def submit(
+        self,
+        question: str,
+        thread_id: str | None = None,
+        graph: str | None = None,
+        configurable: dict | None = None,
+    ) -> str:
+        """
+        提交一个新问题，由 worker 执行到断点后进入待审核
+
+        Returns:
+            thread_id
+        """
+        thread_id = thread_id or uuid.uuid4().hex
+        variant = graph or self.default_graph
+        if variant not in GRAPH_BUILDERS:
+            raise ValueError(f"未知的图变体: {variant}，可选: {list(GRAPH_BUILDERS)}")
+        if self.busy(thread_id):
+            raise ValueError(f"thread {thread_id} 正在审核或执行中")
+        self._enqueue(_Job(thread_id, variant, make_initial_state(question), dict(configurable or {})))
+        return thread_id
+
+    def list(self, limit: int | None = None, offset: int = 0) -> list[PendingReview]:
+        """待审核的运行（先暂停的在前）"""
+        reviews = sorted(self.pending.values(), key=lambda r: r.paused_at)
+        return reviews[offset:offset + limit if limit is not None else None]
+
+    async def get(self, thread_id: str) -> dict | None:
+        """待审核运行的详情（计划和研究结果），不在待审核列表中时返回 None"""
+        review = self.pending.get(thread_id)
+        if review is None:
+            return None
+        snapshot = await self.graph(review.graph).aget_state(
+            self._config(thread_id, review.graph, review.configurable)
+        )
+        return {
+            "review": review,
+            "plan": snapshot.values.get("plan", ""),
+            "research_results": snapshot.values.get("research_results", ""),
+            "next": list(snapshot.next),
+        }
+
+    async def decide(self, thread_id: str, action: str, feedback: str = "") -> str:
+        """
+        提交审核结果，运行交给 worker 继续执行
+
+        Args:
+            thread_id: 待审核运行的 thread_id
+            action: approve / reject / modify
+            feedback: 审核意见（modify 必填）
+
+        Returns:
+            写入的审核状态（approved / rejected / modified）
+
+        Raises:
+            KeyError: thread 不在待审核列表中
+            ValueError: 操作不合法
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"未知的审核操作: {action}，可选: {list(ACTIONS)}")
+        feedback = feedback.strip()
+        if action == "modify" and not feedback:
+            raise ValueError("modify 需要提供审核意见")
+        # 先从待审核列表中取出，同一个运行不会被审核两次
+        review = self.pending.pop(thread_id, None)
+        if review is None:
+            raise KeyError(thread_id)
+
+        status = ACTIONS[action]
+        draft = self._drafts.pop(thread_id, None)
+        try:
+            graph = self.graph(review.graph)
+            config = self._config(
+                thread_id, review.graph, review.configurable, **{STATUS_KEY: status, FEEDBACK_KEY: feedback},
+            )
+            values = (await graph.aget_state(config)).values
+            if draft is not None and (action != "approve" or draft.state_hash != state_hash(values, review.configurable)):
+                # 审核改变了写作者读取的状态，草稿作废
+                await self._discard(draft)
+                draft = None
+            answer = draft.result() if draft is not None else None
+            if answer is not None:
+                # 草稿已经生成好：作为 writer 的输出写入，运行到此结束，不再占用 worker
+                await graph.aupdate_state(config, answer, as_node=DRAFT_NODE)
+            else:
+                update, as_node = self._decision_update(values, action, feedback)
+                await graph.aupdate_state(config, update, as_node=as_node)
+        except BaseException:
+            self.pending[thread_id] = review
+            if draft is not None:
+                self._drafts[thread_id] = draft
+            raise
+
+        self.counts[status] += 1
+        logger.info("thread %s 审核结果: %s", thread_id, status)
+        if answer is not None:
+            self.counts["draft_hits"] += 1
+            self.counts["completed"] += 1
+            return status
+        self._enqueue(_Job(thread_id, review.graph, None, review.configurable, review.rounds, draft))
+        return status
+
+    @staticmethod
+    def _decision_update(values: dict, action: str, feedback: str) -> tuple[dict | None, str | None]:
+        """审核结果对应的状态修改，返回 (values, as_node)"""
+        if action == "approve":
+            return None, None
+        if action == "modify":
+            research = values.get("research_results", "")
+            return {"research_results": f"{research}\n\n[人工补充说明]:\n{feedback}"}, None
+        # reject: 假装是规划器的输出，清空研究结果，重新开始计算预算（次数、时间、token），重新研究
+        plan = values.get("plan", "")
+        return {
+            "plan": f"{plan}\n\n[审核意见]: {feedback or DEFAULT_REJECT_FEEDBACK}",
+            "research_results": "",
+            "research_findings": None,
+            "started_at": time.time(),
+            "research_iterations": 0,
+            "tokens_used": 0,
+            "budget": {},
+        }, "planner"
+
+    # ------------------------------------------------------------
+    # 推测执行
+    # ------------------------------------------------------------
+
+    def _start_draft(self, thread_id: str, variant: str, configurable: dict, values: dict):
+        config = self._config(thread_id, variant, configurable)
+        task = asyncio.create_task(self._write_draft(thread_id, config, values))
+        self._drafts[thread_id] = _Draft(state_hash(values, configurable), task)
+
+    async def _write_draft(self, thread_id: str, config: dict, values: dict) -> dict | None:
+        async with self._draft_slots:
+            with log_context(thread_id=thread_id):
+                try:
+                    return await _adraft(values, config)
+                except Exception as e:
+                    # 草稿只是优化，失败时审核通过后照常执行 writer
+                    logger.warning("thread %s 草稿生成失败: %s: %s", thread_id, type(e).__name__, e)
+                    return None
+
+    async def _discard(self, draft: _Draft):
+        # 等草稿真正结束再继续：正在进行的模型调用可能是熔断器的探测请求，
+        # 取消完成后才归还探测名额，否则接下来的重新研究会被熔断器拒绝
+        draft.task.cancel()
+        await asyncio.wait([draft.task])
+        self.counts["drafts_discarded"] += 1
+
+    async def _apply_draft(self, graph, config: dict, draft: _Draft) -> bool:
+        """等待还在生成的草稿，作为 writer 的输出写入；草稿失败时返回 False"""
+        try:
+            answer = await draft.task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            answer = None
+        if answer is None:
+            return False
+        await graph.aupdate_state(config, answer, as_node=DRAFT_NODE)
+        self.counts["draft_hits"] += 1
+        return True
+
+    # ------------------------------------------------------------
+    # worker
+    # ------------------------------------------------------------
+
+    def _enqueue(self, job: _Job):
+        self._queued.add(job.thread_id)
+        self._jobs.put_nowait(job)
+
+    def _paused(self, snapshot) -> bool:
+        return any(node in self.interrupt_before for node in snapshot.next)
+
+    def _add_pending(self, thread_id: str, variant: str, configurable: dict, snapshot, rounds: int = 1):
+        self.pending[thread_id] = PendingReview(
+            thread_id, snapshot.values.get("task", ""), variant, configurable, rounds=rounds,
+        )
+        if self.speculative and DRAFT_NODE in snapshot.next:
+            self._start_draft(thread_id, variant, configurable, snapshot.values)
+
+    async def _worker(self):
+        while True:
+            job = await self._jobs.get()
+            self._queued.discard(job.thread_id)
+            self.active.add(job.thread_id)
+            try:
+                with log_context(thread_id=job.thread_id):
+                    await self._execute(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # checkpointer 里保留着最后的状态，下次 recover 时会重新排队
+                self.counts["failed"] += 1
+                logger.warning("thread %s 执行失败: %s: %s", job.thread_id, type(e).__name__, e)
+            finally:
+                self.active.discard(job.thread_id)
+                self._jobs.task_done()
+
+    async def _execute(self, job: _Job):
+        graph = self.graph(job.graph)
+        config = self._config(job.thread_id, job.graph, job.configurable)
+        if job.draft is not None and await self._apply_draft(graph, config, job.draft):
+            self.counts["completed"] += 1
+            return
+        async for _ in graph.astream(job.input, config):
+            pass
+
+        if await self._mark_pending(job.thread_id, job.graph, job.configurable, job.rounds + 1):
+            logger.info("thread %s 等待审核", job.thread_id)
+        else:
+            self.counts["completed"] += 1
+
+    async def _mark_pending(self, thread_id: str, variant: str, configurable: dict, rounds: int = 1) -> bool:
+        """运行暂停在断点处时写入待审核标记并加入待审核列表，之后这个运行不占用 worker"""
+        graph = self.graph(variant)
+        snapshot = await graph.aget_state(self._config(thread_id, variant, configurable))
+        if not self._paused(snapshot):
+            return False
+        await graph.aupdate_state(self._config(thread_id, variant, configurable, **{STATUS_KEY: PENDING}), None)
+        self._add_pending(thread_id, variant, configurable, snapshot, rounds)
+        return True
+
+    async def register(self, thread_id: str, graph: str, configurable: dict | None = None) -> bool:
+        """
+        登记一个在队列外执行（如 HTTP 服务直接执行）的运行
+
+        Returns:
+            运行是否暂停在断点处（是则进入待审核）
+        """
+        return await self._mark_pending(thread_id, graph, dict(configurable or {}))
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "queued": len(self._queued),
+            "active": len(self.active),
+            "workers": self.workers,
+            "drafting": sum(not draft.task.done() for draft in self._drafts.values()),
+            **{
+                status: self.counts[status]
+                for status in (*ACTIONS.values(), "completed", "failed", "draft_hits", "drafts_discarded")
+            },
+        }
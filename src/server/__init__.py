@@ -0,0 +1,8 @@
+from .app import AgentService, RunConflict, create_app, run_server
+
+__all__ = [
+    "AgentService",
+    "RunConflict",
+    "create_app",
+    "run_server",
+]
@@ -0,0 +1,68 @@
+"""
+启动 HTTP 服务
+
+使用方法:
+    python -m src.server                          # 真实模型（需要 .env 中的 API Key）
+    python -m src.server --fake                   # 本地替身模型和搜索，不需要 API Key
+    python -m src.server --port 9000 --checkpoint .cache/server.db
+    python -m src.server --fake --checkpoint .cache/server.db --review-workers 8   # 带人工审核队列
+"""
+
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from ..graph.builder import GRAPH_BUILDERS                         # noqa: E402
+from ..observability.log import configure_logging                  # noqa: E402
+from .app import (                                                  # noqa: E402
+    SERVER_CHECKPOINT, SERVER_GRAPH, SERVER_HOST, SERVER_MAX_RUNS, SERVER_PORT,
+    create_app, run_server,
+)
+from ..review.manager import REVIEW_SPECULATIVE, REVIEW_WORKERS     # noqa: E402
+
+
+def use_fakes(latency: float, search_latency: float):
+    """把模型和搜索后端换成本地替身（和基准测试一样）"""
+    from ..llm import FakeChatModel, RateLimitedModel, set_model
+    from ..tools import FakeSearchBackend, set_search_backend
+
+    set_model(RateLimitedModel(FakeChatModel(latency=latency), "llm"))
+    set_search_backend(FakeSearchBackend(latency=search_latency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多Agent研究助手 HTTP 服务")
+    parser.add_argument("--host", default=SERVER_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="监听端口")
+    parser.add_argument("--graph", "-g", choices=list(GRAPH_BUILDERS), default=SERVER_GRAPH, help="默认的图变体")
+    parser.add_argument("--checkpoint", default=SERVER_CHECKPOINT,
+                        help="checkpointer：不设置表示不保存状态，memory 或 SQLite 文件路径")
+    parser.add_argument("--max-runs", type=int, default=SERVER_MAX_RUNS, help="最多同时执行的运行数")
+    parser.add_argument("--review-workers", type=int, default=REVIEW_WORKERS,
+                        help="审核队列恢复运行的 worker 数（需要 --checkpoint）")
+    parser.add_argument("--speculative", action="store_true", default=REVIEW_SPECULATIVE,
+                        help="等待审核时在后台生成写作者的草稿，审核通过后直接使用")
+    parser.add_argument("--fake", action="store_true", help="使用本地替身模型和搜索（不需要 API Key）")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="替身模型每次调用的延迟（秒）")
+    parser.add_argument("--fake-search-latency", type=float, default=0.01, help="替身搜索每次调用的延迟（秒）")
+    parser.add_argument("--quiet", "-q", action="store_true", help="只输出警告")
+    parser.add_argument("--verbose", "-v", action="store_true", help="输出调试日志")
+    args = parser.parse_args()
+
+    if args.quiet:
+        configure_logging(level="WARNING")
+    elif args.verbose:
+        configure_logging(level="DEBUG")
+    else:
+        configure_logging()
+    if args.fake:
+        use_fakes(args.fake_latency, args.fake_search_latency)
+
+    app = create_app(args.graph, args.checkpoint, args.max_runs, args.review_workers, args.speculative)
+    run_server(app, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
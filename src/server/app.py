@@ -0,0 +1,677 @@
+"""
+异步 HTTP 服务 - 常驻进程，图只编译一次，SSE 流式输出
+
+main.py 每次调用都要启动进程、创建模型客户端、编译图，其他系统通过命令行调用时
+每个请求都付一遍这些开销。这个服务常驻运行：
+- 启动时编译图、创建模型客户端，之后所有请求复用
+- 同时处理多个运行，每个运行用 thread_id 标识（同一个 thread_id 同时只能有一个运行）
+- 最多同时执行 SERVER_MAX_RUNS 个运行，其余排队（排队时间记为 kind="queue" 的指标）
+- 通过 Server-Sent Events 推送节点更新和写作者的 token
+- 提供健康检查和 Prometheus 指标
+
+接口:
+    POST   /runs                 运行到结束，返回 JSON
+    POST   /runs/stream          运行并以 SSE 推送事件
+    GET    /runs                 正在执行 / 排队的运行
+    DELETE /runs/{thread_id}     取消运行
+    GET    /threads/{thread_id}  thread 的当前状态（需要 checkpointer）
+    POST   /reviews              提交问题，由审核队列的 worker 执行到 writer 之前暂停
+    GET    /reviews              待审核的运行
+    GET    /reviews/{thread_id}  待审核运行的计划和研究结果
+    POST   /reviews/{thread_id}  提交审核结果 {"action": "approve|reject|modify", "feedback": "..."}
+    GET    /healthz              健康检查
+    GET    /metrics              Prometheus 指标（?format=json 返回 JSON 汇总）
+
+请求体:
+    {"question": "...", "thread_id": "可选", "graph": "condition",
+     "config": {"model_profile": "tiered", "max_iterations": 2}, "review": false}
+    review 为 true 时运行在 writer 之前暂停并进入审核队列（见 src/review，需要 checkpointer）
+
+SSE 事件（data 都是 JSON）:
+    run        {"thread_id", "graph"}                运行开始
+    update     {"node", "update"}                    一个节点完成，update 是它写入的状态
+    token      {"node", "content"}                   写作者生成的 token
+    interrupt  {"interrupts"}                        运行在断点处暂停
+    end        {"thread_id", "final_answer", "elapsed_s"}，进入审核队列时带 "review": "pending"
+    error      {"error"}
+    长时间没有事件时发送 SSE 注释（": ping"）保持连接
+
+本地运行（替身模型，不需要 API Key）:
+    python -m src.server --fake
+    curl -N -X POST localhost:8000/runs/stream -d '{"question": "什么是机器学习？"}'
+
+环境变量:
+    SERVER_HOST          监听地址，默认 127.0.0.1
+    SERVER_PORT          监听端口，默认 8000
+    SERVER_GRAPH         默认的图变体，默认 condition
+    SERVER_CHECKPOINT    checkpointer：空（不保存状态）、memory 或 SQLite 文件路径
+    SERVER_MAX_RUNS      最多同时执行的运行数，默认 64
+    SERVER_HEARTBEAT_S   SSE 心跳间隔（秒），默认 15
+    REVIEW_WORKERS       审核队列的 worker 数，见 src/review/manager.py
+    REVIEW_SPECULATIVE   等待审核时推测执行写作者，见 src/review/manager.py
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+import uuid
+from collections import Counter
+from contextlib import AsyncExitStack, aclosing, asynccontextmanager, suppress
+from dataclasses import dataclass, field
+
+from aiohttp import web
+from langchain_core.messages import BaseMessage
+
+from ..graph import get_graph, make_initial_state
+from ..graph.builder import GRAPH_BUILDERS, RUN_OPTIONS
+from ..llm import get_model
+from ..llm.tiers import ROLES, get_profiles, model_config_for
+from ..observability.log import ensure_logging, get_logger, log_context
+from ..observability.metrics import get_metrics, record, render_prometheus
+from ..review import ACTIONS, ReviewQueue
+from ..review.manager import REVIEW_SPECULATIVE, REVIEW_WORKERS
+
+
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_GRAPH = os.getenv("SERVER_GRAPH", "condition")
+SERVER_CHECKPOINT = os.getenv("SERVER_CHECKPOINT", "")
+SERVER_MAX_RUNS = int(os.getenv("SERVER_MAX_RUNS", "64"))
+SERVER_HEARTBEAT_S = float(os.getenv("SERVER_HEARTBEAT_S", "15"))
+
+# 推送 token 的节点
+STREAM_NODES = ("writer",)
+
+# SSE 事件在内存里最多缓冲多少个（客户端读得慢时节点会等待）
+STREAM_BUFFER = 256
+
+logger = get_logger(__name__)
+
+
+def _jsonable(value):
+    """把状态更新转换成可以 JSON 序列化的结构（消息只保留类型和内容）"""
+    if isinstance(value, BaseMessage):
+        return {"type": value.type, "content": _jsonable(value.content)}
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _error(status: type[web.HTTPException], message: str) -> web.HTTPException:
+    return status(text=json.dumps({"error": message}, ensure_ascii=False), content_type="application/json")
+
+
+# ============================================================
+# 运行管理
+# ============================================================
+
+class RunConflict(Exception):
+    """同一个 thread_id 已经有运行在执行（或在审核队列中）"""
+
+
+@dataclass
+class RunInfo:
+    thread_id: str
+    graph: str
+    started_at: float = field(default_factory=time.time)
+    state: str = "queued"          # queued / running
+    task: asyncio.Task | None = None
+
+
+@dataclass
+class RunRequest:
+    question: str
+    thread_id: str
+    graph: str
+    configurable: dict
+    review: bool = False
+
+
+class AgentService:
+    """
+    服务的运行时：编译好的图、正在执行的运行、并发上限和计数
+
+    Args:
+        variant: 默认的图变体
+        checkpointer: 所有图共用的 checkpointer，None 表示不保存状态
+        max_runs: 最多同时执行的运行数
+        reviews: 审核队列（需要 checkpointer），None 表示不支持审核
+    """
+
+    def __init__(
+        self,
+        variant: str = SERVER_GRAPH,
+        checkpointer=None,
+        max_runs: int = SERVER_MAX_RUNS,
+        reviews: ReviewQueue | None = None,
+    ):
+        if variant not in GRAPH_BUILDERS:
+            raise ValueError(f"未知的图变体: {variant}，可选: {list(GRAPH_BUILDERS)}")
+        self.variant = variant
+        self.checkpointer = checkpointer
+        self.max_runs = max_runs
+        self.reviews = reviews
+        self.started_at = time.time()
+        self.runs: dict[str, RunInfo] = {}
+        self.counts: Counter = Counter()
+        self._slots = asyncio.Semaphore(max(1, max_runs))
+
+    def graph(self, variant: str | None = None, review: bool = False):
+        if review:
+            return self.reviews.graph(variant or self.variant)
+        return get_graph(variant or self.variant, checkpointer=self.checkpointer)
+
+    def warm_up(self):
+        """启动时编译默认图、创建默认档位用到的模型客户端"""
+        self.graph()
+        try:
+            for config in {model_config_for(role) for role in ROLES}:
+                get_model(config)
+        except Exception as e:
+            # 缺少 API Key 等问题在第一次运行时会再次报错，这里不阻止服务启动
+            logger.warning("创建模型客户端失败: %s: %s", type(e).__name__, e)
+
+    @asynccontextmanager
+    async def slot(self, request: RunRequest):
+        """登记运行并等待执行名额（同一个 thread_id 已在执行时抛出 RunConflict）"""
+        if request.thread_id in self.runs or (self.reviews is not None and self.reviews.busy(request.thread_id)):
+            raise RunConflict(request.thread_id)
+        run = self.runs[request.thread_id] = RunInfo(request.thread_id, request.graph, task=asyncio.current_task())
+        try:
+            started = time.perf_counter()
+            async with self._slots:
+                record("queue", "server", time.perf_counter() - started, run_id=request.thread_id)
+                run.state = "running"
+                yield run
+        finally:
+            self.runs.pop(request.thread_id, None)
+
+    def cancel(self, thread_id: str) -> bool:
+        run = self.runs.get(thread_id)
+        if run is None or run.task is None:
+            return False
+        run.task.cancel()
+        return True
+
+    async def events(self, request: RunRequest, tokens: bool = True):
+        """
+        执行一次运行，产出 (事件名, 数据)
+
+        Args:
+            request: 运行请求
+            tokens: 是否订阅写作者的 token（只要最终结果时不订阅，省掉 messages 流的开销）
+        """
+        graph = self.graph(request.graph, request.review)
+        config = {"configurable": {**request.configurable, "thread_id": request.thread_id}}
+        modes = ["updates", "messages"] if tokens else ["updates"]
+        started = time.perf_counter()
+        final_answer = ""
+
+        yield "run", {"thread_id": request.thread_id, "graph": request.graph}
+        stream = graph.astream(make_initial_state(request.question), config, stream_mode=modes)
+        async with aclosing(stream):
+            async for mode, chunk in stream:
+                if mode == "messages":
+                    message, metadata = chunk
+                    node = metadata.get("langgraph_node")
+                    if node in STREAM_NODES and message.content:
+                        yield "token", {"node": node, "content": _jsonable(message.content)}
+                    continue
+                for node, update in chunk.items():
+                    if node == "__interrupt__":
+                        yield "interrupt", {"interrupts": [_jsonable(getattr(i, "value", i)) for i in update]}
+                        continue
+                    if isinstance(update, dict) and "final_answer" in update:
+                        final_answer = update["final_answer"]
+                    yield "update", {"node": node, "update": _jsonable(update)}
+
+        end = {
+            "thread_id": request.thread_id,
+            "final_answer": final_answer,
+            "elapsed_s": round(time.perf_counter() - started, 3),
+        }
+        if request.review and await self.reviews.register(request.thread_id, request.graph, request.configurable):
+            end["review"] = "pending"
+        yield "end", end
+
+    def stats(self) -> dict:
+        """运行计数（配置了审核队列时带上 reviews）"""
+        running = sum(run.state == "running" for run in self.runs.values())
+        return {
+            "running": running,
+            "queued": len(self.runs) - running,
+            "max_runs": self.max_runs,
+            "completed": self.counts["completed"],
+            "failed": self.counts["failed"],
+            "cancelled": self.counts["cancelled"],
+            **({"reviews": self.reviews.stats()} if self.reviews is not None else {}),
+        }
+
+    async def shutdown(self, timeout: float = 5.0):
+        """取消所有未完成的运行"""
+        tasks = [run.task for run in self.runs.values() if run.task is not None]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+
+# ============================================================
+# SSE
+# ============================================================
+
+_END = object()
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def _with_heartbeat(events, interval: float):
+    """
+    在后台任务里消费 events，超过 interval 秒没有事件时产出 None（用来发送心跳）
+
+    图在后台任务里执行，等待心跳不会打断正在进行的模型调用。
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER)
+
+    async def produce():
+        try:
+            async with aclosing(events):
+                async for item in events:
+                    await queue.put(item)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), interval)
+            except TimeoutError:
+                yield None
+                continue
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        with suppress(asyncio.CancelledError):
+            await producer
+
+
+# ============================================================
+# 请求处理
+# ============================================================
+
+SERVICE = web.AppKey("service", AgentService)
+
+
+# 每个运行配置项的类型：数字可以写成字符串，都会先转换再传给图
+OPTION_TYPES = {
+    "model_profile": str,
+    "max_fanout": int,
+    "max_iterations": int,
+    "deadline_s": float,
+    "token_budget": int,
+    "writer_context_tokens": int,
+}
+
+
+def _coerce_option(name: str, value):
+    """把配置项转换成 OPTION_TYPES 里的类型，类型不对或是负数时抛出 ValueError"""
+    kind = OPTION_TYPES[name]
+    if kind is str:
+        if not isinstance(value, str):
+            raise ValueError(f"{name} 必须是字符串")
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} 必须是数字")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name} 必须是数字") from None
+    if not math.isfinite(number) or number < 0:
+        raise ValueError(f"{name} 必须是非负的有限数字")
+    if kind is int:
+        if not number.is_integer():
+            raise ValueError(f"{name} 必须是整数")
+        return int(number)
+    return number
+
+
+async def _parse_run(request: web.Request) -> RunRequest:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise _error(web.HTTPBadRequest, "请求体不是合法的 JSON")
+    if not isinstance(body, dict):
+        raise _error(web.HTTPBadRequest, "请求体必须是 JSON 对象")
+
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise _error(web.HTTPBadRequest, "缺少 question")
+
+    service = request.app[SERVICE]
+    variant = body.get("graph") or service.variant
+    if not isinstance(variant, str) or variant not in GRAPH_BUILDERS:
+        raise _error(web.HTTPBadRequest, f"未知的图变体: {variant}，可选: {list(GRAPH_BUILDERS)}")
+
+    configurable = body.get("config") or {}
+    if not isinstance(configurable, dict):
+        raise _error(web.HTTPBadRequest, "config 必须是 JSON 对象")
+    unknown = set(configurable) - set(RUN_OPTIONS)
+    if unknown:
+        raise _error(web.HTTPBadRequest, f"不支持的配置: {sorted(unknown)}，可选: {list(RUN_OPTIONS)}")
+    try:
+        configurable = {name: _coerce_option(name, value) for name, value in configurable.items()}
+    except ValueError as e:
+        raise _error(web.HTTPBadRequest, f"配置无效: {e}")
+    profile = configurable.get("model_profile")
+    if profile is not None and profile not in get_profiles():
+        raise _error(web.HTTPBadRequest, f"未知的模型档位: {profile}，可选: {list(get_profiles())}")
+
+    review = bool(body.get("review", False))
+    if review and service.reviews is None:
+        raise _error(web.HTTPBadRequest, "服务没有配置 checkpointer，不支持审核")
+
+    thread_id = body.get("thread_id") or uuid.uuid4().hex
+    if isinstance(thread_id, bool) or not isinstance(thread_id, (str, int)):
+        raise _error(web.HTTPBadRequest, "thread_id 必须是字符串")
+    thread_id = str(thread_id)
+    return RunRequest(question.strip(), thread_id, variant, configurable, review)
+
+
+async def create_run(request: web.Request) -> web.Response:
+    """POST /runs - 运行到结束，返回最终答案"""
+    service = request.app[SERVICE]
+    run_request = await _parse_run(request)
+    result = {}
+    with log_context(thread_id=run_request.thread_id):
+        try:
+            async with service.slot(run_request):
+                async for event, data in service.events(run_request, tokens=False):
+                    if event in ("end", "interrupt"):
+                        result.update(data)
+        except RunConflict:
+            raise _error(web.HTTPConflict, f"thread {run_request.thread_id} 已有运行在执行")
+        except asyncio.CancelledError:
+            service.counts["cancelled"] += 1
+            raise
+        except Exception as e:
+            service.counts["failed"] += 1
+            logger.exception("运行失败")
+            return web.json_response(
+                {"thread_id": run_request.thread_id, "error": f"{type(e).__name__}: {e}"}, status=500,
+            )
+    service.counts["completed"] += 1
+    return web.json_response({"thread_id": run_request.thread_id, **result})
+
+
+async def stream_run(request: web.Request) -> web.StreamResponse:
+    """POST /runs/stream - 以 SSE 推送运行过程"""
+    service = request.app[SERVICE]
+    run_request = await _parse_run(request)
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    with log_context(thread_id=run_request.thread_id):
+        try:
+            async with service.slot(run_request):
+                await response.prepare(request)
+                status = "completed"
+                try:
+                    events = service.events(run_request)
+                    async for item in _with_heartbeat(events, SERVER_HEARTBEAT_S):
+                        await response.write(b": ping\n\n" if item is None else _sse(*item))
+                except (ConnectionResetError, asyncio.CancelledError):
+                    # 客户端断开或运行被取消，后台的图随之取消
+                    status = "cancelled"
+                    raise
+                except Exception as e:
+                    status = "failed"
+                    logger.exception("运行失败")
+                    await response.write(_sse("error", {"error": f"{type(e).__name__}: {e}"}))
+                finally:
+                    service.counts[status] += 1
+        except RunConflict:
+            raise _error(web.HTTPConflict, f"thread {run_request.thread_id} 已有运行在执行")
+        except ConnectionResetError:
+            logger.info("客户端断开，运行已取消")
+            return response
+    await response.write_eof()
+    return response
+
+
+async def list_runs(request: web.Request) -> web.Response:
+    """GET /runs - 正在执行和排队的运行"""
+    now = time.time()
+    runs = [
+        {"thread_id": run.thread_id, "graph": run.graph, "state": run.state,
+         "elapsed_s": round(now - run.started_at, 3)}
+        for run in request.app[SERVICE].runs.values()
+    ]
+    return web.json_response({"runs": runs})
+
+
+async def cancel_run(request: web.Request) -> web.Response:
+    """DELETE /runs/{thread_id} - 取消运行"""
+    thread_id = request.match_info["thread_id"]
+    if not request.app[SERVICE].cancel(thread_id):
+        raise _error(web.HTTPNotFound, f"thread {thread_id} 没有正在执行的运行")
+    return web.json_response({"thread_id": thread_id, "cancelled": True}, status=202)
+
+
+async def get_thread(request: web.Request) -> web.Response:
+    """GET /threads/{thread_id} - thread 的当前状态"""
+    service = request.app[SERVICE]
+    if service.checkpointer is None:
+        raise _error(web.HTTPNotFound, "服务没有配置 checkpointer，不保存 thread 状态")
+    thread_id = request.match_info["thread_id"]
+    snapshot = await service.graph().aget_state({"configurable": {"thread_id": thread_id}})
+    if not snapshot.values:
+        raise _error(web.HTTPNotFound, f"thread {thread_id} 不存在")
+    return web.json_response({
+        "thread_id": thread_id,
+        "values": _jsonable(snapshot.values),
+        "next": list(snapshot.next),
+        "running": thread_id in service.runs,
+    })
+
+
+def _reviews(request: web.Request) -> ReviewQueue:
+    reviews = request.app[SERVICE].reviews
+    if reviews is None:
+        raise _error(web.HTTPNotFound, "服务没有配置 checkpointer，不支持审核")
+    return reviews
+
+
+def _review_json(review) -> dict:
+    return {
+        "thread_id": review.thread_id,
+        "task": review.task,
+        "graph": review.graph,
+        "config": review.configurable,
+        "paused_at": review.paused_at,
+        "rounds": review.rounds,
+    }
+
+
+async def submit_review(request: web.Request) -> web.Response:
+    """POST /reviews - 提交问题，由审核队列的 worker 执行到断点"""
+    reviews = _reviews(request)
+    run_request = await _parse_run(request)
+    if run_request.thread_id in request.app[SERVICE].runs or reviews.busy(run_request.thread_id):
+        raise _error(web.HTTPConflict, f"thread {run_request.thread_id} 已有运行在执行或等待审核")
+    await reviews.submit(run_request.question, run_request.thread_id, run_request.graph, run_request.configurable)
+    return web.json_response({"thread_id": run_request.thread_id, "review": "queued"}, status=202)
+
+
+async def list_reviews(request: web.Request) -> web.Response:
+    """GET /reviews?limit=&offset= - 待审核的运行（先暂停的在前）"""
+    reviews = _reviews(request)
+    try:
+        limit = int(request.query["limit"]) if "limit" in request.query else None
+        offset = int(request.query.get("offset", 0))
+    except ValueError:
+        raise _error(web.HTTPBadRequest, "limit / offset 必须是整数")
+    return web.json_response({
+        "total": len(reviews.pending),
+        "reviews": [_review_json(review) for review in reviews.list(limit, offset)],
+    })
+
+
+async def get_review(request: web.Request) -> web.Response:
+    """GET /reviews/{thread_id} - 待审核运行的详情"""
+    thread_id = request.match_info["thread_id"]
+    detail = await _reviews(request).get(thread_id)
+    if detail is None:
+        raise _error(web.HTTPNotFound, f"thread {thread_id} 不在待审核列表中")
+    return web.json_response({**_review_json(detail.pop("review")), **detail})
+
+
+async def decide_review(request: web.Request) -> web.Response:
+    """POST /reviews/{thread_id} - 提交审核结果，运行交给 worker 继续"""
+    reviews = _reviews(request)
+    thread_id = request.match_info["thread_id"]
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise _error(web.HTTPBadRequest, "请求体不是合法的 JSON")
+    if not isinstance(body, dict) or body.get("action") not in ACTIONS:
+        raise _error(web.HTTPBadRequest, f"action 必须是: {list(ACTIONS)}")
+    try:
+        status = await reviews.decide(thread_id, body["action"], str(body.get("feedback") or ""))
+    except KeyError:
+        raise _error(web.HTTPNotFound, f"thread {thread_id} 不在待审核列表中")
+    except ValueError as e:
+        raise _error(web.HTTPBadRequest, str(e))
+    return web.json_response({"thread_id": thread_id, "review": status}, status=202)
+
+
+async def health(request: web.Request) -> web.Response:
+    """GET /healthz"""
+    service = request.app[SERVICE]
+    return web.json_response({
+        "status": "ok",
+        "uptime_s": round(time.time() - service.started_at, 3),
+        "graph": service.variant,
+        "checkpointer": type(service.checkpointer).__name__ if service.checkpointer is not None else None,
+        **service.stats(),
+    })
+
+
+def _render_server_metrics(stats: dict, prefix: str = "agent") -> str:
+    lines = [
+        f"# TYPE {prefix}_server_runs gauge",
+        f'{prefix}_server_runs{{state="running"}} {stats["running"]}',
+        f'{prefix}_server_runs{{state="queued"}} {stats["queued"]}',
+        f"# TYPE {prefix}_server_runs_total counter",
+    ]
+    for status in ("completed", "failed", "cancelled"):
+        lines.append(f'{prefix}_server_runs_total{{status="{status}"}} {stats[status]}')
+    reviews = stats.get("reviews")
+    if reviews:
+        lines.append(f"# TYPE {prefix}_review_runs gauge")
+        for state in ("pending", "queued", "active"):
+            lines.append(f'{prefix}_review_runs{{state="{state}"}} {reviews[state]}')
+        lines.append(f"# TYPE {prefix}_review_decisions_total counter")
+        for status in ACTIONS.values():
+            lines.append(f'{prefix}_review_decisions_total{{status="{status}"}} {reviews[status]}')
+        lines.append(f"# TYPE {prefix}_review_drafts_total counter")
+        lines.append(f'{prefix}_review_drafts_total{{result="hit"}} {reviews["draft_hits"]}')
+        lines.append(f'{prefix}_review_drafts_total{{result="discarded"}} {reviews["drafts_discarded"]}')
+    return "\n".join(lines) + "\n"
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """GET /metrics - Prometheus 文本格式，?format=json 返回 JSON"""
+    stats = request.app[SERVICE].stats()
+    aggregator = get_metrics().aggregator
+    if request.query.get("format") == "json":
+        return web.json_response({"server": stats, **(aggregator.summary() if aggregator else {})})
+    text = (render_prometheus(aggregator) if aggregator else "") + _render_server_metrics(stats)
+    return web.Response(text=text, content_type="text/plain", headers={"X-Content-Type-Options": "nosniff"})
+
+
+# ============================================================
+# 应用
+# ============================================================
+
+def create_app(
+    variant: str = SERVER_GRAPH,
+    checkpoint: str | None = SERVER_CHECKPOINT,
+    max_runs: int = SERVER_MAX_RUNS,
+    review_workers: int = REVIEW_WORKERS,
+    speculative: bool = REVIEW_SPECULATIVE,
+) -> web.Application:
+    """
+    创建 HTTP 应用
+
+    Args:
+        variant: 默认的图变体，见 GRAPH_BUILDERS
+        checkpoint: 空表示不保存状态，"memory" 用 MemorySaver，其余作为 SQLite 文件路径
+        max_runs: 最多同时执行的运行数
+        review_workers: 审核队列的 worker 数（配置了 checkpointer 时才有审核队列）
+        speculative: 等待审核时是否推测执行写作者，见 src/review/manager.py
+    """
+    # 没有经过 src/server/__main__.py 启动时（如 aiohttp.web 直接加载），在这里按环境变量配置日志
+    ensure_logging()
+    app = web.Application()
+
+    async def lifespan(app: web.Application):
+        async with AsyncExitStack() as stack:
+            checkpointer = None
+            if checkpoint == "memory":
+                from langgraph.checkpoint.memory import MemorySaver
+                checkpointer = MemorySaver()
+            elif checkpoint:
+                from ..checkpoint import create_checkpointer
+                checkpointer = await stack.enter_async_context(create_checkpointer(checkpoint))
+
+            reviews = None
+            if checkpointer is not None:
+                reviews = ReviewQueue(checkpointer, review_workers, default_graph=variant, speculative=speculative)
+                # 找回上次退出时待审核、已审核未执行完的运行
+                await reviews.start()
+                stack.push_async_callback(reviews.stop)
+
+            service = app[SERVICE] = AgentService(variant, checkpointer, max_runs, reviews)
+            service.warm_up()
+            logger.info("服务已启动: graph=%s checkpointer=%s max_runs=%d",
+                        variant, checkpoint or "none", max_runs)
+            yield
+            await service.shutdown()
+
+    app.cleanup_ctx.append(lifespan)
+    app.add_routes([
+        web.post("/runs", create_run),
+        web.post("/runs/stream", stream_run),
+        web.get("/runs", list_runs),
+        web.delete("/runs/{thread_id}", cancel_run),
+        web.get("/threads/{thread_id}", get_thread),
+        web.post("/reviews", submit_review),
+        web.get("/reviews", list_reviews),
+        web.get("/reviews/{thread_id}", get_review),
+        web.post("/reviews/{thread_id}", decide_review),
+        web.get("/healthz", health),
+        web.get("/metrics", metrics),
+    ])
+    return app
+
+
+def run_server(app: web.Application, host: str = SERVER_HOST, port: int = SERVER_PORT):
+    """阻塞运行服务，直到收到 Ctrl+C / SIGTERM"""
+    logger.info("监听 http://%s:%d", host, port)
+    web.run_app(app, host=host, port=port, print=None, access_log=None)
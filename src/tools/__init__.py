@@ -1,3 +1,19 @@
 from .tools import web_search, calculator, get_research_tools, get_all_tools
+from .executor import run_tool_calls, arun_tool_calls
+from .registry import ToolRegistry, registry
+from .search import CachedSearch, FakeSearchBackend, get_search, set_search_backend
 
-__all__ = ["web_search", "calculator", "get_research_tools", "get_all_tools"]
+__all__ = [
+    "web_search",
+    "calculator",
+    "get_research_tools",
+    "get_all_tools",
+    "run_tool_calls",
+    "arun_tool_calls",
+    "ToolRegistry",
+    "registry",
+    "CachedSearch",
+    "FakeSearchBackend",
+    "get_search",
+    "set_search_backend",
+]
@@ -0,0 +1,155 @@
+"""
+工具执行器 - 并发执行 LLM 返回的多个工具调用
+
+LLM 一次可能返回多个 tool_calls（比如同时搜索 5 个关键词），
+逐个执行要付出 5 次完整的网络延迟。这里把它们并发执行：
+- 并发数有上限（避免一次打满下游 API）
+- 每个工具调用有超时（慢调用不会拖住整个节点）
+- 超时或出错的调用变成一条错误 ToolMessage，而不是抛异常
+- 返回的 ToolMessage 顺序与 tool_calls 的顺序一致
+- 每个调用的耗时和结果（成功 / 出错 / 超时）记录到指标中
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from langchain_core.messages import ToolMessage
+
+from ..observability.metrics import record
+
+
+# 默认配置，可以通过环境变量覆盖
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+
+# 同步版本里还有排队的调用时，检查它们是否已经开始执行的间隔（秒）
+_POLL_INTERVAL = 0.05
+
+
+def _error_message(tool_call: dict, error: str) -> ToolMessage:
+    """把失败的工具调用包装成错误 ToolMessage"""
+    return ToolMessage(
+        content=error,
+        tool_call_id=tool_call["id"],
+        name=tool_call["name"],
+        status="error",
+    )
+
+
+def _timed_invoke(tool, args, started: list, index: int):
+    """在线程池中执行工具：把开始时间记到 started[index]，返回结果和实际耗时"""
+    started[index] = time.perf_counter()
+    return tool.invoke(args), time.perf_counter() - started[index]
+
+
+def _result_message(tool_call: dict, result) -> ToolMessage:
+    """把工具结果包装成 ToolMessage（必须指定 tool_call_id）"""
+    return ToolMessage(
+        content=str(result),
+        tool_call_id=tool_call["id"],
+        name=tool_call["name"],
+    )
+
+
+async def arun_tool_calls(
+    tool_calls: list,
+    tools: dict,
+    concurrency: int = TOOL_CONCURRENCY,
+    timeout: float = TOOL_TIMEOUT,
+) -> list[ToolMessage]:
+    """
+    并发执行工具调用（异步版本）
+
+    Args:
+        tool_calls: LLM 返回的 response.tool_calls
+        tools: 可用工具的 名称 -> 工具 映射（见 ToolRegistry.get_tool_map）
+        concurrency: 最大并发数
+        timeout: 单个工具调用的超时时间（秒）
+
+    Returns:
+        与 tool_calls 一一对应的 ToolMessage 列表
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(tool_call: dict) -> ToolMessage:
+        tool = tools.get(tool_call["name"])
+        if tool is None:
+            return _error_message(tool_call, f"工具未找到: {tool_call['name']}")
+
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(tool.ainvoke(tool_call["args"]), timeout)
+            except asyncio.TimeoutError:
+                record("tool", tool_call["name"], time.perf_counter() - started, ok=False, error="timeout")
+                return _error_message(tool_call, f"工具调用超时（{timeout}s）")
+            except Exception as e:
+                record("tool", tool_call["name"], time.perf_counter() - started, ok=False, error=type(e).__name__)
+                return _error_message(tool_call, f"工具调用出错: {str(e)}")
+
+        record("tool", tool_call["name"], time.perf_counter() - started)
+        return _result_message(tool_call, result)
+
+    # gather 按传入顺序返回结果，保证与 tool_call_id 顺序一致
+    return list(await asyncio.gather(*(run_one(tc) for tc in tool_calls)))
+
+
+def run_tool_calls(
+    tool_calls: list,
+    tools: dict,
+    concurrency: int = TOOL_CONCURRENCY,
+    timeout: float = TOOL_TIMEOUT,
+) -> list[ToolMessage]:
+    """
+    并发执行工具调用（同步版本，使用线程池）
+
+    参数和返回值与 arun_tool_calls 相同。
+    超时从调用真正开始执行时算起（排队等线程的时间不算），和异步版本一致；
+    超时的调用不再等待，但已经开始的线程会在后台自然结束。
+    """
+    messages: list[ToolMessage | None] = [None] * len(tool_calls)
+    # 每个调用开始执行的时间，还在排队时为 None
+    started: list[float | None] = [None] * len(tool_calls)
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        pending = {}
+        for index, tool_call in enumerate(tool_calls):
+            tool = tools.get(tool_call["name"])
+            if tool is None:
+                messages[index] = _error_message(tool_call, f"工具未找到: {tool_call['name']}")
+                continue
+            pending[executor.submit(_timed_invoke, tool, tool_call["args"], started, index)] = index
+
+        while pending:
+            # 等到最早的截止时间；还有排队的调用时定期醒来，给刚开始执行的调用算截止时间
+            deadlines = [started[i] + timeout for i in pending.values() if started[i] is not None]
+            wait_s = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+            if len(deadlines) < len(pending):
+                wait_s = _POLL_INTERVAL if wait_s is None else min(wait_s, _POLL_INTERVAL)
+            done, _ = wait(pending, timeout=wait_s, return_when=FIRST_COMPLETED)
+
+            now = time.perf_counter()
+            for future in done:
+                index = pending.pop(future)
+                tool_call = tool_calls[index]
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    record("tool", tool_call["name"], now - started[index], ok=False, error=type(e).__name__)
+                    messages[index] = _error_message(tool_call, f"工具调用出错: {str(e)}")
+                    continue
+                record("tool", tool_call["name"], elapsed)
+                messages[index] = _result_message(tool_call, result)
+
+            for future, index in list(pending.items()):
+                if started[index] is not None and now - started[index] >= timeout:
+                    del pending[future]
+                    tool_call = tool_calls[index]
+                    record("tool", tool_call["name"], now - started[index], ok=False, error="timeout")
+                    messages[index] = _error_message(tool_call, f"工具调用超时（{timeout}s）")
+
+        return messages
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,92 @@
+"""
+工具注册表 - 按名称管理工具，并缓存 bind_tools 的结果
+
+以前每次 researcher_node 调用都会：
+1. 重新构建工具列表
+2. 重新 llm.bind_tools(tools)（每次都要重新推导 JSON Schema）
+3. 线性扫描工具列表来找到要执行的工具
+
+注册表把这些都变成一次性的工作：
+- 工具按名称存在字典里，查找是 O(1)
+- 工具集（如 "research"）是一组工具名的命名集合
+- 绑定好工具的模型按 (模型, 工具集) 缓存，所有节点和图变体共享同一个
+"""
+
+import threading
+
+from langchain_core.tools import BaseTool
+
+
+class ToolRegistry:
+    """工具注册表"""
+
+    def __init__(self):
+        self._tools: dict[str, BaseTool] = {}
+        self._toolsets: dict[str, tuple[str, ...]] = {}
+        # id(model), 工具集名 -> (model, 绑定后的模型)
+        # 同时保存 model 本身，防止 id 被回收复用后命中错误的缓存
+        self._bound: dict[tuple[int, str], tuple[object, object]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, tool: BaseTool) -> BaseTool:
+        """注册一个工具，同名工具会被覆盖"""
+        with self._lock:
+            self._tools[tool.name] = tool
+            self._bound.clear()
+        return tool
+
+    def register_toolset(self, name: str, tool_names: list[str]):
+        """注册一个工具集（一组工具名）"""
+        missing = [n for n in tool_names if n not in self._tools]
+        if missing:
+            raise KeyError(f"未注册的工具: {missing}")
+        with self._lock:
+            self._toolsets[name] = tuple(tool_names)
+            self._bound = {k: v for k, v in self._bound.items() if k[1] != name}
+
+    def get(self, name: str) -> BaseTool | None:
+        """按名称获取工具，找不到返回 None"""
+        return self._tools.get(name)
+
+    def get_tools(self, toolset: str) -> list[BaseTool]:
+        """获取工具集里的工具列表"""
+        return [self._tools[n] for n in self._toolsets[toolset]]
+
+    def get_tool_map(self, toolset: str) -> dict[str, BaseTool]:
+        """获取工具集的 名称 -> 工具 映射，用于执行工具调用"""
+        return {n: self._tools[n] for n in self._toolsets[toolset]}
+
+    def bind(self, model, toolset: str):
+        """
+        返回绑定了工具集的模型（带缓存）
+
+        同一个模型 + 工具集只会调用一次 bind_tools。
+        """
+        key = (id(model), toolset)
+        cached = self._bound.get(key)
+        if cached is not None and cached[0] is model:
+            return cached[1]
+
+        with self._lock:
+            cached = self._bound.get(key)
+            if cached is not None and cached[0] is model:
+                return cached[1]
+            bound = model.bind_tools(self.get_tools(toolset))
+            self._bound[key] = (model, bound)
+            return bound
+
+
+def _build_default_registry() -> ToolRegistry:
+    """构建项目默认的工具注册表"""
+    from .tools import web_search, calculator
+
+    registry = ToolRegistry()
+    registry.register(web_search)
+    registry.register(calculator)
+    registry.register_toolset("research", ["web_search"])
+    registry.register_toolset("all", ["web_search", "calculator"])
+    return registry
+
+
+# 默认注册表 - 所有节点共享
+registry = _build_default_registry()
@@ -0,0 +1,245 @@
+"""
+搜索后端 - web_search 背后的共享客户端和缓存
+
+以前 web_search 每次调用都新建一个 TavilyClient，没有连接复用；
+研究循环（build_graph_with_condition）还会反复搜索同一个关键词。
+
+这里提供：
+- 共享的搜索后端：Tavily 客户端只创建一次，底层 HTTP 连接池复用连接
+- 进程内 TTL 缓存：按归一化后的查询词缓存结果
+- 请求合并：同一个查询词的并发请求只发出一次，其余请求等待同一个结果
+- 可替换的后端：测试和基准测试可以换成本地的 FakeSearchBackend
+- 限流：真正发给后端的请求经过共享的 "search" 限流器（缓存命中和合并的请求不占额度）
+
+环境变量:
+    TAVILY_API_KEY      设置后使用 Tavily，否则返回模拟结果
+    TAVILY_BASE_URL     Tavily 接口地址（可以指向本地替身服务）
+    SEARCH_CACHE_TTL    缓存有效期（秒），0 表示不缓存
+    SEARCH_CACHE_SIZE   缓存最大条目数
+    SEARCH_POOL_SIZE    HTTP 连接池大小
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from ..llm.ratelimit import get_limiter
+
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_POOL_SIZE = int(os.getenv("SEARCH_POOL_SIZE", "16"))
+
+
+def normalize_query(query: str) -> str:
+    """归一化查询词：去掉首尾空白、合并中间空白、统一小写"""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+# ============================================================
+# 搜索后端
+# ============================================================
+
+class TavilySearchBackend:
+    """Tavily 搜索后端 - 共享一个客户端和 HTTP 连接池"""
+
+    def __init__(self, api_key: str, base_url: str | None = None, pool_size: int = SEARCH_POOL_SIZE):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from tavily import TavilyClient
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        kwargs = {"api_key": api_key}
+        if base_url:
+            kwargs["api_base_url"] = base_url
+        try:
+            self.client = TavilyClient(session=session, **kwargs)
+        except TypeError:
+            # 旧版本 tavily-python 不支持传入 session，退回到默认客户端
+            self.client = TavilyClient(**kwargs)
+
+    def search(self, query: str, max_results: int = 5) -> list[dict]:
+        """返回 [{"title", "content", "url"}, ...]"""
+        response = self.client.search(query, max_results=max_results)
+        return response.get("results", [])
+
+
+class MockSearchBackend:
+    """
+    没有配置 TAVILY_API_KEY 时使用的模拟后端
+
+    web_search 会调用 format 输出和以前一样的模拟文本，
+    模拟结果的格式不因为换成共享后端而改变。
+    """
+
+    def search(self, query: str, max_results: int = 5) -> list[dict]:
+        return [
+            {
+                "title": f"模拟结果{i}",
+                "content": f"这是关于 {query} 的第{n}条搜索结果...",
+                "url": f"https://example.com/search?q={query}&n={i}",
+            }
+            for i, n in zip(range(1, min(max_results, 3) + 1), "一二三")
+        ]
+
+    def format(self, query: str, items: list[dict]) -> str:
+        lines = "\n".join(f"{item['title']}: {item['content']}" for item in items)
+        return f"""
+[模拟搜索结果 - 请配置 TAVILY_API_KEY 以获取真实结果]
+
+搜索词: {query}
+
+{lines}
+"""
+
+
+class FakeSearchBackend:
+    """
+    本地替身后端 - 用于测试和基准测试
+
+    Args:
+        latency: 每次搜索的模拟延迟（秒）
+        results: 查询词 -> 结果列表，没有命中时返回生成的结果
+    """
+
+    def __init__(self, latency: float = 0.0, results: dict[str, list[dict]] | None = None):
+        self.latency = latency
+        self.results = results or {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int = 5) -> list[dict]:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if query in self.results:
+            return self.results[query][:max_results]
+        return [
+            {"title": f"{query} #{i}", "content": f"关于 {query} 的内容 {i}", "url": f"https://fake.local/{i}"}
+            for i in range(1, max_results + 1)
+        ]
+
+
+# ============================================================
+# 缓存 + 请求合并
+# ============================================================
+
+class CachedSearch:
+    """
+    带 TTL 缓存和请求合并的搜索
+
+    Args:
+        backend: 搜索后端，需要实现 search(query, max_results)
+        ttl: 缓存有效期（秒），0 表示不缓存（请求合并仍然生效）
+        max_size: 缓存最大条目数，超过后淘汰最早的条目
+    """
+
+    def __init__(self, backend, ttl: float = SEARCH_CACHE_TTL, max_size: int = SEARCH_CACHE_SIZE):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._cache: OrderedDict[tuple, tuple[float, list[dict]]] = OrderedDict()
+        self._inflight: dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int = 5) -> list[dict]:
+        key = (normalize_query(query), max_results)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                # 同一个查询正在进行中，等它的结果
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            limiter = get_limiter("search")
+            if limiter is None:
+                results = self.backend.search(query, max_results=max_results)
+            else:
+                # web_search 是同步工具，在线程池里执行，这里等待不会阻塞事件循环
+                with limiter.hold():
+                    results = self.backend.search(query, max_results=max_results)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if self.ttl > 0:
+                self._cache[key] = (time.monotonic(), results)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+        future.set_result(results)
+        return results
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self._cache),
+        }
+
+
+_search: CachedSearch | None = None
+_search_lock = threading.Lock()
+
+
+def get_search() -> CachedSearch:
+    """获取共享的搜索实例（第一次调用时根据环境变量创建后端）"""
+    global _search
+    if _search is not None:
+        return _search
+
+    with _search_lock:
+        if _search is None:
+            api_key = os.getenv("TAVILY_API_KEY")
+            if api_key:
+                backend = TavilySearchBackend(api_key, base_url=os.getenv("TAVILY_BASE_URL"))
+            else:
+                backend = MockSearchBackend()
+            _search = CachedSearch(backend)
+    return _search
+
+
+def set_search_backend(backend, ttl: float = SEARCH_CACHE_TTL, max_size: int = SEARCH_CACHE_SIZE) -> CachedSearch:
+    """替换搜索后端（用于测试、基准测试或本地替身服务），返回新的搜索实例"""
+    global _search
+    with _search_lock:
+        _search = CachedSearch(backend, ttl=ttl, max_size=max_size)
+    return _search
@@ -4,9 +4,10 @@
 工具让 Agent 能够与外部世界交互，比如搜索网络、执行代码等。
 """
 
-import os
 from langchain_core.tools import tool
 
+from .search import get_search
+
 
 @tool
 def web_search(query: str) -> str:
@@ -19,35 +20,24 @@ def web_search(query: str) -> str:
     Returns:
         搜索结果摘要
     """
-    # 检查是否配置了 Tavily API
-    api_key = os.getenv("TAVILY_API_KEY")
+    # 共享的搜索实例：复用 HTTP 连接，缓存相同查询，合并并发的相同请求
+    # （没有配置 TAVILY_API_KEY 时使用模拟结果，见 search.py）
+    try:
+        items = get_search().search(query, max_results=5)
+    except Exception as e:
+        return f"搜索出错: {str(e)}"
     
-    if api_key:
-        # 使用 Tavily 搜索
-        try:
-            from tavily import TavilyClient
-            client = TavilyClient(api_key=api_key)
-            response = client.search(query, max_results=5)
-            
-            # 格式化结果
-            results = []
-            for item in response.get("results", []):
-                results.append(f"**{item['title']}**\n{item['content']}\n来源: {item['url']}\n")
-            
-            return "\n---\n".join(results) if results else "未找到相关结果"
-        except Exception as e:
-            return f"搜索出错: {str(e)}"
-    else:
-        # 没有配置 API，返回模拟结果
-        return f"""
-[模拟搜索结果 - 请配置 TAVILY_API_KEY 以获取真实结果]
-
-搜索词: {query}
-
-模拟结果1: 这是关于 {query} 的第一条搜索结果...
-模拟结果2: 这是关于 {query} 的第二条搜索结果...
-模拟结果3: 这是关于 {query} 的第三条搜索结果...
-"""
+    # 后端可以自带输出格式（模拟后端保持以前的模拟文本）
+    format_results = getattr(get_search().backend, "format", None)
+    if format_results is not None:
+        return format_results(query, items)
+    
+    # 格式化结果
+    results = []
+    for item in items:
+        results.append(f"**{item['title']}**\n{item['content']}\n来源: {item['url']}\n")
+    
+    return "\n---\n".join(results) if results else "未找到相关结果"
 
 
 @tool  
@@ -0,0 +1,15 @@
+import pytest
+
+from src.llm.fake import FakeChatModel
+from src.llm.models import reset_models, set_model
+from src.tools.search import FakeSearchBackend, set_search_backend
+
+
+@pytest.fixture
+def fake_model():
+    """所有节点使用本地替身模型和替身搜索后端"""
+    model = FakeChatModel()
+    set_model(model)
+    set_search_backend(FakeSearchBackend())
+    yield model
+    reset_models()
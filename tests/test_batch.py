@@ -0,0 +1,56 @@
+"""批量模式：无效的行各自输出一行 error，不影响其他问题"""
+
+import asyncio
+import io
+import json
+
+import main
+
+
+LINES = [
+    '{"id": "a", "question": "什么是 LangGraph？"}',
+    '"直接写问题字符串"',
+    '{"id": "broken", ',
+    "42",
+    '["not", "an", "object"]',
+    '{"id": "empty"}',
+    "",
+]
+
+
+def test_read_questions_marks_invalid_lines(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text("\n".join(LINES), encoding="utf-8")
+
+    items = main.read_questions(str(path))
+
+    assert [item["id"] for item in items] == ["a", 2, 3, 4, 5, "empty"]
+    assert [("error" in item) for item in items] == [False, False, True, True, True, True]
+
+
+def test_run_batch_outputs_every_line(tmp_path, fake_model):
+    path = tmp_path / "questions.jsonl"
+    path.write_text("\n".join(LINES), encoding="utf-8")
+    output = io.StringIO()
+
+    asyncio.run(main.run_batch(str(path), concurrency=4, output=output))
+
+    results = {result["id"]: result for result in map(json.loads, output.getvalue().splitlines())}
+    assert set(results) == {"a", 2, 3, 4, 5, "empty"}
+    assert results["a"]["final_answer"]
+    assert results[2]["final_answer"]
+    for key in (3, 4, 5, "empty"):
+        assert set(results[key]) == {"id", "error", "elapsed_s"}
+
+
+def test_answer_question_invalid_line(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text('{"id": 7}', encoding="utf-8")
+    [item] = main.read_questions(str(path))
+
+    # 无效的行不会运行图
+    result = asyncio.run(main.answer_question(None, item))
+
+    assert set(result) == {"id", "error", "elapsed_s"}
+    assert result["id"] == 7
+    assert result["error"] == item["error"]
@@ -0,0 +1,46 @@
+"""研究预算：次数 / 时间 / token 任意一项用完就进入 writer"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.graph.budget import ResearchBudget, budget_usage
+from src.graph.builder import build_graph_with_condition
+from src.graph.state import make_initial_state
+
+
+def test_from_config_overrides_defaults():
+    budget = ResearchBudget.from_config({"configurable": {"max_iterations": "5", "token_budget": 100}})
+
+    assert budget.max_iterations == 5
+    assert budget.token_budget == 100
+    assert budget.deadline_s == ResearchBudget().deadline_s
+
+
+@pytest.mark.parametrize("state, budget, exhausted", [
+    ({"research_iterations": 2}, ResearchBudget(max_iterations=3, deadline_s=0, token_budget=0), None),
+    ({"research_iterations": 3}, ResearchBudget(max_iterations=3, deadline_s=0, token_budget=0), "iterations"),
+    ({"started_at": time.time() - 10}, ResearchBudget(max_iterations=0, deadline_s=5, token_budget=0), "deadline"),
+    ({"tokens_used": 100}, ResearchBudget(max_iterations=0, deadline_s=0, token_budget=100), "tokens"),
+    ({"research_iterations": 99, "tokens_used": 10**6}, ResearchBudget(max_iterations=0, deadline_s=0, token_budget=0), None),
+])
+def test_budget_usage(state, budget, exhausted):
+    assert budget_usage(state, budget)["exhausted"] == exhausted
+
+
+@pytest.mark.parametrize("configurable, iterations, exhausted", [
+    ({"max_iterations": 3}, 3, "iterations"),
+    ({"max_iterations": 0, "token_budget": 1}, 1, "tokens"),
+])
+def test_loop_stops_when_budget_exhausted(fake_model, configurable, iterations, exhausted):
+    # 回答很短，不加限制时研究循环会一直继续
+    fake_model.output_tokens = 3
+    graph = build_graph_with_condition()
+    config = {"configurable": configurable, "recursion_limit": 50}
+
+    state = asyncio.run(graph.ainvoke(make_initial_state("什么是 LangGraph？"), config))
+
+    assert state["research_iterations"] == iterations
+    assert state["budget"]["exhausted"] == exhausted
+    assert state["final_answer"]
@@ -0,0 +1,71 @@
+"""DeltaCheckpointSaver：经过包装读出的历史要和直接用内部 saver 完全一样"""
+
+import operator
+import sqlite3
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, START, StateGraph
+
+from src.checkpoint import DeltaCheckpointSaver
+from src.checkpoint.delta import DELTA_KEY
+
+
+STEPS = 9
+
+
+class LoopState(TypedDict):
+    messages: Annotated[list, operator.add]
+    step: int
+    note: str
+
+
+def _step(state: LoopState) -> dict:
+    return {"messages": [f"m{state['step']}"], "step": state["step"] + 1}
+
+
+def _build(checkpointer):
+    builder = StateGraph(LoopState)
+    builder.add_node("step", _step)
+    builder.add_edge(START, "step")
+    builder.add_conditional_edges("step", lambda state: END if state["step"] >= STEPS else "step")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _sqlite():
+    return SqliteSaver(sqlite3.connect(":memory:", check_same_thread=False))
+
+
+def _history(checkpointer) -> list[dict]:
+    graph = _build(checkpointer)
+    config = {"configurable": {"thread_id": "t"}}
+    graph.invoke({"messages": [], "step": 0, "note": "x"}, config)
+    return [snapshot.values for snapshot in graph.get_state_history(config)]
+
+
+@pytest.mark.parametrize("make_saver", [_sqlite, InMemorySaver], ids=["sqlite", "memory"])
+def test_history_round_trip(make_saver):
+    plain = _history(make_saver())
+    delta = _history(DeltaCheckpointSaver(make_saver(), keyframe_interval=4))
+
+    assert delta == plain
+    assert len(delta[0]["messages"]) == STEPS
+
+
+def test_sqlite_stores_deltas():
+    inner = _sqlite()
+    _history(DeltaCheckpointSaver(inner, keyframe_interval=4))
+
+    stored = [tup.checkpoint["channel_values"] for tup in inner.list(None)]
+    assert any(DELTA_KEY in values for values in stored)
+
+
+def test_per_channel_saver_passes_through():
+    inner = InMemorySaver()
+    saver = DeltaCheckpointSaver(inner)
+    _history(saver)
+
+    assert not saver.enabled
+    assert all(DELTA_KEY not in tup.checkpoint["channel_values"] for tup in inner.list(None))
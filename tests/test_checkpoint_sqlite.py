@@ -0,0 +1,102 @@
+"""PooledAsyncSqliteSaver：BaseCheckpointSaver 的 aprune 接口和保留策略"""
+
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+
+from src.checkpoint import RetentionPolicy, create_checkpointer
+
+
+STEPS = 9
+
+
+class LoopState(TypedDict):
+    messages: Annotated[list, operator.add]
+    step: int
+
+
+def _step(state: LoopState) -> dict:
+    return {"messages": [f"m{state['step']}"], "step": state["step"] + 1}
+
+
+def _build(checkpointer):
+    builder = StateGraph(LoopState)
+    builder.add_node("step", _step)
+    builder.add_edge(START, "step")
+    builder.add_conditional_edges("step", lambda state: END if state["step"] >= STEPS else "step")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+async def _history(graph, thread_id: str) -> list[dict]:
+    return [snapshot.values async for snapshot in graph.aget_state_history(_config(thread_id))]
+
+
+def run_scenario(tmp_path, scenario, **options):
+    async def main():
+        async with create_checkpointer(str(tmp_path / "checkpoints.db"), **options) as checkpointer:
+            graph = _build(checkpointer)
+            for thread_id in ("t1", "t2"):
+                await graph.ainvoke({"messages": [], "step": 0}, _config(thread_id))
+            return await scenario(checkpointer, graph)
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("delta", [True, False], ids=["delta", "plain"])
+def test_aprune_keep_latest(tmp_path, delta):
+    async def scenario(checkpointer, graph):
+        before = await _history(graph, "t1")
+        await checkpointer.aprune(["t1"], strategy="keep_latest")
+        return before, await _history(graph, "t1"), await _history(graph, "t2")
+
+    before, after, other = run_scenario(tmp_path, scenario, delta=delta)
+    assert after[0] == before[0]
+    assert len(after[0]["messages"]) == STEPS
+    assert len(after) < len(before)
+    assert len(other) == len(before)
+
+
+def test_aprune_delete(tmp_path):
+    async def scenario(checkpointer, graph):
+        await checkpointer.aprune(["t1"], strategy="delete")
+        return await _history(graph, "t1"), await _history(graph, "t2")
+
+    deleted, other = run_scenario(tmp_path, scenario)
+    assert deleted == []
+    assert other[0]["step"] == STEPS
+
+
+def test_aprune_rejects_single_thread_id(tmp_path):
+    async def scenario(checkpointer, graph):
+        with pytest.raises(TypeError):
+            await checkpointer.aprune("t1")
+        with pytest.raises(ValueError):
+            await checkpointer.aprune(["t1"], strategy="oldest")
+        return await _history(graph, "t1")
+
+    assert len(run_scenario(tmp_path, scenario)) > 1
+
+
+@pytest.mark.parametrize("options", [{"delta": False}, {"delta": True, "keyframe_interval": 3}], ids=["plain", "delta"])
+def test_apply_retention_keeps_latest_state(tmp_path, options):
+    # 增量保存时保留下来的 checkpoint 依赖的父链（到最近的关键帧）不会被删除
+    retention = RetentionPolicy(keep_last=3, max_age_s=0, prune_every=1000)
+
+    async def scenario(checkpointer, graph):
+        before = await _history(graph, "t1")
+        saver = getattr(checkpointer, "inner", checkpointer)
+        deleted = await saver.apply_retention("t1")
+        return before, deleted, await _history(graph, "t1")
+
+    before, deleted, after = run_scenario(tmp_path, scenario, retention=retention, **options)
+    assert deleted > 0
+    assert len(after) == len(before) - deleted
+    assert len(after) >= retention.keep_last
+    assert after[0] == before[0]
@@ -0,0 +1,51 @@
+"""写作者上下文：去重、预算装箱、分隔线和默认不限制"""
+
+from src.graph import context
+from src.graph.context import assemble_context, count_text_tokens, dedupe, pack, rank, render, split_chunks
+
+
+PARAGRAPH = "LangGraph 用状态图编排多个智能体，节点之间通过共享状态传递研究结果和中间计划。"
+
+
+def test_default_budget_is_unlimited():
+    assert context.WRITER_CONTEXT_TOKENS == 0
+    assert context.get_context_budget(None) == 0
+    text = f"{PARAGRAPH}\n\n{PARAGRAPH}"
+    assert assemble_context("LangGraph", text, budget=0) == text
+
+
+def test_dedupe_keeps_first_near_duplicate():
+    chunks = split_chunks(f"{PARAGRAPH}\n\n{PARAGRAPH}。\n\n完全不同的一段：向量数据库的索引结构。")
+
+    kept = dedupe(chunks)
+
+    assert [chunk.index for chunk in kept] == [0, 2]
+
+
+def test_unchanged_text_is_returned_as_is():
+    text = f"# 标题\n{PARAGRAPH}\n---\n另一段关于检查点的内容。"
+    assert assemble_context("LangGraph", text, budget=10_000) == text
+
+
+def test_render_keeps_separators():
+    text = f"# 标题\n{PARAGRAPH}\n---\n{PARAGRAPH}\n\n---\n另一段关于检查点的内容。"
+
+    result = assemble_context("LangGraph", text, budget=10_000)
+
+    assert result == f"# 标题\n\n{PARAGRAPH}\n\n---\n\n另一段关于检查点的内容。"
+
+
+def test_pack_respects_budget_and_restores_order():
+    paragraphs = [f"第{i}段：" + "无关的填充内容。" * 20 for i in range(6)]
+    paragraphs[4] = "LangGraph 检查点 " * 20
+    chunks = split_chunks("\n\n".join(paragraphs))
+    budget = chunks[4].tokens + chunks[0].tokens // 2
+
+    packed = pack(rank(chunks, "LangGraph 检查点"), budget)
+
+    # 最相关的块放在第一位，剩下的预算截断下一个块，输出恢复原文顺序
+    assert 4 in [chunk.index for chunk in packed]
+    assert [chunk.index for chunk in packed] == sorted(chunk.index for chunk in packed)
+    assert sum(chunk.tokens for chunk in packed) <= budget
+    assert any(chunk.text.endswith("...") for chunk in packed)
+    assert count_text_tokens(render(packed)) <= budget + len(packed)
@@ -0,0 +1,87 @@
+"""工具执行器：结果顺序、超时从开始执行算起、未知工具、错误指标"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.tools import tool
+
+from src.observability.metrics import InMemoryMetrics, Metrics, get_metrics, set_metrics
+from src.tools.executor import arun_tool_calls, run_tool_calls
+
+
+@tool
+def sleep_for(seconds: float) -> str:
+    """睡眠指定秒数后返回"""
+    time.sleep(seconds)
+    return f"slept {seconds}"
+
+
+@tool
+def fail(reason: str) -> str:
+    """总是出错"""
+    raise ValueError(reason)
+
+
+TOOLS = {"sleep_for": sleep_for, "fail": fail}
+
+
+def _call(index: int, name: str, **args) -> dict:
+    return {"id": f"call_{index}", "name": name, "args": args}
+
+
+@pytest.fixture
+def metrics():
+    previous = get_metrics()
+    aggregator = InMemoryMetrics()
+    set_metrics(Metrics([aggregator]))
+    yield aggregator
+    set_metrics(previous)
+
+
+@pytest.mark.parametrize("runner", ["sync", "async"])
+def test_order_timeout_and_unknown_tool(runner, metrics):
+    calls = [
+        _call(0, "sleep_for", seconds=0.1),
+        _call(1, "missing"),
+        _call(2, "sleep_for", seconds=1.0),
+        _call(3, "fail", reason="boom"),
+        _call(4, "sleep_for", seconds=0.0),
+    ]
+    if runner == "sync":
+        messages = run_tool_calls(calls, TOOLS, concurrency=4, timeout=0.3)
+    else:
+        messages = asyncio.run(arun_tool_calls(calls, TOOLS, concurrency=4, timeout=0.3))
+
+    assert [m.tool_call_id for m in messages] == [c["id"] for c in calls]
+    assert messages[0].content == "slept 0.1"
+    assert messages[1].content == "工具未找到: missing"
+    assert messages[2].content == "工具调用超时（0.3s）"
+    assert messages[3].content == "工具调用出错: boom"
+    assert messages[4].content == "slept 0.0"
+    assert [m.status for m in messages] == ["success", "error", "error", "error", "success"]
+
+    tools = metrics.summary()["tool"]
+    assert tools["sleep_for"]["count"] == 3
+    assert tools["sleep_for"]["errors"] == 1
+    assert tools["fail"]["errors"] == 1
+
+
+def test_queued_call_gets_its_own_timeout(metrics):
+    # 只有一个线程：第二个调用排队等第一个超时的调用结束后才开始，
+    # 排队的时间不算进它自己的超时
+    calls = [_call(0, "sleep_for", seconds=0.5), _call(1, "sleep_for", seconds=0.1)]
+
+    messages = run_tool_calls(calls, TOOLS, concurrency=1, timeout=0.3)
+
+    assert messages[0].content == "工具调用超时（0.3s）"
+    assert messages[1].content == "slept 0.1"
+
+
+def test_error_duration_measured_from_start(metrics):
+    # 排在慢调用后面出错的调用，耗时不包括排队的时间
+    calls = [_call(0, "sleep_for", seconds=0.2), _call(1, "fail", reason="boom")]
+
+    run_tool_calls(calls, TOOLS, concurrency=1, timeout=1.0)
+
+    assert metrics.summary()["tool"]["fail"]["total_s"] < 0.1
@@ -0,0 +1,51 @@
+"""并行研究：子问题解析、合并顺序和子问题数上限"""
+
+import asyncio
+
+from src.graph.builder import build_graph_with_fanout
+from src.graph.nodes import merge_research_node, parse_sub_questions
+from src.graph.state import make_initial_state
+
+
+def test_parse_json_dedupes_and_truncates():
+    text = '计划如下：{"sub_questions": ["甲", " 乙 ", "甲", "丙", "丁"]} 完毕'
+
+    assert parse_sub_questions(text, max_fanout=3) == ["甲", "乙", "丙"]
+
+
+def test_parse_falls_back_to_list_lines():
+    text = "子问题：\n1. 甲\n2) 乙\n- 丙\n说明文字\n* 甲"
+
+    assert parse_sub_questions(text) == ["甲", "乙", "丙"]
+
+
+def test_merge_follows_sub_question_order():
+    state = {
+        "sub_questions": ["甲", "乙", "丙"],
+        "tokens_used": 5,
+        # 研究员按完成的先后追加研究发现
+        "research_findings": [
+            {"question": "丙", "result": "C", "tokens": 3},
+            {"question": "甲", "result": "A", "tokens": 1},
+            {"question": "乙", "result": "B", "tokens": 2},
+        ],
+    }
+
+    update = merge_research_node(state)
+
+    assert update["research_results"] == "### 甲\nA\n\n### 乙\nB\n\n### 丙\nC"
+    assert update["research_iterations"] == 3
+    assert update["tokens_used"] == 11
+
+
+def test_fanout_graph_respects_max_fanout(fake_model):
+    fake_model.fanout = 5
+    graph = build_graph_with_fanout()
+    config = {"configurable": {"max_fanout": 3}}
+
+    state = asyncio.run(graph.ainvoke(make_initial_state("什么是 LangGraph？"), config))
+
+    questions = [line.removeprefix("### ") for line in state["research_results"].splitlines() if line.startswith("### ")]
+    assert questions == state["sub_questions"]
+    assert len(questions) == 3
+    assert state["final_answer"]
@@ -0,0 +1,101 @@
+"""消息窗口：reducer 的窗口和摘要折叠；每个图变体都能用 WindowedState 编译，多轮对话后旧消息折叠进摘要"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.graph import get_graph, make_initial_state
+from src.graph.builder import GRAPH_BUILDERS
+from src.graph.reducers import MESSAGE_WINDOW, SUMMARY_HEADER, SUMMARY_ID, make_windowed_reducer
+
+
+TURNS = 8
+
+
+def _messages(start: int, count: int) -> list:
+    return [HumanMessage(content=f"消息 {i}", id=f"m{i}") for i in range(start, start + count)]
+
+
+def test_reducer_folds_dropped_messages_into_summary():
+    reducer = make_windowed_reducer(max_messages=3, max_tokens=0)
+
+    state = reducer([], _messages(0, 5))
+    assert [m.id for m in state] == [SUMMARY_ID, "m2", "m3", "m4"]
+    assert state[0].content == SUMMARY_HEADER + "- [human] 消息 0\n- [human] 消息 1"
+
+    # 下一次合并把新挤出的消息接在原来的摘要后面，摘要始终只有一条
+    state = reducer(state, _messages(5, 2))
+    assert [m.id for m in state] == [SUMMARY_ID, "m4", "m5", "m6"]
+    assert state[0].content.endswith("- [human] 消息 1\n- [human] 消息 2\n- [human] 消息 3")
+
+
+def test_reducer_within_window_is_unchanged():
+    reducer = make_windowed_reducer(max_messages=3, max_tokens=0)
+    state = reducer([], _messages(0, 3))
+    assert [m.id for m in state] == ["m0", "m1", "m2"]
+
+
+def test_reducer_token_limit_keeps_newest_message():
+    reducer = make_windowed_reducer(max_messages=10, max_tokens=1)
+    state = reducer([], _messages(0, 3))
+    assert [m.id for m in state] == [SUMMARY_ID, "m2"]
+
+
+def test_reducer_window_does_not_start_with_tool_message():
+    reducer = make_windowed_reducer(max_messages=2, max_tokens=0)
+    messages = [
+        HumanMessage(content="问题", id="q"),
+        AIMessage(content="", id="call", tool_calls=[{"name": "web_search", "args": {}, "id": "t1"}]),
+        ToolMessage(content="结果", tool_call_id="t1", id="tool"),
+        AIMessage(content="回答", id="answer"),
+    ]
+
+    state = reducer([], messages)
+
+    assert [m.id for m in state] == [SUMMARY_ID, "answer"]
+
+
+def test_reducer_trims_summary_at_line_boundary():
+    reducer = make_windowed_reducer(max_messages=1, max_tokens=0, summary_max_chars=40)
+    state = reducer([], _messages(0, 10))
+    summary = state[0].content.removeprefix(SUMMARY_HEADER)
+    assert len(summary) <= 40
+    assert summary.startswith("- [human]")
+    assert summary.endswith("消息 8")
+
+
+@pytest.mark.parametrize("variant", list(GRAPH_BUILDERS))
+def test_windowed_memory_on_every_variant(fake_model, variant):
+    graph = get_graph(variant, memory="windowed", checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": f"windowed-{variant}"}}
+
+    async def scenario():
+        sizes = []
+        for turn in range(TURNS):
+            state = await graph.ainvoke(make_initial_state(f"第 {turn} 个问题"), config)
+            sizes.append(len(state["messages"]))
+        return sizes, state
+
+    sizes, state = asyncio.run(scenario())
+    messages = state["messages"]
+    assert state["final_answer"]
+    assert max(sizes) <= MESSAGE_WINDOW + 1
+    assert messages[0].id == SUMMARY_ID
+    assert "- [ai]" in messages[0].content
+    assert sum(message.id == SUMMARY_ID for message in messages) == 1
+
+
+@pytest.mark.parametrize("variant", list(GRAPH_BUILDERS))
+def test_full_memory_keeps_history(fake_model, variant):
+    graph = get_graph(variant, memory="full", checkpointer=MemorySaver())
+    config = {"configurable": {"thread_id": f"full-{variant}"}}
+
+    async def scenario():
+        first = await graph.ainvoke(make_initial_state("问题一"), config)
+        second = await graph.ainvoke(make_initial_state("问题二"), config)
+        return len(first["messages"]), len(second["messages"])
+
+    first, second = asyncio.run(scenario())
+    assert second == 2 * first
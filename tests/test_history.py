@@ -0,0 +1,68 @@
+"""分页历史：游标按页从新到旧遍历，和 get_state_history 一致"""
+
+import asyncio
+
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.checkpoint import aget_history_page, aiter_history, create_checkpointer, get_history_page, iter_history
+from src.graph import get_graph, make_initial_state
+
+
+CONFIG = {"configurable": {"thread_id": "history"}}
+
+
+def test_cursor_pages_match_full_history(fake_model):
+    graph = get_graph("default", checkpointer=MemorySaver())
+    graph.invoke(make_initial_state("问题一"), CONFIG)
+    graph.invoke(make_initial_state("问题二"), CONFIG)
+    expected = [s.config["configurable"]["checkpoint_id"] for s in graph.get_state_history(CONFIG)]
+
+    pages, cursor = [], None
+    while True:
+        page = get_history_page(graph, CONFIG, cursor=cursor, limit=3)
+        pages.append([entry.checkpoint_id for entry in page.entries])
+        if page.cursor is None:
+            break
+        assert page.cursor == page.entries[-1].checkpoint_id
+        cursor = page.cursor
+
+    assert [cid for page in pages for cid in page] == expected
+    assert all(len(page) == 3 for page in pages[:-1])
+    assert [entry.checkpoint_id for entry in iter_history(graph, CONFIG, page_size=4)] == expected
+
+
+def test_entries_describe_steps(fake_model):
+    graph = get_graph("default", checkpointer=MemorySaver())
+    graph.invoke(make_initial_state("问题"), CONFIG)
+
+    entries = list(iter_history(graph, CONFIG))
+
+    # 最新的 checkpoint 由 writer 产生，之后没有要执行的节点
+    assert entries[0].node == ("writer",)
+    assert entries[0].next == ()
+    assert "final_answer" in entries[0].fields
+    assert [entry.step for entry in entries] == sorted((entry.step for entry in entries), reverse=True)
+    snapshot = graph.get_state(entries[1].config)
+    assert snapshot.next == entries[1].next
+
+
+def test_sqlite_pages_from_metadata(fake_model, tmp_path):
+    async def scenario():
+        async with create_checkpointer(str(tmp_path / "history.db")) as checkpointer:
+            graph = get_graph("default", checkpointer=checkpointer)
+            await graph.ainvoke(make_initial_state("问题"), CONFIG)
+            expected = [s.config["configurable"]["checkpoint_id"] async for s in graph.aget_state_history(CONFIG)]
+            first = await aget_history_page(graph, CONFIG, limit=2)
+            rest = [entry.checkpoint_id async for entry in aiter_history(graph, CONFIG, page_size=2)]
+            return expected, first, rest
+
+    expected, first, rest = asyncio.run(scenario())
+    assert [entry.checkpoint_id for entry in first.entries] == expected[:2]
+    assert first.cursor == expected[1]
+    assert rest == expected
+
+
+def test_graph_without_checkpointer():
+    with pytest.raises(ValueError):
+        get_history_page(object(), CONFIG)
@@ -0,0 +1,51 @@
+"""CachedModel：缓存命中的调用不经过限流器"""
+
+import asyncio
+
+import pytest
+
+from src.llm.cache import CachedModel, SQLiteLLMCache
+from src.llm.fake import FakeChatModel
+from src.llm.ratelimit import RateLimit, RateLimiter, set_limiter
+
+
+@pytest.fixture
+def admissions(monkeypatch):
+    """开启 llm 限流器，记录每次取得额度"""
+    admitted = []
+    monkeypatch.setattr(RateLimiter, "_record", lambda self, started: admitted.append(self.name))
+    set_limiter("llm", RateLimit(rps=100))
+    yield admitted
+    set_limiter("llm", None)
+
+
+@pytest.mark.parametrize("tools", [None, ["web_search"]], ids=["plain", "bound"])
+def test_cache_hits_skip_limiter(admissions, tools):
+    cache = SQLiteLLMCache(":memory:")
+    model = CachedModel(FakeChatModel(cache=cache), cache, "llm")
+    if tools:
+        model = model.bind_tools(tools)
+
+    async def scenario():
+        first = await model.ainvoke("什么是 LangGraph？")
+        second = await model.ainvoke("什么是 LangGraph？")
+        third = model.invoke("什么是 LangGraph？")
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert admissions == ["llm"]
+    assert cache.stats()["hits"] == 2
+    assert first.content == second.content == third.content
+    assert first.tool_calls == second.tool_calls
+
+
+def test_cache_miss_goes_through_limiter(admissions):
+    cache = SQLiteLLMCache(":memory:")
+    model = CachedModel(FakeChatModel(cache=cache), cache, "llm")
+
+    model.invoke("问题一")
+    model.invoke("问题二")
+
+    assert admissions == ["llm", "llm"]
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,28 @@
+"""日志：导入库模块没有副作用，入口配置后才启动后台线程"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _run(code: str) -> str:
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def test_import_starts_no_threads():
+    code = "import threading, src.graph, src.server.app; print(threading.active_count())"
+    assert _run(code) == "1"
+
+
+def test_ensure_logging_configures_once():
+    code = (
+        "import threading\n"
+        "from src.observability import ensure_logging, get_logger\n"
+        "get_logger('x').info('not configured')\n"
+        "ensure_logging(); ensure_logging()\n"
+        "print(threading.active_count())"
+    )
+    assert _run(code) == "2"
@@ -0,0 +1,64 @@
+"""指标：分位数、窗口、按运行汇总和 Prometheus 文本格式"""
+
+import pytest
+
+from src.observability.metrics import InMemoryMetrics, MetricEvent, percentile, render_prometheus
+
+
+@pytest.mark.parametrize("q, expected", [(0.0, 1.0), (0.5, 50.0), (0.95, 95.0), (0.99, 99.0), (1.0, 100.0)])
+def test_percentile_nearest_rank(q, expected):
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, q) == expected
+
+
+def test_percentile_small_and_empty():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([1.0, 2.0], 0.5) == 1.0
+
+
+def test_summary_uses_recent_window_but_counts_everything():
+    metrics = InMemoryMetrics(window=10)
+    for i in range(1, 21):
+        metrics.record(MetricEvent(kind="node", name="writer", duration_s=float(i), ok=i != 20))
+
+    stats = metrics.summary()["node"]["writer"]
+
+    assert stats["count"] == 20
+    assert stats["errors"] == 1
+    assert stats["total_s"] == 210.0
+    # 分位数只看最近 10 个样本（11~20）
+    assert stats["p50_s"] == 15.0
+    assert stats["p99_s"] == 20.0
+
+
+def test_runs_summary():
+    metrics = InMemoryMetrics(max_runs=1)
+    metrics.record(MetricEvent(kind="node", name="planner", duration_s=1.0, run_id="a"))
+    metrics.record(MetricEvent(kind="llm", name="planner", duration_s=0.5, run_id="b", prompt_tokens=7))
+    metrics.record(MetricEvent(kind="tool", name="web_search", duration_s=0.1, run_id="b", ok=False))
+
+    runs = metrics.runs()
+
+    assert list(runs) == ["b"]
+    assert runs["b"]["prompt_tokens"] == 7
+    assert runs["b"]["tool_calls"] == 1
+    assert runs["b"]["tool_errors"] == 1
+
+
+def test_render_prometheus():
+    metrics = InMemoryMetrics()
+    metrics.record(MetricEvent(kind="llm", name='say "hi"', duration_s=0.25, prompt_tokens=3, completion_tokens=4))
+    metrics.record(MetricEvent(kind="tool", name="web_search", duration_s=0.5, ok=False, error="timeout"))
+
+    lines = render_prometheus(metrics).splitlines()
+
+    assert "# TYPE agent_llm_duration_seconds summary" in lines
+    assert 'agent_llm_duration_seconds{name="say \\"hi\\"",quantile="0.5"} 0.250000' in lines
+    assert 'agent_llm_duration_seconds_sum{name="say \\"hi\\""} 0.250000' in lines
+    assert 'agent_llm_duration_seconds_count{name="say \\"hi\\""} 1' in lines
+    assert 'agent_llm_tokens_total{name="say \\"hi\\"",type="completion"} 4' in lines
+    assert 'agent_tool_errors_total{name="web_search"} 1' in lines
+    # 工具没有 token 指标，没有事件的类型不输出
+    assert not any(line.startswith("agent_tool_tokens_total") for line in lines)
+    assert not any("agent_node_" in line for line in lines)
@@ -0,0 +1,54 @@
+"""提示词缓存：只读取一次，文件的 mtime 变化后重新加载"""
+
+import os
+
+from src.graph.prompts import PromptCache
+
+
+def _write(path, text: str, mtime: float):
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_cached_until_mtime_changes(tmp_path):
+    path = tmp_path / "planner.md"
+    _write(path, "v1", 1_000)
+    cache = PromptCache(tmp_path, check_interval=0)
+
+    first = cache.get("planner")
+    assert first.text == "v1"
+    assert cache.get("planner") is first
+
+    # 内容变了但 mtime 没变：仍然用缓存
+    _write(path, "v2", 1_000)
+    assert cache.get("planner") is first
+
+    _write(path, "v3", 2_000)
+    reloaded = cache.get("planner")
+    assert reloaded.text == "v3"
+    assert reloaded.messages[0].content == "v3"
+
+
+def test_check_interval_skips_stat(tmp_path):
+    path = tmp_path / "writer.md"
+    _write(path, "v1", 1_000)
+    cache = PromptCache(tmp_path, check_interval=3600)
+
+    first = cache.get("writer")
+    _write(path, "v2", 2_000)
+
+    # 检查间隔内不看 mtime
+    assert cache.get("writer") is first
+    cache.clear()
+    assert cache.get("writer").text == "v2"
+
+
+def test_missing_and_deleted_file(tmp_path):
+    cache = PromptCache(tmp_path, check_interval=0)
+    assert cache.get("missing").text == ""
+
+    path = tmp_path / "researcher.md"
+    _write(path, "v1", 1_000)
+    assert cache.get("researcher").text == "v1"
+    path.unlink()
+    assert cache.get("researcher").text == ""
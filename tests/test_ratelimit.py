@@ -0,0 +1,127 @@
+"""限流：令牌桶的等待时间、并发上限的先到先得和取消"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.llm.ratelimit import InflightLimit, RateLimit, RateLimiter, TokenBucket
+
+
+def test_bucket_reservations_queue_in_order():
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    waits = [bucket.reserve(1) for _ in range(5)]
+
+    # 前两个用掉突发额度，之后每个多等 1/rate 秒
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2:] == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+
+
+def test_bucket_adjust_refunds_and_charges():
+    bucket = TokenBucket(rate=100, capacity=100)
+    bucket.reserve(100)
+
+    bucket.adjust(-60)      # 实际用量比估算少，退还
+    assert bucket.reserve(50) == 0.0
+    bucket.adjust(40)       # 实际用量比估算多，补扣
+    assert bucket.reserve(10) == pytest.approx(0.4, abs=0.02)
+
+
+def test_inflight_fifo_across_async_and_threads():
+    limit = InflightLimit(1)
+    order = []
+
+    async def scenario():
+        limit.acquire()
+
+        async def waiter(name):
+            await limit.aacquire()
+            order.append(name)
+            await asyncio.sleep(0.01)
+            limit.release()
+
+        first = asyncio.create_task(waiter("async-1"))
+        await asyncio.sleep(0.01)
+
+        def thread_waiter():
+            limit.acquire()
+            order.append("thread")
+            limit.release()
+
+        thread = threading.Thread(target=thread_waiter)
+        thread.start()
+        while limit.waiting < 2:
+            await asyncio.sleep(0.001)
+        second = asyncio.create_task(waiter("async-2"))
+        await asyncio.sleep(0.01)
+
+        assert limit.waiting == 3
+        limit.release()
+        await asyncio.gather(first, second)
+        await asyncio.to_thread(thread.join)
+
+    asyncio.run(scenario())
+    assert order == ["async-1", "thread", "async-2"]
+    assert (limit.active, limit.waiting) == (0, 0)
+
+
+def test_cancelled_waiter_leaves_queue():
+    limit = InflightLimit(1)
+
+    async def scenario():
+        await limit.aacquire()
+        cancelled = asyncio.create_task(limit.aacquire())
+        later = asyncio.create_task(limit.aacquire())
+        await asyncio.sleep(0.01)
+        assert limit.waiting == 2
+
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert limit.waiting == 1
+
+        # 名额跳过取消的等待者，交给后面的
+        limit.release()
+        await asyncio.wait_for(later, 1)
+        limit.release()
+
+    asyncio.run(scenario())
+    assert (limit.active, limit.waiting) == (0, 0)
+
+
+def test_cancelled_after_grant_passes_slot_on():
+    limit = InflightLimit(1)
+
+    async def scenario():
+        await limit.aacquire()
+        granted = asyncio.create_task(limit.aacquire())
+        later = asyncio.create_task(limit.aacquire())
+        await asyncio.sleep(0.01)
+
+        # 名额已经转交给 granted，但它在恢复运行前被取消
+        limit.release()
+        granted.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await granted
+        await asyncio.wait_for(later, 1)
+        limit.release()
+
+    asyncio.run(scenario())
+    assert (limit.active, limit.waiting) == (0, 0)
+
+
+def test_limiter_releases_on_error():
+    limiter = RateLimiter("test", RateLimit(max_inflight=1))
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async with limiter.acquire():
+                raise RuntimeError("boom")
+        started = time.perf_counter()
+        async with limiter.acquire():
+            pass
+        return time.perf_counter() - started
+
+    assert asyncio.run(scenario()) < 0.1
+    assert limiter.stats() == {"inflight": 0, "waiting": 0}
@@ -0,0 +1,60 @@
+"""工具注册表：按名称查找、bind_tools 结果按 (模型, 工具集) 缓存"""
+
+import pytest
+
+from src.tools.registry import ToolRegistry
+from src.tools.tools import calculator, web_search
+
+
+class CountingModel:
+    """记录 bind_tools 调用次数的模型替身"""
+
+    def __init__(self):
+        self.binds = []
+
+    def bind_tools(self, tools):
+        self.binds.append([tool.name for tool in tools])
+        return ("bound", self, tuple(tool.name for tool in tools))
+
+
+@pytest.fixture
+def registry():
+    registry = ToolRegistry()
+    registry.register(web_search)
+    registry.register(calculator)
+    registry.register_toolset("research", ["web_search"])
+    registry.register_toolset("all", ["web_search", "calculator"])
+    return registry
+
+
+def test_lookup(registry):
+    assert registry.get("calculator") is calculator
+    assert registry.get("missing") is None
+    assert registry.get_tool_map("all") == {"web_search": web_search, "calculator": calculator}
+    with pytest.raises(KeyError):
+        registry.register_toolset("broken", ["missing"])
+
+
+def test_bind_is_cached_per_model_and_toolset(registry):
+    model, other = CountingModel(), CountingModel()
+
+    first = registry.bind(model, "research")
+    assert registry.bind(model, "research") is first
+    assert registry.bind(model, "all") is not first
+    registry.bind(other, "research")
+
+    assert model.binds == [["web_search"], ["web_search", "calculator"]]
+    assert other.binds == [["web_search"]]
+
+
+def test_register_invalidates_bind_cache(registry):
+    model = CountingModel()
+    registry.bind(model, "research")
+
+    # 重新注册工具集或工具后，下一次 bind 重新绑定
+    registry.register_toolset("research", ["web_search", "calculator"])
+    assert registry.bind(model, "research")[2] == ("web_search", "calculator")
+    registry.register(calculator)
+    registry.bind(model, "research")
+
+    assert len(model.binds) == 3
@@ -0,0 +1,103 @@
+"""ResilientModel：取消的探测请求要归还名额，流式输出过 token 后不再重试"""
+
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.graph import END, START, StateGraph
+
+from src.llm.fake import FakeChatModel
+from src.llm.resilience import ResiliencePolicy, ResilientModel
+
+
+class ScriptedModel(FakeChatModel):
+    """前 failures 次调用直接失败；fail_after=n 时流式输出 n 个 chunk 后失败一次"""
+
+    failures: int = 0
+    fail_after: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("boom")
+        return await super()._agenerate(messages, stop, run_manager, tools, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        emitted = 0
+        async for chunk in super()._astream(messages, stop, run_manager, tools, **kwargs):
+            if self.fail_after and emitted == self.fail_after:
+                self.fail_after = 0
+                raise ConnectionError("stream broken")
+            emitted += 1
+            yield chunk
+
+
+def _policy(**overrides) -> ResiliencePolicy:
+    return ResiliencePolicy(**{"timeout_s": 5, "max_retries": 2, "backoff_base_s": 0, **overrides})
+
+
+def test_cancelled_probe_releases_breaker():
+    async def scenario():
+        model = ScriptedModel(failures=1)
+        resilient = ResilientModel(model, _policy(max_retries=0, breaker_failures=1, breaker_reset_s=0.05))
+
+        with pytest.raises(ConnectionError):
+            await resilient.ainvoke("hi")
+        assert resilient.breaker.state == "open"
+
+        await asyncio.sleep(0.06)
+        model.latency = 1.0
+        probe = asyncio.create_task(resilient.ainvoke("hi"))
+        await asyncio.sleep(0.02)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert resilient.breaker.state == "half_open"
+
+        model.latency = 0.0
+        await resilient.ainvoke("hi")
+        assert resilient.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_retries_before_first_token():
+    model = ScriptedModel(failures=2)
+    resilient = ResilientModel(model, _policy(breaker_failures=0))
+
+    result = asyncio.run(resilient.ainvoke("hi"))
+    assert result.content
+    assert model.failures == 0
+
+
+class StreamState(TypedDict):
+    messages: Annotated[list, operator.add]
+
+
+def _stream_graph(resilient):
+    async def call(state: StreamState) -> dict:
+        return {"messages": [await resilient.ainvoke(state["messages"])]}
+
+    builder = StateGraph(StreamState)
+    builder.add_node("writer", call)
+    builder.add_edge(START, "writer")
+    builder.add_edge("writer", END)
+    return builder.compile()
+
+
+def test_streaming_does_not_retry_after_tokens():
+    model = ScriptedModel(output_tokens=10, fail_after=3)
+    graph = _stream_graph(ResilientModel(model, _policy(breaker_failures=0)))
+
+    async def scenario():
+        tokens = []
+        with pytest.raises(ConnectionError):
+            async for chunk, _ in graph.astream({"messages": [HumanMessage("hi")]}, stream_mode="messages"):
+                tokens.append(chunk.content)
+        return tokens
+
+    tokens = asyncio.run(scenario())
+    assert len(tokens) == 3
+    assert model.calls == 1
@@ -0,0 +1,242 @@
+"""审核队列：暂停 -> approve / modify / reject -> 再次暂停，以及重启后 recover()"""
+
+import asyncio
+
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.checkpoint import create_checkpointer
+from src.llm.fake import FakeChatModel
+from src.llm.models import set_model
+from src.llm.resilience import ResiliencePolicy, ResilientModel
+from src.review import ReviewQueue
+
+
+async def _wait_pending(reviews: ReviewQueue, count: int):
+    await reviews.join()
+    assert len(reviews.pending) == count
+
+
+async def _values(reviews: ReviewQueue, thread_id: str, variant: str = "condition") -> dict:
+    config = reviews._config(thread_id, variant, {})
+    return (await reviews.graph(variant).aget_state(config)).values
+
+
+def test_decisions(fake_model):
+    async def scenario():
+        reviews = ReviewQueue(MemorySaver(), workers=2)
+        await reviews.start()
+        try:
+            for thread_id in ("approve", "modify", "reject"):
+                await reviews.submit(f"问题 {thread_id}", thread_id=thread_id)
+            await _wait_pending(reviews, 3)
+            assert [review.thread_id for review in reviews.list()] == ["approve", "modify", "reject"]
+            first_tokens = (await _values(reviews, "reject"))["tokens_used"]
+
+            await reviews.decide("approve", "approve")
+            await reviews.decide("modify", "modify", "补充一个例子")
+            await reviews.decide("reject", "reject", "换个角度")
+            await _wait_pending(reviews, 1)
+
+            approved = await _values(reviews, "approve")
+            modified = await _values(reviews, "modify")
+            rejected = await _values(reviews, "reject")
+            return reviews.stats(), reviews.pending["reject"], approved, modified, rejected, first_tokens
+        finally:
+            await reviews.stop()
+
+    stats, pending, approved, modified, rejected, first_tokens = asyncio.run(scenario())
+    assert approved["final_answer"]
+    assert "[人工补充说明]" in modified["research_results"] and modified["final_answer"]
+    assert pending.rounds == 2
+    assert "[审核意见]: 换个角度" in rejected["plan"]
+    assert not rejected.get("final_answer")
+    # 重新研究的 token 从 0 开始计算，不叠加第一轮
+    assert 0 < rejected["tokens_used"] < first_tokens
+    assert rejected["budget"]["tokens"] == rejected["tokens_used"]
+    assert (stats["approved"], stats["modified"], stats["rejected"], stats["completed"]) == (1, 1, 1, 2)
+
+
+def test_reject_resets_budget():
+    update, as_node = ReviewQueue._decision_update(
+        {"plan": "计划", "tokens_used": 5000, "budget": {"exhausted": "tokens"}}, "reject", "",
+    )
+    assert as_node == "planner"
+    assert update["tokens_used"] == 0
+    assert update["budget"] == {}
+    assert update["research_iterations"] == 0
+
+
+def test_recover_after_restart(fake_model, tmp_path):
+    path = str(tmp_path / "reviews.db")
+
+    async def first_process():
+        async with create_checkpointer(path) as checkpointer:
+            reviews = ReviewQueue(checkpointer, workers=2)
+            await reviews.start()
+            for thread_id in ("a", "b", "c"):
+                await reviews.submit(f"问题 {thread_id}", thread_id=thread_id)
+            await _wait_pending(reviews, 3)
+            # 先停掉 worker：c 已审核但还没执行，进程就退出了
+            await reviews.stop()
+            await reviews.decide("c", "approve")
+
+    async def second_process():
+        async with create_checkpointer(path) as checkpointer:
+            reviews = ReviewQueue(checkpointer, workers=2)
+            await reviews.start()
+            recovered = sorted(review.thread_id for review in reviews.list())
+            await reviews.join()
+            await reviews.decide("a", "approve")
+            await reviews.join()
+            answers = {thread_id: (await _values(reviews, thread_id)).get("final_answer") for thread_id in "abc"}
+            await reviews.stop()
+            return recovered, answers, reviews.stats()
+
+    asyncio.run(first_process())
+    recovered, answers, stats = asyncio.run(second_process())
+    assert recovered == ["a", "b"]
+    assert answers["a"] and answers["c"]
+    assert not answers["b"]
+    assert stats["pending"] == 1 and stats["completed"] == 2
+
+
+# ============================================================
+# 推测执行的草稿
+# ============================================================
+
+class SlowWriter(FakeChatModel):
+    """写作者的调用先失败 writer_failures 次，之后每次耗时 writer_latency 秒"""
+
+    writer_failures: int = 0
+    writer_latency: float = 0.0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        if "研究结果:" in str(messages[-1].content):
+            if self.writer_failures:
+                self.writer_failures -= 1
+                raise ConnectionError("writer unavailable")
+            await asyncio.sleep(self.writer_latency)
+        return await super()._agenerate(messages, stop, run_manager, tools, **kwargs)
+
+
+async def _until(predicate, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("等待超时")
+
+
+async def _drafts_ready(reviews: ReviewQueue):
+    await _until(lambda: reviews.stats()["drafting"] == 0)
+
+
+def test_draft_hit_skips_worker(fake_model):
+    async def scenario():
+        reviews = ReviewQueue(MemorySaver(), workers=1, speculative=True)
+        await reviews.start()
+        try:
+            await reviews.submit("问题", thread_id="t")
+            await _wait_pending(reviews, 1)
+            await _drafts_ready(reviews)
+            calls = fake_model.calls
+
+            await reviews.decide("t", "approve")
+            stats = reviews.stats()
+            await reviews.join()
+            return stats, fake_model.calls - calls, await _values(reviews, "t")
+        finally:
+            await reviews.stop()
+
+    stats, calls, values = asyncio.run(scenario())
+    assert (stats["draft_hits"], stats["completed"], stats["queued"]) == (1, 1, 0)
+    assert calls == 0
+    assert values["final_answer"]
+
+
+@pytest.mark.parametrize("action", ["modify", "reject"])
+def test_changed_state_discards_draft(fake_model, action):
+    async def scenario():
+        reviews = ReviewQueue(MemorySaver(), workers=1, speculative=True)
+        await reviews.start()
+        try:
+            await reviews.submit("问题", thread_id="t")
+            await _wait_pending(reviews, 1)
+            await _drafts_ready(reviews)
+            await reviews.decide("t", action, "审核意见")
+            await reviews.join()
+            return reviews.stats()
+        finally:
+            await reviews.stop()
+
+    stats = asyncio.run(scenario())
+    assert stats["drafts_discarded"] == 1
+    assert stats["draft_hits"] == 0
+    assert stats["pending"] == (action == "reject")
+
+
+def test_cancelled_draft_probe_keeps_breaker_usable():
+    # 草稿的第一次写作失败打开熔断器，重试成为探测请求；这个探测在进行中被 reject 取消
+    model = SlowWriter(writer_failures=1, writer_latency=1.0)
+    policy = ResiliencePolicy(timeout_s=5, max_retries=1, backoff_base_s=0, breaker_failures=1, breaker_reset_s=0)
+    resilient = ResilientModel(model, policy)
+    set_model(resilient)
+
+    async def scenario():
+        reviews = ReviewQueue(MemorySaver(), workers=1, speculative=True)
+        await reviews.start()
+        try:
+            await reviews.submit("问题", thread_id="t")
+            await _wait_pending(reviews, 1)
+            await _until(lambda: resilient.breaker.state == "half_open")
+
+            model.writer_latency = 0.0
+            await reviews.decide("t", "reject")
+            await _wait_pending(reviews, 1)
+            await _drafts_ready(reviews)
+            await reviews.decide("t", "approve")
+            return reviews.stats(), await _values(reviews, "t")
+        finally:
+            await reviews.stop()
+
+    try:
+        stats, values = asyncio.run(scenario())
+    finally:
+        set_model(None)
+
+    assert resilient.breaker.state == "closed"
+    assert (stats["drafts_discarded"], stats["draft_hits"], stats["completed"], stats["failed"]) == (1, 1, 1, 0)
+    assert values["final_answer"]
+
+
+def test_recover_reads_metadata_only(fake_model, tmp_path):
+    path = str(tmp_path / "reviews.db")
+
+    async def first_process():
+        async with create_checkpointer(path) as checkpointer:
+            reviews = ReviewQueue(checkpointer, workers=1)
+            await reviews.start()
+            await reviews.submit("问题", thread_id="r")
+            await _wait_pending(reviews, 1)
+            # r 先后有 pending、rejected、pending 三个审核标记
+            await reviews.decide("r", "reject", "换个角度")
+            await _wait_pending(reviews, 1)
+            await reviews.stop()
+
+    async def second_process():
+        async with create_checkpointer(path) as checkpointer:
+            async def no_alist(*args, **kwargs):
+                raise AssertionError("recover 不应该还原历史 checkpoint 的完整状态")
+                yield
+
+            checkpointer.alist = no_alist
+            reviews = ReviewQueue(checkpointer, workers=1)
+            recovered = await reviews.recover()
+            return recovered, list(reviews.pending), reviews.stats()["queued"]
+
+    asyncio.run(first_process())
+    recovered, pending, queued = asyncio.run(second_process())
+    assert recovered == 1
+    assert pending == ["r"]
+    assert queued == 0
@@ -0,0 +1,72 @@
+"""CachedSearch：TTL 过期、LRU 淘汰、并发的相同查询只发一次请求"""
+
+import threading
+import time
+
+from src.tools.search import CachedSearch, FakeSearchBackend, MockSearchBackend, set_search_backend
+from src.tools.tools import web_search
+
+
+def test_ttl_expiry():
+    backend = FakeSearchBackend()
+    search = CachedSearch(backend, ttl=0.05)
+
+    search.search("langgraph")
+    search.search("  LangGraph ")
+    assert backend.calls == 1
+
+    time.sleep(0.06)
+    search.search("langgraph")
+    assert backend.calls == 2
+    assert search.stats()["hits"] == 1
+
+
+def test_lru_eviction():
+    backend = FakeSearchBackend()
+    search = CachedSearch(backend, ttl=60, max_size=2)
+
+    search.search("a")
+    search.search("b")
+    search.search("a")          # a 变成最近使用
+    search.search("c")          # 淘汰 b
+    assert search.stats()["size"] == 2
+
+    search.search("a")
+    assert backend.calls == 3
+    search.search("b")
+    assert backend.calls == 4
+
+
+def test_concurrent_queries_coalesce():
+    backend = FakeSearchBackend(latency=0.1)
+    search = CachedSearch(backend, ttl=0)
+    results = []
+    start = threading.Barrier(8)
+
+    def worker():
+        start.wait()
+        results.append(search.search("same query"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.calls == 1
+    assert search.stats()["coalesced"] == 7
+    assert all(result == results[0] for result in results)
+
+
+def test_mock_backend_keeps_old_text():
+    set_search_backend(MockSearchBackend())
+    text = web_search.invoke({"query": "天气"})
+    assert text == """
+[模拟搜索结果 - 请配置 TAVILY_API_KEY 以获取真实结果]
+
+搜索词: 天气
+
+模拟结果1: 这是关于 天气 的第一条搜索结果...
+模拟结果2: 这是关于 天气 的第二条搜索结果...
+模拟结果3: 这是关于 天气 的第三条搜索结果...
+"""
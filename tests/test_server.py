@@ -0,0 +1,146 @@
+"""HTTP 服务：参数校验、同步/流式运行、冲突、取消、健康检查和指标"""
+
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.server.app import create_app
+
+
+def serve(scenario, **options):
+    """用 TestClient 启动应用，运行 scenario(client)"""
+    async def main():
+        async with TestClient(TestServer(create_app(**options))) as client:
+            return await scenario(client)
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("body", [
+    {"question": "q", "graph": ["condition"]},
+    {"question": "q", "config": {"max_fanout": "many"}},
+    {"question": "q", "config": {"max_iterations": 2.5}},
+    {"question": "q", "config": {"token_budget": -1}},
+    {"question": "q", "config": {"deadline_s": True}},
+    {"question": "q", "config": {"model_profile": 3}},
+    {"question": "q", "thread_id": {"id": 1}},
+], ids=["graph", "fanout", "iterations", "negative", "bool", "profile", "thread"])
+def test_invalid_options_rejected(fake_model, body):
+    async def scenario(client):
+        response = await client.post("/runs", json=body)
+        health = await (await client.get("/healthz")).json()
+        return response.status, await response.json(), health
+
+    status, payload, health = serve(scenario)
+    assert status == 400
+    assert "error" in payload
+    # 校验失败时还没有占用运行槽位
+    assert health["running"] == health["queued"] == health["failed"] == 0
+
+
+def test_numeric_strings_coerced(fake_model):
+    async def scenario(client):
+        response = await client.post("/runs", json={
+            "question": "q", "graph": "fanout", "config": {"max_fanout": "2", "deadline_s": "30"},
+        })
+        return response.status, await response.json()
+
+    status, payload = serve(scenario)
+    assert status == 200
+    assert payload["final_answer"]
+
+
+def _parse_sse(text: str) -> list[tuple[str, str]]:
+    events = []
+    for block in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], fields["data"]))
+    return events
+
+
+async def _wait_running(client, thread_id: str):
+    for _ in range(200):
+        runs = (await (await client.get("/runs")).json())["runs"]
+        if any(run["thread_id"] == thread_id and run["state"] == "running" for run in runs):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{thread_id} 没有开始运行")
+
+
+def test_run_returns_final_answer(fake_model):
+    async def scenario(client):
+        response = await client.post("/runs", json={"question": "什么是 LangGraph？", "thread_id": "t1"})
+        return response.status, await response.json()
+
+    status, payload = serve(scenario)
+    assert status == 200
+    assert payload["thread_id"] == "t1"
+    assert payload["final_answer"]
+
+
+def test_stream_event_order(fake_model):
+    async def scenario(client):
+        response = await client.post("/runs/stream", json={"question": "什么是 LangGraph？"})
+        return response.headers["Content-Type"], _parse_sse(await response.text())
+
+    content_type, events = serve(scenario)
+    names = [name for name, _ in events]
+    assert content_type.startswith("text/event-stream")
+    assert names[0] == "run"
+    assert names[-1] == "end"
+    assert names.count("token") == fake_model.output_tokens
+    writer_update = next(i for i, (name, data) in enumerate(events) if name == "update" and '"writer"' in data)
+    assert names.index("token") < writer_update < len(names) - 1
+    assert set(names) == {"run", "update", "token", "end"}
+
+
+def test_duplicate_thread_conflicts(fake_model):
+    fake_model.latency = 0.2
+
+    async def scenario(client):
+        first = asyncio.create_task(client.post("/runs", json={"question": "q", "thread_id": "dup"}))
+        await _wait_running(client, "dup")
+        second = await client.post("/runs", json={"question": "q", "thread_id": "dup"})
+        return second.status, (await first).status
+
+    second, first = serve(scenario)
+    assert second == 409
+    assert first == 200
+
+
+def test_delete_cancels_run(fake_model):
+    fake_model.latency = 0.5
+
+    async def scenario(client):
+        run = asyncio.create_task(client.post("/runs", json={"question": "q", "thread_id": "slow"}))
+        await _wait_running(client, "slow")
+        deleted = await client.delete("/runs/slow")
+        missing = await client.delete("/runs/missing")
+        await asyncio.gather(run, return_exceptions=True)
+        health = await (await client.get("/healthz")).json()
+        return deleted.status, missing.status, health
+
+    deleted, missing, health = serve(scenario)
+    assert deleted == 202
+    assert missing == 404
+    assert health["cancelled"] == 1
+    assert health["running"] == 0
+
+
+def test_health_and_metrics(fake_model):
+    async def scenario(client):
+        await client.post("/runs", json={"question": "q"})
+        health = await (await client.get("/healthz")).json()
+        text = await (await client.get("/metrics")).text()
+        summary = await (await client.get("/metrics", params={"format": "json"})).json()
+        return health, text, summary
+
+    health, text, summary = serve(scenario, checkpoint="memory")
+    assert health["status"] == "ok"
+    assert health["checkpointer"] == "InMemorySaver"
+    assert health["completed"] == 1
+    assert 'agent_server_runs_total{status="completed"} 1' in text
+    assert "agent_server_runs{" in text
+    assert summary["server"]["completed"] == 1
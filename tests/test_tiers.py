@@ -0,0 +1,91 @@
+"""模型档位：内置档位、配置文件、环境变量覆盖和按运行选择档位"""
+
+import json
+
+import pytest
+
+from src.llm import tiers
+from src.llm.models import ModelConfig
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    """干净的环境：档位在每个测试里重新构建"""
+    for name in ("MODEL_NAME", "MODEL_STRONG", *(f"MODEL_{role.upper()}" for role in tiers.ROLES)):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(tiers, "MODEL_FAST", "fast-model")
+    monkeypatch.setattr(tiers, "MODEL_PROFILE", "default")
+    monkeypatch.setattr(tiers, "MODEL_TIERS_FILE", None)
+    tiers.reset_profiles()
+    yield monkeypatch
+    tiers.reset_profiles()
+
+
+def _models(profile: str) -> dict:
+    return {role: tiers.model_config_for(role, profile).model for role in tiers.ROLES}
+
+
+def test_builtin_profiles(profiles):
+    strong = ModelConfig.model
+    assert set(_models("default").values()) == {strong}
+    assert set(_models("fast").values()) == {"fast-model"}
+    assert _models("tiered") == {
+        "planner": "fast-model", "researcher_tools": "fast-model", "researcher": strong, "writer": strong,
+    }
+    # 相同的配置是相等的，可以共享同一个客户端
+    assert tiers.model_config_for("writer", "tiered") == tiers.model_config_for("writer", "default")
+
+
+def test_default_profile_and_unknown_profile(profiles):
+    profiles.setattr(tiers, "MODEL_PROFILE", "fast")
+    assert tiers.model_config_for("writer").model == "fast-model"
+    with pytest.raises(ValueError):
+        tiers.model_config_for("writer", "missing")
+
+
+def test_env_overrides(profiles):
+    profiles.setenv("MODEL_STRONG", "strong-model")
+    profiles.setenv("MODEL_PLANNER", "planner-model")
+
+    assert _models("tiered") == {
+        "planner": "planner-model", "researcher_tools": "fast-model",
+        "researcher": "strong-model", "writer": "strong-model",
+    }
+    assert _models("fast")["planner"] == "planner-model"
+
+
+def test_profiles_file(profiles, tmp_path):
+    path = tmp_path / "tiers.json"
+    path.write_text(json.dumps({"profiles": {
+        "custom": {"writer": {"model": "writer-model", "base_url": "http://local"}},
+        "fast": {"writer": {"model": "fast-writer"}},
+    }}), encoding="utf-8")
+    profiles.setattr(tiers, "MODEL_TIERS_FILE", str(path))
+
+    custom = _models("custom")
+    assert custom["writer"] == "writer-model"
+    assert custom["planner"] == ModelConfig.model
+    assert tiers.model_config_for("writer", "custom").base_url == "http://local"
+    # 已有的档位只覆盖写到的角色
+    assert _models("fast") == {**{role: "fast-model" for role in tiers.ROLES}, "writer": "fast-writer"}
+
+
+def test_profiles_file_rejects_unknown_role(profiles, tmp_path):
+    path = tmp_path / "tiers.toml"
+    path.write_text('[profiles.bad.reviewer]\nmodel = "x"\n', encoding="utf-8")
+    profiles.setattr(tiers, "MODEL_TIERS_FILE", str(path))
+
+    with pytest.raises(ValueError, match="reviewer"):
+        tiers.get_profiles()
+
+
+def test_run_config_selects_profile(profiles):
+    from src.graph import nodes
+
+    chosen = []
+    profiles.setattr(nodes, "get_model", lambda config: chosen.append(config.model))
+    nodes._get_llm({"configurable": {"model_profile": "tiered"}}, "planner")
+    nodes._get_llm({"configurable": {"model_profile": "tiered"}}, "writer")
+    nodes._get_llm({"configurable": {"model_config": ModelConfig(model="pinned")}}, "planner")
+
+    assert chosen == ["fast-model", ModelConfig.model, "pinned"]